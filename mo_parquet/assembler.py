@@ -0,0 +1,270 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import numpy
+
+from mo_dots import startswith_field
+from mo_future import PY2, binary_type, text_type
+from mo_logs import Log
+from mo_parquet.buffer import _array
+from mo_parquet.schema import REPEATED, REQUIRED
+from parquet_thrift.parquet.ttypes import ConvertedType
+
+if PY2:
+    from itertools import izip as zip
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Assembler(object):
+    """
+    REBUILD NESTED RECORDS FROM THE (values, reps, defs) COLUMNS OF A Table
+
+    EACH COLUMN IS MERGED INTO THE RECORDS, ONE WHOLE COLUMN (OR BATCH OF ROWS)
+    AT A TIME. THE REPETITION LEVEL SELECTS WHICH LIST GETS A NEW ITEM, AND THE
+    DEFINITION LEVEL SELECTS HOW DEEP THE PATH EXISTS; THIS IS THE SAME STATE
+    THE DREMEL ASSEMBLY FSM TRACKS, BUT KEPT PER COLUMN SO COLUMNS SHARING AN
+    ANCESTOR LIST LAND IN THE SAME LIST ITEMS
+    """
+
+    def __init__(self, table, columns=None):
+        """
+        :param table: Table OF SHREDDED COLUMNS
+        :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES, TO ASSEMBLE (None FOR ALL IN table)
+        """
+        self.table = table
+        self.num_rows = table.num_rows
+        self.columns = []
+        for column in table.schema.get_parquet_columns():
+            if column.name not in table.values:
+                continue
+            if columns is not None and not any(startswith_field(column.name, c) for c in columns):
+                continue
+            self.columns.append(_compile_column(column, table))
+        if columns is not None:
+            for c in columns:
+                if not any(startswith_field(column.name, c) for column in self.columns):
+                    Log.error("Column {{name|quote}} not found", name=c)
+
+    def records(self, start=0, stop=None):
+        """
+        :param start: FIRST ROW
+        :param stop: END ROW (EXCLUSIVE)
+        :return: LIST OF RECORDS (dict) FOR ROWS [start, stop)
+        """
+        if stop is None or stop > self.num_rows:
+            stop = self.num_rows
+        output = [{} for _ in range(start, stop)]
+        for column in self.columns:
+            column.assemble(output, start, stop)
+        return output
+
+    def batches(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        :return: GENERATOR OF LISTS OF RECORDS, EACH WITH AT MOST batch_size RECORDS
+        """
+        for start in range(0, self.num_rows, batch_size):
+            yield self.records(start, start + batch_size)
+
+    def __iter__(self):
+        for batch in self.batches():
+            for record in batch:
+                yield record
+
+
+class _ColumnPlan(object):
+    """
+    EVERYTHING NEEDED TO MERGE ONE COLUMN INTO THE RECORDS
+    """
+
+    def __init__(self, name, steps, max_repetition_level, max_definition_level, values, reps, defs, decode, row_index):
+        self.name = name
+        self.steps = steps  # LIST OF Step, FROM ROOT TO LEAF
+        self.max_repetition_level = max_repetition_level
+        self.max_definition_level = max_definition_level
+        self.values = values
+        self.reps = reps
+        self.defs = defs
+        self.decode = decode
+        self.row_index = row_index  # WHERE EACH ROW STARTS, SO ROW BATCHES CAN BE SLICED
+        self.defined = defs == max_definition_level
+
+    def assemble(self, records, start, stop):
+        row_index = self.row_index
+        first = row_index.levels[start]
+        last = row_index.levels[stop]
+        values = self.values[row_index.values[start]:row_index.values[stop]].tolist()
+        if self.decode:
+            values = [v.decode('utf8') if isinstance(v, binary_type) else v for v in values]
+
+        if not self.max_repetition_level and len(self.steps) == 1:
+            # ONE LEVEL DEEP, ONE TRIPLE PER ROW
+            key = self.steps[0].key
+            rows = numpy.flatnonzero(self.defined[first:last]).tolist()
+            for row, value in zip(rows, values):
+                records[row][key] = value
+            return
+
+        _assemble_triples(
+            records,
+            self.steps,
+            values,
+            self.reps[first:last],
+            self.defs[first:last],
+            self.max_definition_level
+        )
+
+
+def _assemble_triples(records, steps, values, reps, defs, max_definition_level):
+    """
+    MERGE THE (rep, def, value) TRIPLES OF ONE COLUMN INTO records
+
+    EACH STEP IS APPLIED TO ALL TRIPLES AT ONCE: numpy FINDS WHICH TRIPLES
+    REACH THE STEP, WHERE EACH NEW OBJECT (OR LIST ITEM) STARTS, AND THE LIST
+    INDEX OF EVERY TRIPLE, SO PYTHON ONLY VISITS EACH CONTAINER ONCE
+    """
+    # THE TRIPLES THAT REACH THE CURRENT STEP, AND THE (container, key) SLOT EACH IS IN
+    # owner INDEXES INTO owners, keys IS ONE PROPERTY NAME OR AN ARRAY OF LIST INDEXES
+    start = reps == 0  # FIRST TRIPLE OF EACH SLOT
+    owners = [records]
+    owner = numpy.zeros(len(reps), dtype=numpy.intp)
+    keys = numpy.cumsum(start) - 1
+    for step in steps:
+        if step.key is not None:
+            firsts = numpy.flatnonzero(start)
+            owners = _get_or_add(owners, owner[firsts], keys, firsts, dict)
+            owner = numpy.cumsum(start) - 1
+            keys = step.key
+
+        # TRIPLES THAT STOP BEFORE THIS STEP ARE ALONE IN THEIR SLOT, SO WHOLE SLOTS ARE REMOVED
+        keep = defs >= step.definition_level
+        if not keep.all():
+            reps, defs, start, owner = reps[keep], defs[keep], start[keep], owner[keep]
+            if keys.__class__ is not text_type and keys.__class__ is not binary_type:
+                keys = keys[keep]
+
+        if step.repeated:
+            firsts = numpy.flatnonzero(start)
+            owners = _get_or_add(owners, owner[firsts], keys, firsts, list)
+            owner = numpy.cumsum(start) - 1
+
+            # A NEW ITEM STARTS AT THIS LEVEL (OR ABOVE); THE INDEX RESTARTS AT EACH NEW LIST
+            new_item = reps <= step.repetition_level
+            count = numpy.cumsum(new_item)
+            restart = numpy.where(start, numpy.arange(len(start)), 0)
+            keys = count - count[numpy.maximum.accumulate(restart)]
+            for items, index in zip(
+                [owners[o] for o in owner[new_item].tolist()],
+                keys[new_item].tolist()
+            ):
+                if index == len(items):
+                    items.append(None)
+            start = new_item
+
+    defined = defs == max_definition_level
+    containers = [owners[o] for o in owner[defined].tolist()]
+    if keys.__class__ is text_type or keys.__class__ is binary_type:
+        for container, value in zip(containers, values):
+            container[keys] = value
+    else:
+        for container, key, value in zip(containers, keys[defined].tolist(), values):
+            container[key] = value
+
+
+def _get_or_add(owners, owner, keys, firsts, new):
+    """
+    :param owners: LIST OF CONTAINERS
+    :param owner: FOR EACH SLOT, THE INDEX OF ITS CONTAINER
+    :param keys: PROPERTY NAME, OR ARRAY OF LIST INDEXES
+    :param firsts: FOR EACH SLOT, THE POSITION OF ITS FIRST TRIPLE
+    :param new: TYPE TO ADD WHEN THE SLOT IS EMPTY
+    :return: LIST OF THE CHILD IN EACH SLOT
+    """
+    if keys.__class__ is text_type or keys.__class__ is binary_type:
+        keys = [keys] * len(firsts)
+    else:
+        keys = keys[firsts].tolist()
+
+    output = []
+    for o, key in zip(owner.tolist(), keys):
+        container = owners[o]
+        child = container.get(key) if container.__class__ is dict else container[key]
+        if child is None:
+            child = container[key] = new()
+        output.append(child)
+    return output
+
+
+def _compile_column(column, table):
+    """
+    :param column: COLUMN DESCRIPTION (FROM SchemaTree.get_parquet_columns())
+    :param table: Table HOLDING THE COLUMN
+    :return: _ColumnPlan
+    """
+    steps = []
+    node = table.schema
+    definition_level = 0
+    repetition_level = 0
+    for name in column.path_in_schema:
+        if node.is_typed:
+            # VALUES OF A POLYMORPHIC PROPERTY GO TO THE PROPERTY ITSELF, NOT A CHILD
+            break
+        node = node.more[name]
+        element = node.element
+        repeated = element is not None and element.repetition_type == REPEATED
+        if element is not None and element.repetition_type != REQUIRED:
+            definition_level += 1
+        if repeated:
+            repetition_level += 1
+        steps.append(_Step(None if name == '.' else name, repeated, definition_level, repetition_level))
+
+    values = _array(table.values[column.name])
+    reps = numpy.asarray(getattr(table.reps[column.name], "array", table.reps[column.name]))
+    defs = numpy.asarray(getattr(table.defs[column.name], "array", table.defs[column.name]))
+    if not column.max_definition_level:
+        defs = numpy.zeros(len(values), dtype=numpy.uint8)
+    if not column.max_repetition_level:
+        reps = numpy.zeros(len(defs), dtype=numpy.uint8)
+
+    return _ColumnPlan(
+        column.name,
+        steps,
+        column.max_repetition_level,
+        column.max_definition_level,
+        values,
+        reps,
+        defs,
+        column.element.converted_type == ConvertedType.UTF8,
+        table.get_row_index(column.name)
+    )
+
+
+class _Step(object):
+    """
+    ONE SCHEMA NODE ON THE PATH TO A LEAF
+    """
+    __slots__ = ["key", "repeated", "definition_level", "repetition_level"]
+
+    def __init__(self, key, repeated, definition_level, repetition_level):
+        self.key = key  # PROPERTY NAME, None FOR THE '.' NODE HOLDING LIST ITEMS
+        self.repeated = repeated
+        self.definition_level = definition_level  # DEFINITION LEVEL WHEN THIS NODE EXISTS
+        self.repetition_level = repetition_level
+
+
+def assemble(table, columns=None):
+    """
+    :param table: Table OF SHREDDED COLUMNS
+    :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES, TO ASSEMBLE (None FOR ALL)
+    :return: LIST OF RECORDS
+    """
+    return Assembler(table, columns).records()
@@ -0,0 +1,250 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import math
+from collections import defaultdict
+
+import numpy
+
+from mo_future import binary_type, text_type
+from mo_logs import Log
+from mo_parquet.encodings import parquet_type_to_plain_type
+from parquet_thrift.parquet.ttypes import BloomFilterAlgorithm, BloomFilterCompression, BloomFilterHash, BloomFilterHeader, SplitBlockAlgorithm, Type, Uncompressed, XxHash
+
+BLOCK_BYTES = 32  # ONE BLOCK IS EIGHT 32-BIT WORDS
+MAX_BLOOM_FILTER_BYTES = 1024 * 1024
+DEFAULT_FPP = 0.01  # FALSE POSITIVE PROBABILITY
+
+# TYPES THAT MAY HAVE A BLOOM FILTER
+BLOOM_TYPES = {Type.BYTE_ARRAY, Type.INT32, Type.INT64, Type.FLOAT, Type.DOUBLE}
+
+# SPLIT-BLOCK CONSTANTS, ONE PER WORD OF THE BLOCK
+SALT = numpy.array([0x47b6137b, 0x44974d91, 0x8824ad5b, 0xa2b7289d, 0x705495c7, 0x2df1424b, 0x9efc4947, 0x5c6bfb31], dtype=numpy.uint32)
+
+# XXH64 PRIMES
+P1 = numpy.uint64(11400714785074694791)
+P2 = numpy.uint64(14029467366897019727)
+P3 = numpy.uint64(1609587929392839161)
+P4 = numpy.uint64(9650029242287828579)
+P5 = numpy.uint64(2870177450012600261)
+U64 = numpy.dtype("<u8")
+U32 = numpy.dtype("<u4")
+
+
+class BloomFilter(object):
+    """
+    PARQUET SPLIT-BLOCK BLOOM FILTER: EACH VALUE (ITS xxHash64) SETS ONE BIT
+    IN EACH OF THE EIGHT WORDS OF ONE 256-BIT BLOCK
+    """
+
+    __slots__ = ["words"]
+
+    def __init__(self, num_bytes):
+        """
+        :param num_bytes: SIZE OF THE BITSET (A MULTIPLE OF BLOCK_BYTES)
+        """
+        self.words = numpy.zeros(num_bytes // 4, dtype=U32)
+
+    @classmethod
+    def new_instance(cls, num_distinct, fpp=DEFAULT_FPP, max_bytes=MAX_BLOOM_FILTER_BYTES):
+        """
+        :param num_distinct: NUMBER OF DISTINCT VALUES EXPECTED
+        :param fpp: FALSE POSITIVE PROBABILITY EXPECTED
+        :param max_bytes: LARGEST BITSET ALLOWED
+        :return: EMPTY BloomFilter, SIZED FOR num_distinct VALUES
+        """
+        return BloomFilter(optimal_num_bytes(num_distinct, fpp, max_bytes))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        :param data: THE BITSET, AS WRITTEN BY to_bytes()
+        """
+        if not data or len(data) % BLOCK_BYTES:
+            Log.error("Expecting bloom filter bitset of whole blocks, not {{num}} bytes", num=len(data))
+        output = BloomFilter(0)
+        output.words = numpy.frombuffer(data, dtype=U32)
+        return output
+
+    @property
+    def num_bytes(self):
+        return self.words.shape[0] * 4
+
+    def insert_hashes(self, hashes):
+        """
+        :param hashes: numpy ARRAY OF uint64 xxHash64 OF THE VALUES
+        """
+        blocks, masks = self._locate(hashes)
+        words = self.words.reshape(-1, 8)
+        for i in range(8):
+            numpy.bitwise_or.at(words[:, i], blocks, masks[:, i])
+
+    def check_hashes(self, hashes):
+        """
+        :return: numpy ARRAY OF bool, False WHERE THE VALUE IS CERTAINLY NOT IN THE FILTER
+        """
+        blocks, masks = self._locate(hashes)
+        found = self.words.reshape(-1, 8)[blocks]
+        return numpy.all(found & masks == masks, axis=1)
+
+    def check(self, value, parquet_type):
+        """
+        :param value: PYTHON VALUE
+        :param parquet_type: PARQUET Type OF THE COLUMN
+        :return: False IF value IS CERTAINLY NOT IN THE FILTER
+        """
+        hashes = hash_values([value], parquet_type)
+        if hashes is None:
+            return False  # CAN NOT BE ENCODED AS parquet_type, SO IT CAN NOT BE IN THE COLUMN
+        return bool(self.check_hashes(hashes)[0])
+
+    def header(self):
+        return BloomFilterHeader(
+            numBytes=self.num_bytes,
+            algorithm=BloomFilterAlgorithm(BLOCK=SplitBlockAlgorithm()),
+            hash=BloomFilterHash(XXHASH=XxHash()),
+            compression=BloomFilterCompression(UNCOMPRESSED=Uncompressed())
+        )
+
+    def to_bytes(self):
+        return self.words.tobytes()
+
+    def _locate(self, hashes):
+        """
+        :return: (blocks, masks) THE BLOCK OF EACH HASH, AND THE BIT IT SETS IN EACH WORD OF THAT BLOCK
+        """
+        hashes = numpy.asarray(hashes, dtype=U64)
+        num_blocks = numpy.uint64(self.words.shape[0] // 8)
+        blocks = ((hashes >> numpy.uint64(32)) * num_blocks) >> numpy.uint64(32)
+        keys = hashes.astype(U32)
+        bits = (keys[:, None] * SALT[None, :]) >> numpy.uint32(27)
+        masks = numpy.left_shift(numpy.uint32(1), bits).astype(U32)
+        return blocks.astype(numpy.intp), masks
+
+
+def optimal_num_bytes(num_distinct, fpp=DEFAULT_FPP, max_bytes=MAX_BLOOM_FILTER_BYTES):
+    """
+    :return: BITSET SIZE (A POWER OF TWO, AT LEAST ONE BLOCK) FOR num_distinct VALUES AT fpp
+    """
+    if not 0 < fpp < 1:
+        Log.error("Expecting false positive probability between 0 and 1, not {{fpp}}", fpp=fpp)
+    num_bits = -8 * max(num_distinct, 1) / math.log(1 - fpp ** (1 / 8))
+    num_bytes = BLOCK_BYTES
+    while num_bytes * 8 < num_bits and num_bytes < max_bytes:
+        num_bytes *= 2
+    return num_bytes
+
+
+def hash_values(values, parquet_type):
+    """
+    :param values: LIST, OR numpy ARRAY, OF VALUES
+    :param parquet_type: PARQUET Type OF THE COLUMN
+    :return: numpy ARRAY OF THE xxHash64 OF THE PLAIN ENCODING OF EACH VALUE (None IF NOT ENCODABLE)
+    """
+    if parquet_type == Type.BYTE_ARRAY:
+        # HASH VALUES OF THE SAME LENGTH TOGETHER
+        by_length = defaultdict(list)
+        for i, v in enumerate(values):
+            if isinstance(v, text_type):
+                v = v.encode("utf8")
+            elif not isinstance(v, binary_type):
+                return None
+            by_length[len(v)].append((i, v))
+        output = numpy.empty(len(values), dtype=U64)
+        for length, found in by_length.items():
+            rows = numpy.frombuffer(b"".join(v for _, v in found), dtype=numpy.uint8).reshape(len(found), length)
+            output[[i for i, _ in found]] = xxhash64_rows(rows)
+        return output
+
+    plain_type = parquet_type_to_plain_type.get(parquet_type)
+    if plain_type is None:
+        Log.error("Do not know how to hash parquet type {{type}}", type=parquet_type)
+    try:
+        array = numpy.asarray(values, dtype=plain_type)
+    except (OverflowError, TypeError, ValueError):
+        return None
+    if not isinstance(values, numpy.ndarray) or values.dtype != plain_type:
+        if any(a != v for a, v in zip(array.tolist(), values) if v == v):
+            return None  # LOSSY, SO NOT IN THE COLUMN
+    return xxhash64_rows(array.view(numpy.uint8).reshape(-1, plain_type.itemsize))
+
+
+def xxhash64(data, seed=0):
+    """
+    :param data: bytes
+    :return: xxHash64 OF data, AS PYTHON int
+    """
+    rows = numpy.frombuffer(data, dtype=numpy.uint8).reshape(1, len(data))
+    return int(xxhash64_rows(rows, seed)[0])
+
+
+def xxhash64_rows(rows, seed=0):
+    """
+    xxHash64 OF MANY VALUES OF THE SAME LENGTH AT ONCE
+    :param rows: numpy uint8 ARRAY, ONE ROW PER VALUE
+    :return: numpy uint64 ARRAY OF HASHES
+    """
+    count, length = rows.shape
+    seed = numpy.uint64(seed)
+    rows = numpy.ascontiguousarray(rows)
+
+    def lanes(start, width, dtype):
+        return rows[:, start:start + width * dtype.itemsize].copy().view(dtype).astype(U64)
+
+    with numpy.errstate(over="ignore"):
+        position = 0
+        if length >= 32:
+            v = [
+                numpy.full(count, seed + P1 + P2, dtype=U64),
+                numpy.full(count, seed + P2, dtype=U64),
+                numpy.full(count, seed, dtype=U64),
+                numpy.full(count, seed - P1, dtype=U64)
+            ]
+            while position + 32 <= length:
+                stripe = lanes(position, 4, U64)
+                for i in range(4):
+                    v[i] = _round(v[i], stripe[:, i])
+                position += 32
+            h = _rotl(v[0], 1) + _rotl(v[1], 7) + _rotl(v[2], 12) + _rotl(v[3], 18)
+            for i in range(4):
+                h = (h ^ _round(numpy.zeros(count, dtype=U64), v[i])) * P1 + P4
+        else:
+            h = numpy.full(count, seed + P5, dtype=U64)
+        h += numpy.uint64(length)
+
+        while position + 8 <= length:
+            h ^= _round(numpy.zeros(count, dtype=U64), lanes(position, 1, U64)[:, 0])
+            h = _rotl(h, 27) * P1 + P4
+            position += 8
+        if position + 4 <= length:
+            h ^= lanes(position, 1, U32)[:, 0] * P1
+            h = _rotl(h, 23) * P2 + P3
+            position += 4
+        while position < length:
+            h ^= rows[:, position].astype(U64) * P5
+            h = _rotl(h, 11) * P1
+            position += 1
+
+        h ^= h >> numpy.uint64(33)
+        h *= P2
+        h ^= h >> numpy.uint64(29)
+        h *= P3
+        h ^= h >> numpy.uint64(32)
+    return h
+
+
+def _round(acc, lane):
+    return _rotl(acc + lane * P2, 31) * P1
+
+
+def _rotl(x, r):
+    return (x << numpy.uint64(r)) | (x >> numpy.uint64(64 - r))
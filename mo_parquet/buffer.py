@@ -0,0 +1,436 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import numpy
+
+from mo_future import long, PY2
+from mo_logs import Log
+from mo_parquet.encodings import MIN_RLE_RUN, find_runs
+from parquet_thrift.parquet.ttypes import Type
+
+INITIAL_CAPACITY = 16  # SMALLEST ALLOCATION
+MAX_GROWTH = 1024 * 1024  # ONCE BIG, GROW BY (AT MOST) THIS MANY ITEMS AT A TIME
+MAX_DICTIONARY_BYTES = 1024 * 1024  # DICTIONARY ENCODING IS ABANDONED WHEN THE DISTINCT VALUES GET THIS BIG
+RUN_BYTES = 16  # APPROXIMATE MEMORY FOR ONE (level, count) RUN
+
+parquet_type_to_numpy_type = {
+    Type.BOOLEAN: numpy.bool_,
+    Type.INT32: numpy.int32,
+    Type.INT64: numpy.int64,
+    Type.FLOAT: numpy.float32,
+    Type.DOUBLE: numpy.float64
+}
+
+# PYTHON TYPES ALLOWED IN EACH TYPED BUFFER, ANYTHING ELSE DEMOTES THE BUFFER TO object
+numpy_type_to_python_types = {
+    numpy.bool_: (bool,),
+    numpy.int32: (int, long) if PY2 else (int,),
+    numpy.int64: (int, long) if PY2 else (int,),
+    numpy.float32: (float,),
+    numpy.float64: (float,),
+    object: None
+}
+
+
+class ColumnBuffer(object):
+    """
+    GROWABLE ARRAY OF VALUES, BACKED BY A (TYPED) NUMPY ARRAY
+    """
+
+    __slots__ = ["data", "length", "dtype", "ptypes"]
+
+    def __init__(self, dtype=object, capacity=INITIAL_CAPACITY):
+        """
+        :param dtype: numpy type of the values
+        :param capacity: number of values to allocate up front
+        """
+        self.data = numpy.empty(max(capacity, INITIAL_CAPACITY), dtype=dtype)
+        self.length = 0
+        self.dtype = dtype
+        self.ptypes = numpy_type_to_python_types.get(dtype)
+
+    @classmethod
+    def new_instance(cls, parquet_type, max_dictionary_bytes=MAX_DICTIONARY_BYTES):
+        """
+        :param parquet_type: Parquet Type (as found in SchemaElement.type)
+        :param max_dictionary_bytes: LIMIT ON DictionaryBuffer SIZE (0 TO NOT USE A DICTIONARY)
+        :return: ColumnBuffer BEST SUITED TO HOLD THE VALUES
+        """
+        if parquet_type == Type.BYTE_ARRAY and max_dictionary_bytes:
+            return DictionaryBuffer(max_dictionary_bytes)
+        return cls(parquet_type_to_numpy_type.get(parquet_type, object))
+
+    def append(self, value):
+        length = self.length
+        if length == self.data.shape[0]:
+            self._grow(length + 1)
+        if self.ptypes is not None and value.__class__ not in self.ptypes:
+            self._demote()
+        try:
+            self.data[length] = value
+        except OverflowError:
+            # PYTHON INTEGERS ARE UNBOUNDED
+            self._demote()
+            self.data[length] = value
+        self.length = length + 1
+
+    def extend(self, values):
+        values = list(values)
+        if self.ptypes is not None and any(v.__class__ not in self.ptypes for v in values):
+            self._demote()
+        self.extend_array(numpy.array(values, dtype=self.dtype) if values else numpy.empty(0, dtype=self.dtype))
+
+    def extend_array(self, array):
+        """
+        BULK COPY numpy ARRAY INTO THIS BUFFER
+        """
+        start = self.length
+        end = start + array.shape[0]
+        if end > self.data.shape[0]:
+            self._grow(end)
+        if self.dtype is not object and array.dtype == object:
+            self._demote()
+        self.data[start:end] = array
+        self.length = end
+
+    def truncate(self, length):
+        """
+        FORGET VALUES BEYOND length
+        """
+        if self.dtype is object:
+            self.data[length:self.length] = None
+        self.length = min(self.length, length)
+
+    def _grow(self, required):
+        """
+        AMORTIZED GROWTH: DOUBLE UNTIL BIG, THEN GROW IN CHUNKS
+        """
+        capacity = self.data.shape[0]
+        new_capacity = max(required, capacity + max(INITIAL_CAPACITY, min(capacity, MAX_GROWTH)))
+        new_data = numpy.empty(new_capacity, dtype=self.data.dtype)
+        new_data[:self.length] = self.data[:self.length]
+        self.data = new_data
+
+    def _demote(self):
+        """
+        VALUES OF MIXED TYPE CAN NOT BE STORED IN A TYPED ARRAY
+        """
+        self.data = self.data.astype(object)
+        self.dtype = object
+        self.ptypes = None
+
+    @property
+    def array(self):
+        """
+        :return: numpy VIEW OF THE VALUES (NO COPY)
+        """
+        return self.data[:self.length]
+
+    @property
+    def nbytes(self):
+        """
+        :return: BYTES USED BY THE VALUES (NOT INCLUDING SPARE CAPACITY)
+        """
+        if self.dtype is object:
+            return sum(len(v) if hasattr(v, "__len__") else 8 for v in self.array) + 8 * self.length
+        return self.data.itemsize * self.length
+
+    def tolist(self):
+        return self.array.tolist()
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.array[item]
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError("index out of range")
+        value = self.data[item]
+        return value.item() if isinstance(value, numpy.generic) else value
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnBuffer):
+            other = other.tolist()
+        elif not isinstance(other, (list, tuple, numpy.ndarray)):
+            return False
+        return self.tolist() == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "ColumnBuffer(" + repr(self.tolist()) + ")"
+
+
+class LevelBuffer(ColumnBuffer):
+    """
+    GROWABLE ARRAY OF REPETITION OR DEFINITION LEVELS
+    STARTS AS uint8, AND WIDENS TO uint16 WHEN A LEVEL DOES NOT FIT
+
+    A LEAF FOUND LATE IN A ROW GROUP STARTS WITH A LONG STRETCH OF NULLS. UNTIL
+    THE FIRST LEVEL IS APPENDED ONE-AT-A-TIME, LEVELS ARE KEPT AS (level, count)
+    runs, SO A WIDE, SPARSE, SCHEMA DOES NOT COST O(rows) FOR EVERY LEAF. THE
+    runs ARE ONLY EXPANDED WHEN THE WHOLE array IS ASKED FOR; encode_levels()
+    WRITES THEM DIRECTLY AS RLE RUNS
+    """
+
+    __slots__ = ["limit", "runs", "num_run_levels"]
+
+    def __init__(self, capacity=INITIAL_CAPACITY, dtype=numpy.uint8):
+        ColumnBuffer.__init__(self, dtype, capacity)
+        self.ptypes = None
+        self.limit = numpy.iinfo(dtype).max
+        self.runs = []  # (level, count) PAIRS, BEFORE THE dense LEVELS
+        self.num_run_levels = 0
+
+    @classmethod
+    def zeros(cls, count):
+        """
+        :return: LevelBuffer FILLED WITH count ZEROS
+        """
+        output = cls()
+        output.extend_run(0, count)
+        return output
+
+    def append(self, level):
+        length = self.length
+        if length == self.data.shape[0]:
+            self._grow(length + 1)
+        if level > self.limit:
+            self._widen(level)
+        self.data[length] = level
+        self.length = length + 1
+
+    def extend(self, levels):
+        levels = numpy.asarray(list(levels), dtype=numpy.int64)
+        if levels.shape[0] and levels.max() > self.limit:
+            self._widen(levels.max())
+        self.extend_array(levels.astype(self.dtype))
+
+    def extend_run(self, level, count):
+        """
+        APPEND count COPIES OF level
+        """
+        if not count:
+            return
+        if level > self.limit:
+            self._widen(level)
+        if self.length:
+            end = self.length + count
+            if end > self.data.shape[0]:
+                self._grow(end)
+            self.data[self.length:end] = level
+            self.length = end
+        elif self.runs and self.runs[-1][0] == level:
+            self.runs[-1] = (level, self.runs[-1][1] + count)
+            self.num_run_levels += count
+        else:
+            self.runs.append((int(level), count))
+            self.num_run_levels += count
+
+    def extend_levels(self, levels):
+        """
+        APPEND levels (A LevelBuffer, OR numpy ARRAY), KEEPING THEM AS runs IF THEY ARE MOSTLY LONG RUNS
+        """
+        if isinstance(levels, LevelBuffer):
+            for level, count in levels.runs:
+                self.extend_run(level, count)
+            levels = levels.dense
+        levels = numpy.asarray(levels)
+        if not levels.shape[0]:
+            return
+        if not self.length:
+            starts, lengths = find_runs(levels)
+            if starts.shape[0] * MIN_RLE_RUN <= levels.shape[0]:
+                for level, count in zip(levels[starts].tolist(), lengths.tolist()):
+                    self.extend_run(level, count)
+                return
+        if levels.max() > self.limit:
+            self._widen(levels.max())
+        self.extend_array(levels.astype(self.dtype))
+
+    def truncate(self, length):
+        if length >= self.num_run_levels:
+            ColumnBuffer.truncate(self, length - self.num_run_levels)
+            return
+        ColumnBuffer.truncate(self, 0)
+        runs = []
+        remaining = length
+        for level, count in self.runs:
+            if remaining <= 0:
+                break
+            runs.append((level, min(count, remaining)))
+            remaining -= count
+        self.runs = runs
+        self.num_run_levels = length
+
+    def count(self, level):
+        """
+        :return: NUMBER OF LEVELS EQUAL TO level
+        """
+        in_runs = sum(c for l, c in self.runs if l == level)
+        return in_runs + int(numpy.count_nonzero(self.dense == level))
+
+    def raise_level(self, level):
+        """
+        :return: NEW LevelBuffer WITH EVERY level RAISED BY ONE (FOR WHEN A NODE IS INSERTED ABOVE THE LEAF)
+        """
+        output = LevelBuffer()
+        for l, c in self.runs:
+            output.extend_run(l + 1 if l == level else l, c)
+        dense = self.dense.astype(numpy.int64)
+        output.extend_levels(dense + (dense == level))
+        return output
+
+    @property
+    def dense(self):
+        """
+        :return: numpy VIEW OF THE LEVELS AFTER THE runs (NO COPY)
+        """
+        return self.data[:self.length]
+
+    @property
+    def array(self):
+        """
+        :return: numpy ARRAY OF ALL LEVELS (A COPY IF THERE ARE runs)
+        """
+        if not self.runs:
+            return self.data[:self.length]
+        levels, counts = zip(*self.runs)
+        prefix = numpy.repeat(numpy.array(levels, dtype=self.dtype), counts)
+        return numpy.concatenate((prefix, self.data[:self.length]))
+
+    @property
+    def nbytes(self):
+        return self.data.itemsize * self.length + RUN_BYTES * len(self.runs)
+
+    def __len__(self):
+        return self.num_run_levels + self.length
+
+    def __getitem__(self, item):
+        num_run_levels = self.num_run_levels
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if start >= num_run_levels and step == 1:
+                return self.data[start - num_run_levels:max(start, stop) - num_run_levels]
+            return self.array[item]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("index out of range")
+        if item >= num_run_levels:
+            return int(self.data[item - num_run_levels])
+        for level, count in self.runs:
+            if item < count:
+                return level
+            item -= count
+
+    def _widen(self, level):
+        if level > numpy.iinfo(numpy.uint16).max:
+            Log.error("Levels beyond {{max}} are not supported", max=numpy.iinfo(numpy.uint16).max)
+        self.data = self.data.astype(numpy.uint16)
+        self.dtype = numpy.uint16
+        self.limit = numpy.iinfo(numpy.uint16).max
+
+    def __repr__(self):
+        return "LevelBuffer(" + repr(self.tolist()) + ")"
+
+
+class DictionaryBuffer(ColumnBuffer):
+    """
+    ColumnBuffer OF BYTE_ARRAY VALUES THAT ALSO BUILDS A DICTIONARY OF THE
+    DISTINCT VALUES, AND THE INDEX OF EACH VALUE IN THAT DICTIONARY, SO THE
+    WRITER CAN USE DICTIONARY ENCODING. ONCE THE DISTINCT VALUES TAKE MORE
+    THAN max_dictionary_bytes THE DICTIONARY IS DROPPED (dictionary IS None)
+    """
+
+    __slots__ = ["lookup", "dictionary", "indices", "dictionary_bytes", "max_dictionary_bytes"]
+
+    def __init__(self, max_dictionary_bytes=MAX_DICTIONARY_BYTES, capacity=INITIAL_CAPACITY):
+        ColumnBuffer.__init__(self, object, capacity)
+        self.lookup = {}  # MAP FROM VALUE TO INDEX
+        self.dictionary = []  # DISTINCT VALUES, IN ORDER OF FIRST APPEARANCE
+        self.indices = ColumnBuffer(numpy.int32, capacity)
+        self.dictionary_bytes = 0
+        self.max_dictionary_bytes = max_dictionary_bytes
+
+    def append(self, value):
+        ColumnBuffer.append(self, self._add_index(value))
+
+    def extend_array(self, array):
+        if self.lookup is not None:
+            shared = numpy.empty(array.shape[0], dtype=object)
+            shared[:] = [self._add_index(value) for value in array.tolist()]
+            array = shared
+        ColumnBuffer.extend_array(self, array)
+
+    def _add_index(self, value):
+        """
+        :return: THE dictionary OBJECT EQUAL TO value, SO REPEATS SHARE ONE COPY IN MEMORY
+        """
+        if self.lookup is None:
+            return value
+        index = self.lookup.get(value)
+        if index is None:
+            index = self.lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+            self.dictionary_bytes += 4 + len(value)
+            if self.dictionary_bytes > self.max_dictionary_bytes:
+                self._fallback()
+                return value
+        else:
+            value = self.dictionary[index]
+        self.indices.append(index)
+        return value
+
+    def truncate(self, length):
+        """
+        FORGET VALUES BEYOND length, AND THE DICTIONARY ENTRIES ONLY THEY USED
+        (ENTRIES ARE IN ORDER OF FIRST APPEARANCE, SO THOSE ARE THE LAST ONES)
+        """
+        ColumnBuffer.truncate(self, length)
+        if self.indices is None:
+            return
+        self.indices.truncate(length)
+        kept = self.indices.array
+        num_kept = int(kept.max()) + 1 if kept.shape[0] else 0
+        for value in self.dictionary[num_kept:]:
+            del self.lookup[value]
+            self.dictionary_bytes -= 4 + len(value)
+        del self.dictionary[num_kept:]
+
+    def _fallback(self):
+        """
+        TOO MANY DISTINCT VALUES, USE PLAIN ENCODING
+        """
+        self.lookup = None
+        self.dictionary = None
+        self.indices = None
+
+
+def _array(values):
+    """
+    :param values: ColumnBuffer, numpy ARRAY, OR LIST
+    :return: numpy ARRAY OF values (LISTS BECOME object ARRAYS)
+    """
+    values = getattr(values, "array", values)
+    if isinstance(values, numpy.ndarray):
+        return values
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
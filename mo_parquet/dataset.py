@@ -0,0 +1,406 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from mo_dots import Data, startswith_field
+from mo_future import binary_type
+from mo_logs import Log
+from mo_parquet.reader import ParquetReader, _expression, select_columns
+from mo_parquet.schema import SchemaTree
+from mo_parquet.statistics import can_match
+from mo_parquet.summary import SUMMARY_NAME, SummaryEntry, append_summary, read_summary, write_summary
+from mo_parquet.table import Table
+
+DEFAULT_FOOTER_CACHE_SIZE = 10000  # FileMetaData TO KEEP
+DEFAULT_THREADS = 4
+EXTENSION = ".parquet"
+
+
+class FooterCache(object):
+    """
+    LRU CACHE OF PARSED FileMetaData, KEYED BY path, AND VALID WHILE THE FILE
+    HAS THE SAME mtime AND size
+    """
+
+    def __init__(self, max_size=DEFAULT_FOOTER_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = Lock()
+        self.footers = OrderedDict()  # MAP FROM path TO ((mtime, size), FileMetaData), LEAST RECENTLY USED FIRST
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """
+        :param path: FILENAME OF A PARQUET FILE
+        :return: FileMetaData OF THE FILE (PARSED ONLY IF NOT CACHED, OR THE FILE CHANGED)
+        """
+        stat = os.stat(path)
+        version = stat.st_mtime, stat.st_size
+        with self.lock:
+            found = self.footers.pop(path, None)
+            if found is not None and found[0] == version:
+                self.footers[path] = found
+                self.hits += 1
+                return found[1]
+            self.misses += 1
+
+        with ParquetReader(path) as reader:
+            metadata = reader.metadata
+        with self.lock:
+            self.footers[path] = version, metadata
+            while len(self.footers) > self.max_size:
+                self.footers.popitem(last=False)
+        return metadata
+
+    def clear(self):
+        with self.lock:
+            self.footers.clear()
+
+
+FOOTER_CACHE = FooterCache()  # SHARED BY ALL Dataset, SO REPEATED QUERIES DO NOT PARSE FOOTERS AGAIN
+
+
+class DatasetFile(object):
+    """
+    ONE PARQUET FILE OF A Dataset
+    """
+
+    __slots__ = ["path", "partition"]
+
+    def __init__(self, path, partition):
+        """
+        :param path: FILENAME
+        :param partition: MAP FROM PARTITION KEY TO VALUE (FROM key=value DIRECTORY NAMES)
+        """
+        self.path = path
+        self.partition = partition
+
+    def __repr__(self):
+        return "DatasetFile(" + repr(self.path) + ")"
+
+
+class Dataset(object):
+    """
+    THE PARQUET FILES IN A DIRECTORY, AND ITS key=value PARTITION
+    SUBDIRECTORIES, AS ONE TABLE WITH THE UNION OF THEIR SCHEMAS
+
+    QUERIES ARE PLANNED FROM THE PARTITION VALUES AND FOOTER STATISTICS,
+    THEN THE REMAINING FILES ARE SCANNED IN PARALLEL
+
+    IF THE DIRECTORY HAS A SUMMARY FILE (SEE write_summary()) THE FILES, AND
+    THEIR FOOTERS, COME FROM IT, WITHOUT LISTING THE DIRECTORY OR OPENING
+    ANY DATA FILE
+    """
+
+    def __init__(self, directory, footer_cache=FOOTER_CACHE, threads=DEFAULT_THREADS, use_summary=True):
+        """
+        :param directory: ROOT OF THE DATASET
+        :param footer_cache: FooterCache OF PARSED FOOTERS
+        :param threads: NUMBER OF FILES TO READ AT ONCE
+        :param use_summary: False TO IGNORE THE SUMMARY FILE, AND READ THE FOOTER OF EVERY FILE
+        """
+        self.directory = directory
+        self.footer_cache = footer_cache
+        self.threads = threads
+        self.use_summary = use_summary
+        self.summary_filename = os.path.join(directory, SUMMARY_NAME)
+        self.files = []
+        self.schema = None
+        self._summary = None  # MAP FROM path TO SummaryEntry, WHEN THE FILES COME FROM THE SUMMARY
+        self._partitions = {}  # MAP FROM RELATIVE DIRECTORY TO ITS PARTITION
+        self._schemas = {}  # MAP FROM _schema_key() TO SchemaTree, SHARED BY FILES WITH THE SAME SCHEMA
+        self.refresh()
+
+    def refresh(self):
+        """
+        FIND THE FILES OF THE DATASET, AND MERGE THEIR SCHEMAS
+        """
+        if self.use_summary and os.path.exists(self.summary_filename):
+            schema, entries = read_summary(self.summary_filename)
+            files = []
+            summary = {}
+            for entry in entries:
+                file = self._file(entry.path)
+                files.append(file)
+                summary[file.path] = entry
+            self.files = files
+            self.schema = schema
+            self._summary = summary
+            return
+
+        files = self._find_files()
+        schema = SchemaTree()
+        for file in files:
+            schema.union(SchemaTree.new_instance(self.footer_cache.get(file.path).schema))
+        self.files = files
+        self.schema = schema
+        self._summary = None
+
+    def write_summary(self):
+        """
+        WRITE THE SUMMARY FILE, WITH THE FOOTERS OF ALL FILES IN THE DIRECTORY
+        """
+        known = self._summary or {}
+        entries = []
+        for file in self._find_files():
+            entry = known.get(file.path)
+            if entry is None or not _is_current(file, entry):
+                entry = self._entry(file)
+            entries.append(entry)
+        write_summary(self.summary_filename, entries)
+        self.refresh()
+
+    def update_summary(self):
+        """
+        ADD THE FILES THAT ARE NOT IN THE SUMMARY FILE TO IT (THE SUMMARY IS
+        WRITTEN AGAIN IF A FILE WAS CHANGED, OR REMOVED)
+        :return: LIST OF DatasetFile ADDED
+        """
+        if not os.path.exists(self.summary_filename):
+            self.write_summary()
+            return list(self.files)
+
+        _, entries = read_summary(self.summary_filename)
+        known = {e.path: e for e in entries}
+        files = self._find_files()
+        added = [f for f in files if _relative(self.directory, f.path) not in known]
+        unchanged = [
+            f
+            for f in files
+            for e in [known.get(_relative(self.directory, f.path))]
+            if e is not None and _is_current(f, e)
+        ]
+        if len(unchanged) == len(known):
+            if added:
+                append_summary(self.summary_filename, [self._entry(f) for f in added])
+            self.refresh()
+        else:
+            # REUSE THE FOOTERS OF THE UNCHANGED FILES
+            self._summary = {os.path.join(self.directory, *e.path.split("/")): e for e in entries}
+            self.write_summary()
+        return added
+
+    def _find_files(self):
+        """
+        :return: LIST OF DatasetFile IN THE DIRECTORY
+        """
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            dirnames[:] = sorted(d for d in dirnames if not _is_hidden(d))
+            relative = _relative(self.directory, dirpath)
+            for filename in sorted(filenames):
+                if _is_hidden(filename) or not filename.endswith(EXTENSION):
+                    continue
+                files.append(self._file(filename if relative == "." else relative + "/" + filename))
+        return files
+
+    def _file(self, relative):
+        """
+        :param relative: FILENAME, RELATIVE TO THE DATASET, WITH / SEPARATORS
+        """
+        directory = relative.rpartition("/")[0]
+        partition = self._partitions.get(directory)
+        if partition is None:
+            partition = self._partitions[directory] = _partition(directory)
+        return DatasetFile(os.path.join(self.directory, *relative.split("/")), partition)
+
+    def _entry(self, file):
+        stat = os.stat(file.path)
+        return SummaryEntry(_relative(self.directory, file.path), stat.st_mtime, stat.st_size, self.footer_cache.get(file.path))
+
+    @property
+    def columns(self):
+        return self.schema.get_parquet_columns()
+
+    @property
+    def num_rows(self):
+        return sum(self.get_metadata(f).num_rows for f in self.files)
+
+    def get_metadata(self, file):
+        """
+        :param file: DatasetFile
+        :return: FileMetaData OF THE file
+        """
+        if self._summary is not None:
+            return self._summary[file.path].metadata
+        return self.footer_cache.get(file.path)
+
+    def get_reader(self, file):
+        """
+        :return: ParquetReader OF file, WITHOUT PARSING ITS FOOTER AGAIN
+        """
+        metadata = self.get_metadata(file)
+        key = _schema_key(metadata.schema)
+        schema = self._schemas.get(key)
+        if schema is None:
+            schema = self._schemas[key] = SchemaTree.new_instance(metadata.schema)
+        return ParquetReader(file.path, metadata=metadata, schema=schema)
+
+    def plan(self, where=None):
+        """
+        :param where: JSON EXPRESSION ON COLUMNS, OR PARTITION KEYS
+        :return: LIST OF (DatasetFile, LIST OF ROW GROUP INDEXES) THAT MAY MATCH where, WITHOUT OPENING ANY FILE
+        """
+        if where is not None:
+            where = _expression(where)
+        output = []
+        partition_match = {}  # MAP FROM id(partition) TO can_match(), FILES OF A DIRECTORY SHARE ONE partition
+        for file in self.files:
+            if where is not None:
+                match = partition_match.get(id(file.partition))
+                if match is None:
+                    match = partition_match[id(file.partition)] = can_match(where, _partition_statistics(file.partition))
+                if not match:
+                    continue
+            with self.get_reader(file) as reader:
+                row_groups = reader.filter_row_groups(where, bloom_filters=False)
+            if row_groups:
+                output.append((file, row_groups))
+        return output
+
+    def scan(self, columns=None, where=None):
+        """
+        READ THE FILES THAT MAY MATCH where, self.threads AT A TIME
+        :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES, TO READ (None FOR ALL)
+        :param where: SKIP FILES, ROW GROUPS AND PAGES THAT CAN NOT MATCH (OTHER ROWS ARE NOT FILTERED)
+        :return: GENERATOR OF Table, ONE PER FILE, IN THE ORDER THEY ARE READ
+        """
+        for _, table in self._scan(columns, where):
+            yield table
+
+    def read(self, columns=None, where=None):
+        """
+        :return: Table OF ALL FILES, IN FILE ORDER (SEE scan())
+        """
+        names = set(c.name for c in select_columns(self.columns, columns))
+        tables = [t for _, t in sorted(self._scan(columns, where), key=lambda p: p[0])]
+        return Table.concat(tables, self.schema, columns=names)
+
+    def _scan(self, columns, where):
+        """
+        :return: GENERATOR OF (index, Table) PAIRS, index IS THE POSITION OF THE FILE IN THE plan()
+        """
+        from mo_logs.exceptions import Except
+        from mo_threads import Queue, Signal, Thread, THREAD_STOP
+
+        if where is not None:
+            where = _expression(where)
+        select_columns(self.columns, columns)  # FAIL EARLY ON UNKNOWN COLUMNS
+        plan = self.plan(where)
+        if not plan:
+            return
+
+        todo = Queue("dataset files", max=len(plan) + 1, silent=True)
+        todo.extend(list(enumerate(plan)))
+        todo.add(THREAD_STOP)
+        # BOUNDED, SO WORKERS WAIT FOR A SLOW CONSUMER, RATHER THAN FILLING MEMORY
+        done = Queue("dataset tables", max=self.threads, silent=True, allow_add_after_close=True)
+
+        def worker(please_stop):
+            while not please_stop:
+                task = todo.pop(till=please_stop)
+                if task is None or task is THREAD_STOP:
+                    break
+                index, (file, row_groups) = task
+                try:
+                    with self.get_reader(file) as reader:
+                        file_columns = columns
+                        if columns is not None:
+                            file_columns = [c for c in columns if any(startswith_field(f.name, c) for f in reader.columns)]
+                        result = reader.read(file_columns, row_groups=row_groups, where=where)
+                except Exception as e:
+                    result = Except.wrap(e)
+                done.add((index, file, result))
+
+        please_stop = Signal("stop dataset scan")
+        workers = [
+            Thread.run("dataset scan " + str(i), worker, please_stop=please_stop)
+            for i in range(min(self.threads, len(plan)))
+        ]
+        try:
+            for _ in plan:
+                index, file, result = done.pop()
+                if isinstance(result, Except):
+                    Log.error("Problem reading {{path|quote}}", path=file.path, cause=result)
+                yield index, result
+        finally:
+            please_stop.go()
+            todo.close()
+            done.close()
+            for w in workers:
+                w.join()
+
+
+def _relative(directory, path):
+    """
+    :return: path RELATIVE TO directory, WITH / SEPARATORS (AS USED IN THE SUMMARY)
+    """
+    return "/".join(os.path.relpath(path, directory).split(os.sep))
+
+
+def _is_current(file, entry):
+    """
+    :return: True IF THE file IS UNCHANGED SINCE entry WAS SUMMARIZED
+    """
+    stat = os.stat(file.path)
+    return (stat.st_mtime, stat.st_size) == (entry.mtime, entry.size)
+
+
+def _is_hidden(name):
+    # SUMMARY FILES (LIKE _metadata), AND TEMPORARY FILES, ARE NOT PART OF THE DATA
+    return name.startswith("_") or name.startswith(".")
+
+
+def _schema_key(parquet_schema):
+    return tuple(
+        (e.name, e.type, e.type_length, e.repetition_type, e.num_children, e.converted_type, e.scale, e.precision, e.field_id)
+        for e in parquet_schema
+    )
+
+
+def _partition(relative_path):
+    """
+    :param relative_path: DIRECTORY, RELATIVE TO THE DATASET ROOT, WITH / SEPARATORS
+    :return: MAP FROM KEY TO VALUE FOR EVERY key=value DIRECTORY IN THE PATH
+    """
+    output = {}
+    for name in relative_path.split("/") if relative_path else []:
+        key, eq, value = name.partition("=")
+        if eq:
+            output[key] = _partition_value(value)
+    return output
+
+
+def _partition_value(text):
+    if isinstance(text, binary_type):
+        text = text.decode("utf8")
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _partition_statistics(partition):
+    """
+    :return: get_statistics() FOR can_match(), THAT KNOWS ONLY THE PARTITION KEYS
+    """
+    def get_statistics(name):
+        if name not in partition:
+            return None, None
+        value = partition[name]
+        return 1, Data(min=value, max=value, null_count=0)
+    return get_statistics
@@ -0,0 +1,299 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import struct
+
+import numpy
+
+from mo_future import long
+from mo_logs import Log
+from parquet_thrift.parquet.ttypes import Type
+
+UINT8 = struct.Struct("<B")
+UINT32 = struct.Struct("<I")
+MIN_RLE_RUN = 8  # SHORTER RUNS ARE CHEAPER TO BIT-PACK
+
+# LITTLE-ENDIAN numpy TYPES FOR PLAIN ENCODING
+parquet_type_to_plain_type = {
+    Type.INT32: numpy.dtype("<i4"),
+    Type.INT64: numpy.dtype("<i8"),
+    Type.FLOAT: numpy.dtype("<f4"),
+    Type.DOUBLE: numpy.dtype("<f8")
+}
+
+# PYTHON TYPES THAT MAY BE PLAIN ENCODED AS EACH PARQUET TYPE (IF NO PRECISION IS LOST)
+parquet_type_to_plain_python_types = {
+    Type.BOOLEAN: (bool,),
+    Type.INT32: (int, long),
+    Type.INT64: (int, long),
+    Type.FLOAT: (float, int, long),
+    Type.DOUBLE: (float, int, long)
+}
+
+
+def bit_width(max_level):
+    """
+    :return: NUMBER OF BITS REQUIRED TO STORE LEVELS UP TO max_level
+    """
+    return int(max_level).bit_length()
+
+
+def encode_plain(values, parquet_type):
+    """
+    :param values: ColumnBuffer, numpy array, or list OF VALUES
+    :param parquet_type: PARQUET Type OF THE COLUMN
+    :return: bytes
+    """
+    if isinstance(values, (list, tuple)):
+        array = values
+    else:
+        array = getattr(values, "array", values)
+
+    if parquet_type == Type.BYTE_ARRAY:
+        pack = UINT32.pack
+        return b"".join(b for v in array for b in (pack(len(v)), v))
+
+    # A COLUMN OF MIXED TYPES IS DEMOTED TO object, AND MAY HOLD VALUES THIS TYPE CAN NOT REPRESENT
+    mixed = not isinstance(array, numpy.ndarray) or array.dtype == object
+    if mixed:
+        _check_plain_types(array, parquet_type)
+
+    if parquet_type == Type.BOOLEAN:
+        return pack_bits(numpy.asarray(array, dtype=numpy.uint8), 1)
+
+    plain_type = parquet_type_to_plain_type.get(parquet_type)
+    if plain_type is None:
+        Log.error("Do not know how to encode parquet type {{type}}", type=parquet_type)
+    try:
+        output = numpy.asarray(array, dtype=plain_type)
+    except OverflowError as e:
+        Log.error("Value out of range for parquet type {{type}}", type=Type._VALUES_TO_NAMES[parquet_type], cause=e)
+    if mixed:
+        for value, encoded in zip(array, output.tolist()):
+            if value != encoded and value == value:  # NaN IS NOT EQUAL TO ITSELF
+                Log.error(
+                    "Can not encode {{value}} as parquet type {{type}} without loss",
+                    value=value,
+                    type=Type._VALUES_TO_NAMES[parquet_type]
+                )
+    return output.tobytes()
+
+
+def _check_plain_types(array, parquet_type):
+    expected = parquet_type_to_plain_python_types.get(parquet_type)
+    if expected is None:
+        return
+    for value in array:
+        if value.__class__ not in expected:
+            Log.error(
+                "Can not encode {{value|json}} (of type {{python_type}}) as parquet type {{type}}",
+                value=value,
+                python_type=value.__class__.__name__,
+                type=Type._VALUES_TO_NAMES[parquet_type]
+            )
+
+
+def decode_plain(data, parquet_type, count, offset=0):
+    """
+    :param data: bytes
+    :param parquet_type: PARQUET Type OF THE COLUMN
+    :param count: NUMBER OF VALUES TO DECODE
+    :param offset: WHERE TO START IN data
+    :return: (numpy array OF VALUES, offset AFTER LAST VALUE)
+    """
+    if parquet_type == Type.BYTE_ARRAY:
+        output = numpy.empty(count, dtype=object)
+        unpack = UINT32.unpack_from
+        for i in range(count):
+            length, = unpack(data, offset)
+            offset += 4
+            output[i] = data[offset:offset + length]
+            offset += length
+        return output, offset
+    elif parquet_type == Type.BOOLEAN:
+        num_bytes = (count + 7) // 8
+        output = unpack_bits(data, 1, count, offset).astype(numpy.bool_)
+        return output, offset + num_bytes
+
+    plain_type = parquet_type_to_plain_type.get(parquet_type)
+    if plain_type is None:
+        Log.error("Do not know how to decode parquet type {{type}}", type=parquet_type)
+    output = numpy.frombuffer(data, dtype=plain_type, count=count, offset=offset)
+    return output, offset + count * plain_type.itemsize
+
+
+def pack_bits(values, width):
+    """
+    BIT-PACK values, LEAST SIGNIFICANT BIT FIRST, AS PARQUET EXPECTS
+    :param values: numpy ARRAY OF SMALL, NON-NEGATIVE, INTEGERS
+    :param width: NUMBER OF BITS PER VALUE
+    :return: bytes, PADDED TO A WHOLE NUMBER OF BYTES
+    """
+    if not width or not len(values):
+        return b""
+    values = numpy.asarray(values, dtype=numpy.uint32)
+    bits = ((values[:, None] >> numpy.arange(width, dtype=numpy.uint32)) & 1).astype(numpy.uint8).ravel()
+    padding = (-len(bits)) % 8
+    if padding:
+        bits = numpy.concatenate((bits, numpy.zeros(padding, dtype=numpy.uint8)))
+    return numpy.packbits(bits.reshape(-1, 8)[:, ::-1]).tobytes()
+
+
+def unpack_bits(data, width, count, offset=0):
+    """
+    INVERSE OF pack_bits()
+    :param offset: WHERE THE PACKED BITS START IN data
+    :return: numpy ARRAY OF count uint32
+    """
+    if not width:
+        return numpy.zeros(count, dtype=numpy.uint32)
+    raw = numpy.frombuffer(data, dtype=numpy.uint8, count=(count * width + 7) // 8, offset=offset)
+    bits = numpy.unpackbits(raw).reshape(-1, 8)[:, ::-1].ravel()[:count * width]
+    weights = (1 << numpy.arange(width, dtype=numpy.uint32))
+    return (bits.reshape(count, width).astype(numpy.uint32) * weights).sum(axis=1, dtype=numpy.uint32)
+
+
+def encode_varint(value):
+    output = bytearray()
+    while value > 0x7F:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+    return bytes(output)
+
+
+def decode_varint(data, offset):
+    """
+    :return: (value, offset AFTER THE varint)
+    """
+    result = 0
+    shift = 0
+    while True:
+        b = ord(data[offset:offset + 1])
+        offset += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, offset
+        shift += 7
+
+
+def encode_levels(levels, width):
+    """
+    RLE/BIT-PACKED HYBRID ENCODING OF LEVELS (WITHOUT LENGTH PREFIX)
+
+    RUNS OF AT LEAST MIN_RLE_RUN EQUAL LEVELS ARE RLE ENCODED, EVERYTHING
+    BETWEEN THEM IS BIT-PACKED. RUNS ARE FOUND WITH numpy, SO THE PYTHON
+    LOOP IS ONLY OVER THE LONG RUNS
+    :param levels: LevelBuffer, numpy ARRAY, OR LIST OF int
+    :param width: BIT WIDTH OF EACH LEVEL
+    :return: bytes
+    """
+    byte_width = (width + 7) // 8
+    output = []
+    runs = getattr(levels, "runs", None)
+    if runs:
+        # LevelBuffer KEEPS ITS LEADING NULLS AS (level, count) RUNS, WHICH ARE RLE AS-IS
+        for level, count in runs:
+            output.append(encode_varint(count << 1))
+            output.append(UINT32.pack(level)[:byte_width])
+        levels = levels.dense
+
+    levels = numpy.asarray(getattr(levels, "array", levels), dtype=numpy.uint32)
+    num = levels.shape[0]
+    if not num:
+        return b"".join(output)
+
+    starts, lengths = find_runs(levels)
+    long_runs = numpy.flatnonzero(lengths >= MIN_RLE_RUN)
+
+    position = 0
+    for start, length in zip(starts[long_runs].tolist(), lengths[long_runs].tolist()):
+        end = start + length
+        if start > position:
+            # BIT-PACKED GROUPS HOLD 8 LEVELS, SO BORROW FROM THIS RUN TO FILL THE LAST GROUP
+            start += (position - start) % 8
+            output.append(_encode_bit_packed(levels[position:start], width))
+        output.append(encode_varint((end - start) << 1))
+        output.append(UINT32.pack(int(levels[start]))[:byte_width])
+        position = end
+    if position < num:
+        output.append(_encode_bit_packed(levels[position:], width))
+    return b"".join(output)
+
+
+def find_runs(levels):
+    """
+    :param levels: numpy ARRAY
+    :return: (starts, lengths) numpy ARRAYS, ONE ENTRY FOR EACH RUN OF EQUAL LEVELS
+    """
+    num = levels.shape[0]
+    if not num:
+        return numpy.zeros(0, dtype=numpy.intp), numpy.zeros(0, dtype=numpy.intp)
+    starts = numpy.concatenate(([0], numpy.flatnonzero(levels[1:] != levels[:-1]) + 1))
+    lengths = numpy.diff(numpy.append(starts, num))
+    return starts, lengths
+
+
+def _encode_bit_packed(levels, width):
+    num_groups = (levels.shape[0] + 7) // 8
+    padding = num_groups * 8 - levels.shape[0]
+    if padding:
+        levels = numpy.concatenate((levels, numpy.zeros(padding, dtype=levels.dtype)))
+    return encode_varint((num_groups << 1) | 1) + pack_bits(levels, width)
+
+
+def decode_levels(data, width, count, offset=0):
+    """
+    :param data: bytes WITH RLE/BIT-PACKED HYBRID ENCODED LEVELS
+    :param width: BIT WIDTH OF EACH LEVEL
+    :param count: NUMBER OF LEVELS TO DECODE
+    :return: (numpy ARRAY OF LEVELS, offset AFTER THE ENCODED LEVELS)
+    """
+    byte_width = (width + 7) // 8
+    output = numpy.empty(count, dtype=numpy.uint32)
+    i = 0
+    while i < count:
+        header, offset = decode_varint(data, offset)
+        if header & 1:
+            num_values = (header >> 1) * 8
+            num_bytes = (header >> 1) * width
+            values = unpack_bits(data, width, num_values, offset)
+            offset += num_bytes
+            num_values = min(num_values, count - i)
+            output[i:i + num_values] = values[:num_values]
+        else:
+            num_values = min(header >> 1, count - i)
+            value, = UINT32.unpack(data[offset:offset + byte_width].ljust(4, b"\0"))
+            offset += byte_width
+            output[i:i + num_values] = value
+        i += num_values
+    return output, offset
+
+
+def encode_indices(indices, dictionary_size):
+    """
+    DICTIONARY INDICES ARE STORED AS ONE BYTE OF BIT WIDTH, FOLLOWED BY
+    RLE/BIT-PACKED HYBRID (WITHOUT LENGTH PREFIX)
+    :param indices: ColumnBuffer, numpy ARRAY, OR LIST OF DICTIONARY INDICES
+    :param dictionary_size: NUMBER OF VALUES IN THE DICTIONARY
+    :return: bytes
+    """
+    width = bit_width(max(dictionary_size - 1, 0))
+    return UINT8.pack(width) + encode_levels(indices, width)
+
+
+def decode_indices(data, count, offset=0):
+    """
+    :return: (numpy ARRAY OF count DICTIONARY INDICES, offset AFTER THE INDICES)
+    """
+    width, = UINT8.unpack_from(data, offset)
+    return decode_levels(data, width, count, offset + 1)
@@ -0,0 +1,556 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import zlib
+from bisect import bisect_right
+
+import numpy
+
+from mo_dots import Data, startswith_field
+from mo_future import binary_type, text_type
+from mo_logs import Log
+from mo_parquet.bloom import BloomFilter
+from mo_parquet.buffer import ColumnBuffer, LevelBuffer, parquet_type_to_numpy_type
+from mo_parquet.encodings import UINT32, bit_width, decode_indices, decode_levels, decode_plain
+from mo_parquet.schema import SchemaTree
+from mo_parquet.statistics import can_match, decode_statistics
+from mo_parquet.table import RowIndex, Table
+from mo_parquet.writer import MAGIC
+from parquet_thrift.parquet.ttypes import BloomFilterHeader, ColumnIndex, CompressionCodec, Encoding, FileMetaData, OffsetIndex, PageHeader, PageType, Statistics
+from thrift_structures import read_thrift
+
+
+class ParquetReader(object):
+    """
+    READ PARQUET FILE, DECODING ONLY THE REQUESTED COLUMNS
+    """
+
+    def __init__(self, file, metadata=None, schema=None):
+        """
+        :param file: FILENAME, OR SEEKABLE BINARY FILE-LIKE OBJECT
+        :param metadata: FileMetaData OF THE FILE, IF ALREADY KNOWN (A NAMED FILE IS THEN NOT OPENED UNTIL A PAGE IS READ)
+        :param schema: SchemaTree OF metadata.schema, IF ALREADY KNOWN
+        """
+        if isinstance(file, (text_type, binary_type)):
+            self.filename = file
+            self.file = None  # OPENED ON FIRST _read()
+            self.close_file = True
+        else:
+            self.filename = None
+            self.file = file
+            self.close_file = False
+
+        if metadata is None:
+            self.file = self._open()
+            self.file.seek(0, io.SEEK_END)
+            size = self.file.tell()
+            tail = self._read(size - 8, 8)
+            if tail[4:] != MAGIC:
+                Log.error("Not a parquet file")
+            footer_length, = UINT32.unpack(tail[:4])
+            metadata = read_thrift(io.BytesIO(self._read(size - 8 - footer_length, footer_length)), FileMetaData)
+        self.metadata = metadata
+        self.schema = schema if schema is not None else SchemaTree.new_instance(self.metadata.schema)
+        self.columns = self.schema.get_parquet_columns()
+        self._page_index = {}  # MAP FROM (row_group, name) TO (OffsetIndex, ColumnIndex)
+        self._bloom_filters = {}  # MAP FROM (row_group, name) TO BloomFilter (OR None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.close_file and self.file:
+            self.file.close()
+        self.file = None
+
+    @property
+    def num_rows(self):
+        return self.metadata.num_rows
+
+    @property
+    def num_row_groups(self):
+        return len(self.metadata.row_groups)
+
+    def _open(self):
+        if self.file is not None:
+            return self.file
+        if self.filename is None:
+            Log.error("Reader is closed")
+        return io.open(self.filename, "rb")
+
+    def _read(self, offset, length):
+        if self.file is None:
+            self.file = self._open()
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def get_columns(self, columns=None):
+        """
+        :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES (None FOR ALL)
+        :return: LIST OF COLUMN DESCRIPTIONS (FROM SchemaTree.get_parquet_columns()), IN FILE ORDER
+        """
+        return select_columns(self.columns, columns)
+
+    def filter_row_groups(self, where, row_groups=None, bloom_filters=True):
+        """
+        :param where: JSON EXPRESSION (eq, in, gt, gte, lt, lte, and, or) ON LEAF COLUMNS
+        :param row_groups: LIST OF ROW GROUP INDEXES TO CONSIDER (None FOR ALL)
+        :param bloom_filters: False TO USE ONLY THE FOOTER (NO FILE ACCESS)
+        :return: INDEXES OF THE ROW GROUPS THAT MAY HAVE ROWS MATCHING where
+                 (eq AND in ARE ALSO CHECKED AGAINST THE BLOOM FILTERS, IF ANY)
+        """
+        if row_groups is None:
+            row_groups = range(self.num_row_groups)
+        if where is None:
+            return list(row_groups)
+        where = _expression(where)
+        columns = {c.name: c for c in self.columns}
+
+        output = []
+        for i in row_groups:
+            row_group = self.metadata.row_groups[i]
+
+            def get_statistics(name):
+                column = columns.get(name)
+                if column is None:
+                    return None, None
+                meta = self._find_chunk(row_group, column).meta_data
+                stats = decode_statistics(meta.statistics, column.element)
+                if stats is not None and bloom_filters and meta.bloom_filter_offset is not None:
+                    stats.bloom = self._bloom_check(i, column)
+                return meta.num_values, stats
+
+            if can_match(where, get_statistics):
+                output.append(i)
+        return output
+
+    def get_page_index(self, row_group, column):
+        """
+        :param row_group: INDEX OF THE ROW GROUP
+        :param column: COLUMN DESCRIPTION (FROM get_columns())
+        :return: (OffsetIndex, ColumnIndex) OF THE COLUMN CHUNK (None FOR THE ONES NOT IN THE FILE)
+        """
+        key = row_group, column.name
+        output = self._page_index.get(key)
+        if output is None:
+            chunk = self._find_chunk(self.metadata.row_groups[row_group], column)
+            output = self._page_index[key] = (
+                self._read_thrift(chunk.offset_index_offset, chunk.offset_index_length, OffsetIndex),
+                self._read_thrift(chunk.column_index_offset, chunk.column_index_length, ColumnIndex)
+            )
+        return output
+
+    def get_bloom_filter(self, row_group, column):
+        """
+        :param row_group: INDEX OF THE ROW GROUP
+        :param column: COLUMN DESCRIPTION (FROM get_columns())
+        :return: BloomFilter OF THE COLUMN CHUNK (None IF IT HAS NONE)
+        """
+        key = row_group, column.name
+        if key not in self._bloom_filters:
+            meta = self._find_chunk(self.metadata.row_groups[row_group], column).meta_data
+            bloom = None
+            if meta.bloom_filter_offset is not None:
+                length = meta.bloom_filter_length
+                if length is None:
+                    # ONLY THE HEADER SIZE IS UNKNOWN, THE BITSET FOLLOWS
+                    header_file = io.BytesIO(self._read(meta.bloom_filter_offset, 64))
+                    header = read_thrift(header_file, BloomFilterHeader)
+                    data = self._read(meta.bloom_filter_offset + header_file.tell(), header.numBytes)
+                else:
+                    header_file = io.BytesIO(self._read(meta.bloom_filter_offset, length))
+                    header = read_thrift(header_file, BloomFilterHeader)
+                    data = header_file.read(header.numBytes)
+                if header.algorithm.BLOCK is not None and header.hash.XXHASH is not None and header.compression.UNCOMPRESSED is not None:
+                    bloom = BloomFilter.from_bytes(data)
+            self._bloom_filters[key] = bloom
+        return self._bloom_filters[key]
+
+    def _bloom_check(self, row_group, column):
+        """
+        :return: FUNCTION FROM VALUE TO False IF THE VALUE IS CERTAINLY NOT IN THE COLUMN CHUNK
+        """
+        def check(value):
+            bloom = self.get_bloom_filter(row_group, column)
+            return bloom is None or bloom.check(value, column.element.type)
+        return check
+
+    def _read_thrift(self, offset, length, thrift_type):
+        if offset is None:
+            return None
+        return read_thrift(io.BytesIO(self._read(offset, length)), thrift_type)
+
+    def filter_rows(self, where, row_group):
+        """
+        :param where: JSON EXPRESSION (SAME AS filter_row_groups())
+        :param row_group: INDEX OF THE ROW GROUP
+        :return: LIST OF (start, stop) RANGES OF ROWS (IN THE ROW GROUP) THAT MAY
+                 MATCH where, ACCORDING TO THE PAGE STATISTICS IN THE ColumnIndex
+        """
+        num_rows = self.metadata.row_groups[row_group].num_rows
+        if where is None:
+            return [(0, num_rows)]
+        where = _expression(where)
+        columns = {c.name: c for c in self.columns}
+
+        # THE PAGES OF THE COLUMNS where USES
+        names = set()
+        can_match(where, lambda name: names.add(name) or (None, None))
+        pages = {}
+        boundaries = {0, num_rows}
+        for name in names:
+            column = columns.get(name)
+            if column is None:
+                continue
+            offset_index, column_index = self.get_page_index(row_group, column)
+            if offset_index is None or column_index is None:
+                continue
+            first_rows = [p.first_row_index for p in offset_index.page_locations]
+            pages[name] = column, first_rows, column_index
+            boundaries.update(first_rows)
+
+        # EVERY RANGE BETWEEN PAGE BOUNDARIES IS IN ONE PAGE OF EACH COLUMN
+        output = []
+        boundaries = sorted(boundaries)
+        for start, stop in zip(boundaries, boundaries[1:]):
+            def get_statistics(name):
+                found = pages.get(name)
+                if found is None:
+                    return None, None
+                column, first_rows, column_index = found
+                i = bisect_right(first_rows, start) - 1
+                null_count = column_index.null_counts[i] if column_index.null_counts else 0
+                if column_index.null_pages[i]:
+                    null_count = max(null_count, 1)
+                    return null_count, Data(min=None, max=None, null_count=null_count)
+                statistics = Statistics(min_value=column_index.min_values[i], max_value=column_index.max_values[i], null_count=null_count)
+                return null_count + 1, decode_statistics(statistics, column.element)  # AT LEAST ONE VALUE
+
+            if can_match(where, get_statistics):
+                if output and output[-1][1] == start:
+                    output[-1] = (output[-1][0], stop)
+                else:
+                    output.append((start, stop))
+        return output
+
+    def read(self, columns=None, row_groups=None, where=None):
+        """
+        :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES, TO READ (None FOR ALL)
+        :param row_groups: LIST OF ROW GROUP INDEXES TO READ (None FOR ALL)
+        :param where: SKIP ROW GROUPS, AND PAGES, WHOSE STATISTICS PROVE NO ROW MATCHES (OTHER ROWS ARE NOT FILTERED)
+        :return: Table WITH ONLY THE REQUESTED COLUMNS
+        """
+        if where is not None:
+            where = _expression(where)
+        ranges = []
+        for i in self.filter_row_groups(where, row_groups):
+            row_ranges = self.filter_rows(where, i)
+            if row_ranges:
+                ranges.append((i, row_ranges))
+        return self._read_ranges(self.get_columns(columns), ranges)
+
+    def read_rows(self, start, stop, columns=None):
+        """
+        :param start: FIRST ROW (OF THE FILE) TO READ
+        :param stop: ROW AFTER THE LAST ROW TO READ
+        :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES, TO READ (None FOR ALL)
+        :return: Table OF THE ROWS, DECODING ONLY THE PAGES THAT HOLD THEM
+        """
+        ranges = []
+        offset = 0
+        for i, row_group in enumerate(self.metadata.row_groups):
+            first = max(start, offset) - offset
+            last = min(stop, offset + row_group.num_rows) - offset
+            if first < last:
+                ranges.append((i, [(first, last)]))
+            offset += row_group.num_rows
+        return self._read_ranges(self.get_columns(columns), ranges)
+
+    def _read_ranges(self, columns, ranges):
+        """
+        :param ranges: LIST OF (row_group, LIST OF (start, stop) ROWS IN THAT ROW GROUP)
+        :return: Table
+        """
+        prefetch = getattr(self.file, "prefetch", None)
+        if prefetch is not None:
+            prefetch(self._byte_ranges(columns, ranges))
+
+        num_rows = 0
+        chunks = {c.name: [] for c in columns}
+        for i, row_ranges in ranges:
+            row_group = self.metadata.row_groups[i]
+            num_rows += sum(stop - start for start, stop in row_ranges)
+            for column in columns:
+                if row_ranges == [(0, row_group.num_rows)]:
+                    chunks[column.name].append(self._read_chunk(row_group, column))
+                else:
+                    chunks[column.name].extend(self._read_rows(i, column, row_ranges))
+
+        values = {}
+        reps = {}
+        defs = {}
+        for column in columns:
+            parts = chunks[column.name]
+            values[column.name] = _concat_values([v for v, _, _ in parts], column.element.type)
+            reps[column.name] = _concat_levels([r for _, r, _ in parts])
+            defs[column.name] = _concat_levels([d for _, _, d in parts])
+
+        return Table(values, reps, defs, num_rows, self.schema)
+
+    def _byte_ranges(self, columns, ranges):
+        """
+        :param ranges: LIST OF (row_group, LIST OF (start, stop) ROWS IN THAT ROW GROUP)
+        :return: LIST OF (offset, length) THE _read_ranges() WILL READ
+        """
+        output = []
+        for i, row_ranges in ranges:
+            row_group = self.metadata.row_groups[i]
+            for column in columns:
+                meta = self._find_chunk(row_group, column).meta_data
+                offset_index = None
+                if row_ranges != [(0, row_group.num_rows)]:
+                    offset_index, _ = self.get_page_index(i, column)
+                if offset_index is None:
+                    start = meta.data_page_offset
+                    if meta.dictionary_page_offset is not None:
+                        start = min(start, meta.dictionary_page_offset)
+                    output.append((start, meta.total_compressed_size))
+                    continue
+                locations = offset_index.page_locations
+                if meta.dictionary_page_offset is not None:
+                    output.append((meta.dictionary_page_offset, locations[0].offset - meta.dictionary_page_offset))
+                for first, stop in _page_runs(locations, row_group.num_rows, row_ranges):
+                    last = locations[stop - 1]
+                    output.append((locations[first].offset, last.offset + last.compressed_page_size - locations[first].offset))
+        return output
+
+    def _read_rows(self, row_group, column, row_ranges):
+        """
+        :param row_ranges: LIST OF (start, stop) ROWS IN THE ROW GROUP
+        :return: LIST OF (values, reps, defs), ONE PER RANGE, DECODED FROM THE PAGES HOLDING THE ROWS
+        """
+        group = self.metadata.row_groups[row_group]
+        meta = self._find_chunk(group, column).meta_data
+        offset_index, _ = self.get_page_index(row_group, column)
+        if offset_index is None:
+            runs = [(0, group.num_rows, self._read_chunk(group, column))]
+        else:
+            locations = offset_index.page_locations
+            first_rows = [p.first_row_index for p in locations] + [group.num_rows]
+            dictionary = b""
+            if meta.dictionary_page_offset is not None:
+                dictionary = self._read(meta.dictionary_page_offset, locations[0].offset - meta.dictionary_page_offset)
+
+            runs = _page_runs(locations, group.num_rows, row_ranges)
+            for run in runs:
+                first, last = locations[run[0]], locations[run[1] - 1]
+                data = dictionary + self._read(first.offset, last.offset + last.compressed_page_size - first.offset)
+                run[:] = first_rows[run[0]], first_rows[run[1]], decode_chunk(data, meta, column)
+
+        output = []
+        for start, stop in row_ranges:
+            for run_start, run_stop, (values, reps, defs) in runs:
+                if run_start <= start and stop <= run_stop:
+                    index = RowIndex(values, reps, defs, run_stop - run_start)
+                    output.append(index.slice(values, reps, defs, start - run_start, stop - run_start))
+                    break
+        return output
+
+    def _find_chunk(self, row_group, column):
+        path = list(column.path_in_schema)
+        for chunk in row_group.columns:
+            if chunk.meta_data.path_in_schema == path:
+                return chunk
+        Log.error("Column {{name|quote}} is missing from row group", name=column.name)
+
+    def _read_chunk(self, row_group, column):
+        """
+        :return: (values, reps, defs) AS numpy ARRAYS
+        """
+        meta = self._find_chunk(row_group, column).meta_data
+        start = meta.data_page_offset
+        if meta.dictionary_page_offset is not None:
+            start = min(start, meta.dictionary_page_offset)
+        data = self._read(start, meta.total_compressed_size)
+        return decode_chunk(data, meta, column)
+
+
+def _page_runs(locations, num_rows, row_ranges):
+    """
+    :param locations: PageLocation OF EACH PAGE IN THE CHUNK
+    :param num_rows: ROWS IN THE ROW GROUP
+    :param row_ranges: LIST OF (start, stop) ROWS IN THE ROW GROUP
+    :return: LIST OF [first, stop) PAGE INDEXES, RUNS OF CONSECUTIVE PAGES WITH ROWS IN row_ranges
+    """
+    first_rows = [p.first_row_index for p in locations] + [num_rows]
+    wanted = [
+        i
+        for i in range(len(locations))
+        if any(start < first_rows[i + 1] and first_rows[i] < stop for start, stop in row_ranges)
+    ]
+    runs = []
+    for i in wanted:
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return runs
+
+
+def decode_chunk(data, meta, column):
+    """
+    :param data: bytes OF THE WHOLE COLUMN CHUNK
+    :param meta: ColumnMetaData
+    :param column: COLUMN DESCRIPTION (FROM SchemaTree.get_parquet_columns())
+    :return: (values, reps, defs) AS numpy ARRAYS
+    """
+    rep_width = bit_width(column.max_repetition_level)
+    def_width = bit_width(column.max_definition_level)
+    file = io.BytesIO(data)
+    dictionary = None
+    all_values, all_reps, all_defs = [], [], []
+    num_values = 0
+    while num_values < meta.num_values and file.tell() < len(data):
+        header = read_thrift(file, PageHeader)
+        body = file.read(header.compressed_page_size)
+
+        if header.type == PageType.DATA_PAGE:
+            body = decompress(body, meta.codec, header.uncompressed_page_size)
+            page = header.data_page_header
+            count = page.num_values
+            offset = 0
+            if rep_width:
+                length, = UINT32.unpack(body[offset:offset + 4])
+                reps, _ = decode_levels(body, rep_width, count, offset + 4)
+                offset += 4 + length
+            else:
+                reps = numpy.zeros(count, dtype=numpy.uint32)
+            if def_width:
+                length, = UINT32.unpack(body[offset:offset + 4])
+                defs, _ = decode_levels(body, def_width, count, offset + 4)
+                offset += 4 + length
+            else:
+                defs = numpy.zeros(count, dtype=numpy.uint32)
+        elif header.type == PageType.DATA_PAGE_V2:
+            page = header.data_page_header_v2
+            count = page.num_values
+            rep_length = page.repetition_levels_byte_length
+            def_length = page.definition_levels_byte_length
+            if rep_width:
+                reps, _ = decode_levels(body, rep_width, count, 0)
+            else:
+                reps = numpy.zeros(count, dtype=numpy.uint32)
+            if def_width:
+                defs, _ = decode_levels(body, def_width, count, rep_length)
+            else:
+                defs = numpy.zeros(count, dtype=numpy.uint32)
+            levels_length = rep_length + def_length
+            if page.is_compressed is None or page.is_compressed:
+                body = body[:levels_length] + decompress(body[levels_length:], meta.codec, header.uncompressed_page_size - levels_length)
+            offset = levels_length
+        elif header.type == PageType.DICTIONARY_PAGE:
+            body = decompress(body, meta.codec, header.uncompressed_page_size)
+            dictionary, _ = decode_plain(body, column.element.type, header.dictionary_page_header.num_values)
+            continue
+        else:
+            continue  # INDEX PAGES ARE NOT NEEDED
+
+        num_defined = int(numpy.count_nonzero(defs == column.max_definition_level))
+        if page.encoding == Encoding.PLAIN:
+            values, _ = decode_plain(body, column.element.type, num_defined, offset)
+        elif page.encoding in (Encoding.PLAIN_DICTIONARY, Encoding.RLE_DICTIONARY):
+            if dictionary is None:
+                Log.error("Expecting dictionary page before {{name|quote}} data", name=column.name)
+            indices, _ = decode_indices(body, num_defined, offset)
+            values = dictionary[indices]
+        else:
+            Log.error("Do not know how to decode {{encoding}}", encoding=Encoding._VALUES_TO_NAMES.get(page.encoding))
+
+        all_values.append(values)
+        all_reps.append(reps)
+        all_defs.append(defs)
+        num_values += count
+
+    if not all_values:
+        return numpy.empty(0, dtype=parquet_type_to_numpy_type.get(column.element.type, object)), numpy.zeros(0, dtype=numpy.uint32), numpy.zeros(0, dtype=numpy.uint32)
+    return numpy.concatenate(all_values), numpy.concatenate(all_reps), numpy.concatenate(all_defs)
+
+
+def decompress(data, codec, uncompressed_size):
+    if codec == CompressionCodec.UNCOMPRESSED:
+        return data
+    elif codec == CompressionCodec.GZIP:
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    elif codec == CompressionCodec.SNAPPY:
+        try:
+            import snappy
+        except Exception as e:
+            Log.error("Install python-snappy to read SNAPPY compressed files", cause=e)
+        return snappy.decompress(data)
+    Log.error("Do not know how to decompress {{codec}}", codec=CompressionCodec._VALUES_TO_NAMES.get(codec))
+
+
+def select_columns(all_columns, columns=None):
+    """
+    :param all_columns: LIST OF COLUMN DESCRIPTIONS (FROM SchemaTree.get_parquet_columns())
+    :param columns: LIST OF LEAF PATHS, OR PATH PREFIXES (None FOR ALL)
+    :return: THE all_columns MATCHING columns, IN THE all_columns ORDER
+    """
+    if columns is None:
+        return all_columns
+    output = []
+    for name in columns:
+        found = [c for c in all_columns if startswith_field(c.name, name)]
+        if not found:
+            Log.error("Column {{name|quote}} not found", name=name)
+        output.extend(c for c in found if c not in output)
+    return sorted(output, key=all_columns.index)
+
+
+def _expression(where):
+    from jx_base.expressions import Expression, jx_expression
+
+    if isinstance(where, Expression):
+        return where
+    return jx_expression(where)
+
+
+def _concat_values(arrays, parquet_type):
+    total = sum(len(a) for a in arrays)
+    output = ColumnBuffer(parquet_type_to_numpy_type.get(parquet_type, object), total)
+    for a in arrays:
+        output.extend_array(a)
+    return output
+
+
+def _concat_levels(arrays):
+    total = sum(len(a) for a in arrays)
+    max_level = max(int(a.max()) if len(a) else 0 for a in arrays) if arrays else 0
+    output = LevelBuffer(total, numpy.uint8 if max_level <= 255 else numpy.uint16)
+    for a in arrays:
+        output.extend_array(a.astype(output.dtype))
+    return output
+
+
+def read_table(file, columns=None, where=None):
+    """
+    :param file: FILENAME, OR SEEKABLE BINARY FILE-LIKE OBJECT
+    :param columns: LIST OF LEAF PATHS TO READ (None FOR ALL)
+    :param where: SKIP ROW GROUPS THAT CAN NOT MATCH THIS FILTER
+    :return: Table
+    """
+    with ParquetReader(file) as reader:
+        return reader.read(columns, where=where)
@@ -0,0 +1,262 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import threading
+
+from mo_logs import Log
+
+DEFAULT_FOOTER_BYTES = 64 * 1024  # THE FIRST (SUFFIX) REQUEST, ENOUGH FOR MOST FOOTERS
+DEFAULT_MAX_GAP = 1024 * 1024  # FETCHING (AND DROPPING) A GAP THIS BIG COSTS LESS THAN ANOTHER REQUEST
+DEFAULT_MAX_REQUEST = 64 * 1024 * 1024
+DEFAULT_THREADS = 8
+
+
+class RemoteFile(object):
+    """
+    READ-ONLY, SEEKABLE FILE OVER HTTP RANGE REQUESTS (EG AN S3 OBJECT), TO GIVE TO ParquetReader
+    THE FOOTER IS FETCHED WITH ONE SUFFIX REQUEST, AND THE COLUMN CHUNKS OF EACH
+    ParquetReader.read() WITH A FEW COALESCED, CONCURRENT, REQUESTS (SEE prefetch())
+    """
+
+    def __init__(
+        self,
+        url,
+        session=None,
+        headers=None,
+        footer_bytes=DEFAULT_FOOTER_BYTES,
+        max_gap=DEFAULT_MAX_GAP,
+        max_request=DEFAULT_MAX_REQUEST,
+        threads=DEFAULT_THREADS
+    ):
+        """
+        :param url: http(s) URL (EG A PUBLIC, OR PRESIGNED, S3 URL), OR s3://bucket/key OF A PUBLIC OBJECT
+        :param session: requests.Session TO USE (EG ONE THAT SIGNS REQUESTS), SHARED BY ALL THE
+                        prefetch() THREADS, SO IT MUST BE THREAD-SAFE (OR USE threads=1).
+                        None FOR A NEW Session PER THREAD
+        :param headers: EXTRA HEADERS FOR EVERY REQUEST
+        :param footer_bytes: SIZE OF THE SUFFIX REQUESTED FIRST
+        :param max_gap: RANGES SEPARATED BY NO MORE THAN THIS MANY BYTES ARE FETCHED TOGETHER
+        :param max_request: MERGED RANGES ARE NO LARGER THAN THIS
+        :param threads: MAXIMUM CONCURRENT REQUESTS
+        """
+        self.own_sessions = session is None
+        self.session = _new_session() if session is None else session
+        self._worker_sessions = []  # ONE PER prefetch() THREAD, WHEN WE OWN THE SESSIONS
+        self.url = http_url(url)
+        self.headers = dict(headers or {})
+        self.footer_bytes = footer_bytes
+        self.max_gap = max_gap
+        self.max_request = max_request
+        self.threads = threads
+
+        self.size = None  # KNOWN AFTER THE FIRST REQUEST
+        self.position = 0
+        self._tail = None  # (offset, bytes) OF THE SUFFIX REQUEST, KEPT UNTIL close()
+        self._blocks = []  # (offset, bytes) OF THE LAST prefetch()
+        self.num_requests = 0
+        self.bytes_fetched = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._tail = None
+        self._blocks = []
+        if self.own_sessions:
+            for session in [self.session] + self._worker_sessions:
+                if session is not None:
+                    session.close()
+        self._worker_sessions = []
+        self.session = None
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self._get_size()
+        if offset < 0:
+            Log.error("Can not seek to {{offset}}", offset=offset)
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, length=-1):
+        start = self.position
+        size = self._get_size()
+        stop = size if length is None or length < 0 else min(start + length, size)
+        data = self._cached(start, stop)
+        if data is None:
+            data = self._get(start, stop)
+            self.num_requests += 1
+            self.bytes_fetched += len(data)
+        self.position = start + len(data)
+        return data
+
+    def prefetch(self, ranges):
+        """
+        FETCH THE BYTE ranges, SO THE read()S THAT FOLLOW NEED NO REQUESTS
+        NEARBY RANGES ARE MERGED (SEE coalesce()), AND THE MERGED RANGES ARE FETCHED
+        CONCURRENTLY. THE BYTES OF THE PREVIOUS prefetch() ARE RELEASED.
+        :param ranges: LIST OF (offset, length)
+        """
+        self._blocks = []
+        self._get_size()
+        wanted = [(o, o + n) for o, n in ranges if n > 0 and self._cached(o, o + n) is None]
+        merged = coalesce(wanted, self.max_gap, self.max_request)
+        if len(merged) == 1 or self.threads <= 1:
+            blocks = [(start, self._get(start, stop)) for start, stop in merged]
+        else:
+            blocks = self._get_all(merged)
+        self.num_requests += len(merged)
+        self.bytes_fetched += sum(len(data) for _, data in blocks)
+        self._blocks = blocks
+
+    def _get_size(self):
+        if self.size is None:
+            self._get_tail()
+        return self.size
+
+    def _cached(self, start, stop):
+        """
+        :return: BYTES [start, stop) IF ALREADY FETCHED, ELSE None
+        """
+        for offset, data in ([self._tail] if self._tail else []) + self._blocks:
+            if offset <= start and stop <= offset + len(data):
+                return data[start - offset:stop - offset]
+        return None
+
+    def _get_tail(self):
+        response = self._request("bytes=-" + str(self.footer_bytes))
+        data = response.content
+        if response.status_code == 200:
+            # THE SERVER IGNORED THE Range, THIS IS THE WHOLE FILE
+            self.size = len(data)
+        else:
+            self.size = int(response.headers["Content-Range"].split("/")[-1])
+        self._tail = (self.size - len(data), data)
+        self.num_requests += 1
+        self.bytes_fetched += len(data)
+
+    def _get(self, start, stop, session=None):
+        """
+        :param session: requests.Session TO USE (DEFAULT self.session)
+        :return: BYTES [start, stop) OF THE FILE
+        """
+        if stop <= start:
+            return b""
+        response = self._request("bytes=" + str(start) + "-" + str(stop - 1), session)
+        if response.status_code == 200:
+            return response.content[start:stop]
+        return response.content
+
+    def _get_all(self, ranges):
+        """
+        :param ranges: LIST OF (start, stop)
+        :return: LIST OF (start, bytes), FETCHED BY (AT MOST) self.threads WORKERS
+        (PLAIN threading, SO join() RETURNS ONLY WHEN EACH WORKER HAS ENDED)
+        """
+        from mo_logs.exceptions import Except
+
+        if self.session is None:
+            Log.error("File is closed")
+        num_workers = min(self.threads, len(ranges))
+        if self.own_sessions:
+            while len(self._worker_sessions) < num_workers:
+                self._worker_sessions.append(_new_session())
+            sessions = self._worker_sessions[:num_workers]
+        else:
+            sessions = [self.session] * num_workers
+
+        todo = list(reversed(ranges))
+        lock = threading.Lock()
+        results = {}
+
+        def worker(session):
+            while True:
+                with lock:
+                    if not todo:
+                        return
+                    start, stop = todo.pop()
+                try:
+                    results[start] = self._get(start, stop, session)
+                except Exception as e:
+                    results[start] = Except.wrap(e)
+
+        workers = [
+            threading.Thread(target=worker, args=(session,), name="remote range " + str(i))
+            for i, session in enumerate(sessions)
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        output = []
+        for start, stop in ranges:
+            data = results.get(start)
+            if not isinstance(data, bytes):
+                Log.error("Problem fetching bytes {{start}}-{{stop}} of {{url|quote}}", start=start, stop=stop, url=self.url, cause=data)
+            output.append((start, data))
+        return output
+
+    def _request(self, byte_range, session=None):
+        if self.session is None:
+            Log.error("File is closed")
+        headers = dict(self.headers)
+        headers["Range"] = byte_range
+        response = (session or self.session).get(self.url, headers=headers)
+        if response.status_code not in (200, 206):
+            Log.error("Can not read {{url|quote}} (HTTP {{status}})", url=self.url, status=response.status_code)
+        return response
+
+
+def _new_session():
+    import requests
+
+    return requests.Session()
+
+
+def coalesce(ranges, max_gap=DEFAULT_MAX_GAP, max_request=DEFAULT_MAX_REQUEST):
+    """
+    MERGE NEARBY BYTE RANGES, TO MAKE FEWER REQUESTS
+    :param ranges: LIST OF (start, stop)
+    :param max_gap: RANGES SEPARATED BY NO MORE THAN THIS ARE MERGED
+    :param max_request: MERGED RANGES ARE NO LARGER THAN THIS (LARGER ORIGINAL RANGES ARE KEPT WHOLE)
+    :return: SORTED LIST OF (start, stop), COVERING ALL ranges
+    """
+    output = []
+    for start, stop in sorted(ranges):
+        if output:
+            last_start, last_stop = output[-1]
+            if start - last_stop <= max_gap and max(stop, last_stop) - last_start <= max_request:
+                output[-1] = last_start, max(stop, last_stop)
+                continue
+        output.append((start, stop))
+    return output
+
+
+def http_url(url):
+    """
+    :return: url, WITH s3://bucket/key CONVERTED TO ITS (VIRTUAL-HOSTED) https URL
+    """
+    if url.startswith("s3://"):
+        bucket, _, key = url[5:].partition("/")
+        if not bucket or not key:
+            Log.error("Expecting s3://bucket/key, not {{url|quote}}", url=url)
+        return "https://" + bucket + ".s3.amazonaws.com/" + key
+    return url
@@ -11,30 +11,46 @@ from __future__ import division
 from __future__ import unicode_literals
 
 from collections import Mapping
+from copy import copy, deepcopy
 
-from jx_base import NESTED, python_type_to_json_type, OBJECT
 from mo_dots import concat_field, split_field, join_field, Data, coalesce
 from mo_future import none_type
 from mo_future import sort_using_key, PY2, text_type
 from mo_logs import Log
 from parquet_thrift.parquet.ttypes import Type, FieldRepetitionType, SchemaElement, ConvertedType
-from pyLibrary.env.typed_inserter import json_type_to_inserter_type
 from thrift_structures import parquet_thrift
 
+# JSON TYPES (SAME AS jx_base) AND TYPED PROPERTY NAMES (SAME AS mo_json.typed_encoder),
+# DECLARED HERE SO IMPORTING mo_parquet DOES NOT IMPORT THOSE PACKAGES
+BOOLEAN = 'boolean'
+INTEGER = 'integer'
+NUMBER = 'number'
+STRING = 'string'
+OBJECT = 'object'
+NESTED = "nested"
+
+TYPE_PREFIX = "~"
+BOOLEAN_TYPE = TYPE_PREFIX + "b~"
+NUMBER_TYPE = TYPE_PREFIX + "n~"
+STRING_TYPE = TYPE_PREFIX + "s~"
+NESTED_TYPE = TYPE_PREFIX + "N~"
+
 REQUIRED = FieldRepetitionType.REQUIRED
 OPTIONAL = FieldRepetitionType.OPTIONAL
 REPEATED = FieldRepetitionType.REPEATED
 
 DEFAULT_RECORD = SchemaElement(name='.', repetition_type=REQUIRED)   # DREMEL ASSUME ALL RECORDS ARE REQUIRED
+DEFAULT_RECORD_PICKLE = "DEFAULT_RECORD"
 
 
 class SchemaTree(object):
 
-    def __init__(self, locked=False):
+    def __init__(self, locked=False, element=DEFAULT_RECORD):
         """
         :param locked: DO NOT ALLOW SCHEMA EXPANSION
+        :param element: SchemaElement FOR THIS NODE (None IF NOT KNOWN YET)
         """
-        self.element = DEFAULT_RECORD
+        self.element = element
         self.more = {}  # MAP FROM NAME TO MORE SchemaTree
         self.diff_schema = []  # PLACEHOLDER OR NET-NEW COLUMNS ADDED DURING SCHEMA EXPANSION
         self.locked = locked
@@ -93,66 +109,242 @@ class SchemaTree(object):
     def __getitem__(self, name):
         def _get(node, path):
             if not path:
-                return self.element
-
+                if node.element.type is None and '.' in node.more:
+                    # REPEATED VALUES ARE HELD BY THE '.' CHILD
+                    return _get(node.more['.'], path)
+                return node.element
+            if path[0] not in node.more and '.' in node.more:
+                return _get(node.more['.'], path)
             return _get(node.more[path[0]], path[1:])
 
         return _get(self, split_field(name))
 
+    def get_nodes(self, name):
+        """
+        :param name: FULL NAME OF A LEAF
+        :return: LIST OF SchemaTree NODES ON THE PATH TO THE LEAF (NOT INCLUDING self), INCLUDING '.' NODES
+        """
+        output = []
+        node = self
+        path = split_field(name)
+        while path or (node.element is not None and node.element.type is None and '.' in node.more):
+            if path and path[0] in node.more:
+                node = node.more[path[0]]
+                path = path[1:]
+            elif '.' in node.more:
+                node = node.more['.']
+            else:
+                Log.error("{{name|quote}} not found in schema", name=name)
+            output.append(node)
+        return output
+
+    def definition_level(self, name):
+        """
+        :param name: FULL NAME OF A LEAF
+        :return: MAX DEFINITION LEVEL OF THE LEAF
+        """
+        return sum(
+            1
+            for node in self.get_nodes(name)
+            if node.element is not None and node.element is not DEFAULT_RECORD and node.element.repetition_type != REQUIRED
+        )
+
+    @property
+    def is_typed(self):
+        """
+        :return: True IF THE CHILDREN ARE THE PER-TYPE COLUMNS OF A POLYMORPHIC PROPERTY
+        """
+        return bool(self.more) and all(name.startswith(TYPE_PREFIX) for name in self.more)
+
+    def split(self, name):
+        """
+        TURN THIS PRIMITIVE LEAF INTO A TYPED NODE: THE ELEMENT MOVES TO THE
+        CHILD NAMED FOR ITS TYPE (mo_json.typed_encoder CONVENTION), SO VALUES
+        OF OTHER TYPES CAN BE ADDED AS SIBLINGS
+        :param name: FULL NAME OF THIS NODE
+        :return: NAME OF THE CHILD NOW HOLDING THE ELEMENT
+        """
+        element = self.element
+        if element.repetition_type == REPEATED:
+            Log.error("Expecting {{name|quote}} to have one type", name=name)
+        type_name = parquet_type_to_type_name[element.type]
+        self.element = SchemaElement(name=name, repetition_type=element.repetition_type)
+        self.more[type_name] = SchemaTree(element=SchemaElement(
+            name=concat_field(name, type_name),
+            type=element.type,
+            converted_type=element.converted_type,
+            type_length=element.type_length,
+            repetition_type=OPTIONAL
+        ))
+        return type_name
+
+    def union(self, other):
+        """
+        ADD THE PROPERTIES OF other TO THIS SCHEMA
+        ELEMENTS ALREADY IN THIS SCHEMA WIN, LIKE THEY DO WHEN THE SCHEMA EXPANDS DURING SHREDDING,
+        EXCEPT PRIMITIVES OF DIFFERENT TYPES, WHICH ARE SPLIT INTO TYPED CHILDREN (OR INT64 IS PROMOTED TO DOUBLE)
+        :param other: SchemaTree
+        :return: self
+        """
+        if _is_primitive(self) and other.element is not None and (other.is_typed or (_is_primitive(other) and other.element.type != self.element.type)):
+            if {self.element.type, other.element.type} == {Type.INT64, Type.DOUBLE}:
+                promote(self.element)
+            else:
+                self.split(self.element.name)
+        if self.is_typed and _is_primitive(other):
+            type_name = parquet_type_to_type_name[other.element.type]
+            typed = SchemaTree(element=copy(self.element))
+            typed.more[type_name] = SchemaTree(element=copy(other.element))
+            typed.more[type_name].element.name = concat_field(self.element.name, type_name)
+            typed.more[type_name].element.repetition_type = OPTIONAL
+            other = typed
+
+        if self.element is None:
+            self.element = copy(other.element)
+        elif (
+            other.element is not None and
+            self.element is not DEFAULT_RECORD and
+            other.element is not DEFAULT_RECORD and
+            (self.element.repetition_type == REPEATED) != (other.element.repetition_type == REPEATED)
+        ):
+            Log.error("Can not merge {{name|quote}}, it is repeated in only one schema", name=self.element.name)
+        elif other.element is not None and other.element.type_length is not None:
+            self.element.type_length = max(coalesce(self.element.type_length, 0), other.element.type_length)
+
+        for name, other_child in other.more.items():
+            child = self.more.get(name)
+            if child is None:
+                self.more[name] = deepcopy(other_child)
+            else:
+                child.union(other_child)
+        return self
+
+    def __getstate__(self):
+        if self.element is DEFAULT_RECORD:
+            # KEEP DEFAULT_RECORD A SINGLETON, SO IDENTITY CHECKS WORK AFTER PICKLING
+            return dict(self.__dict__, element=DEFAULT_RECORD_PICKLE)
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.element == DEFAULT_RECORD_PICKLE:
+            self.element = DEFAULT_RECORD
+
     @staticmethod
     def new_instance(parquet_schema):
+        """
+        :param parquet_schema: LIST OF SchemaElement, AS FOUND IN FileMetaData.schema
+        :return: SchemaTree
+        """
         index = [0]
 
-        def _worker(start):
+        def _worker(path):
+            element = parquet_schema[index[0]]
+            index[0] += 1
+
             output = SchemaTree()
-            root = parquet_schema[index[0]]
-
-            output.element = root
-            max = start + root.num_children
-            while index[0] < max:
-                name = join_field(split_field(parquet_schema[index[0]].name)[-1:])
-                index[0] += 1
-                child = _worker(index[0])
-                output.more[name] = child
+            output.element = SchemaElement(
+                name=join_field(path),
+                type=element.type,
+                type_length=element.type_length,
+                repetition_type=element.repetition_type,
+                converted_type=element.converted_type,
+                scale=element.scale,
+                precision=element.precision,
+                field_id=element.field_id
+            )
+            for _ in range(element.num_children or 0):
+                name = parquet_schema[index[0]].name
+                output.more[name] = _worker(path + [name])
             return output
 
-        output = _worker(0).more['.']
-        output.element = SchemaElement(
-            name='.',
-            repetition_type=REQUIRED
-        )
-
+        output = _worker([])
+        output.element = DEFAULT_RECORD
+        return output
 
     @property
     def leaves(self):
-        output = set(
+        """
+        :return: NAMES OF THE PROPERTIES THAT HOLD VALUES
+        """
+        if not self.more:
+            if self.element is None or self.element is DEFAULT_RECORD:
+                return set()
+            return {self.element.name}
+
+        return set(
             leaf
             for name, child_schema in self.more.items()
             for leaf in child_schema.leaves
         )
-        output.add(self.element.name)
-
-        return output
 
     def get_parquet_metadata(
         self,
-        path='.'
+        path=None
     ):
         """
         OUTPUT PARQUET METADATA COLUMNS
-        :param path: FOR INTERNAL USE
-        :return: LIST OF SchemaElement
+        :param path: FOR INTERNAL USE (NAME OF THIS NODE, None FOR ROOT)
+        :return: LIST OF SchemaElement, DEPTH-FIRST, STARTING WITH ROOT
         """
         children = []
+        num_children = 0
         for name, child_schema in sort_using_key(self.more.items(), lambda p: p[0]):
-            children.extend(child_schema.get_parquet_metadata(concat_field(path, name)))
-        if self.element.type:
-            children.append(self.element)
+            child_elements = child_schema.get_parquet_metadata(name)
+            if child_elements:
+                children.extend(child_elements)
+                num_children += 1
+
+        if path is None:
+            return [parquet_thrift.SchemaElement(
+                name='.',
+                num_children=num_children
+            )] + children
+        elif num_children:
+            return [parquet_thrift.SchemaElement(
+                name=path,
+                repetition_type=self.element.repetition_type,
+                num_children=num_children
+            )] + children
+        elif self.element is not None and self.element.type is not None:
+            return [parquet_thrift.SchemaElement(
+                name=path,
+                type=self.element.type,
+                type_length=self.element.type_length if self.element.type == Type.FIXED_LEN_BYTE_ARRAY else None,
+                repetition_type=self.element.repetition_type,
+                converted_type=self.element.converted_type
+            )]
+        else:
+            return []  # NO VALUES TO STORE
 
-        return [parquet_thrift.SchemaElement(
-            name=path,
-            num_children=len(children)
-        )] + children
+    def get_parquet_columns(self):
+        """
+        :return: LIST OF COLUMN DESCRIPTIONS, IN THE SAME ORDER AS get_parquet_metadata()
+        """
+        output = []
+
+        def _columns(node, names, max_repetition_level, max_definition_level):
+            element = node.element
+            if element is not None and element is not DEFAULT_RECORD:
+                if element.repetition_type == REPEATED:
+                    max_repetition_level += 1
+                if element.repetition_type != REQUIRED:
+                    max_definition_level += 1
+
+            if node.more:
+                for name, child in sort_using_key(node.more.items(), lambda p: p[0]):
+                    _columns(child, names + [name], max_repetition_level, max_definition_level)
+            elif element is not None and element.type is not None:
+                output.append(Data(
+                    name=join_field(names),
+                    path_in_schema=names,
+                    element=element,
+                    max_repetition_level=max_repetition_level,
+                    max_definition_level=max_definition_level
+                ))
+
+        _columns(self, [], 0, 0)
+        return output
 
     def max_definition_level(self):
         self_level = 1 if self.element and self.element.repetition_type != REQUIRED else 0
@@ -178,6 +370,23 @@ def get_repetition_type(jtype):
     return FieldRepetitionType.REPEATED if jtype is NESTED else FieldRepetitionType.OPTIONAL
 
 
+def _is_primitive(node):
+    return not node.more and node.element is not None and node.element.type is not None
+
+
+MAX_SAFE_INTEGER = 2 ** 53  # LARGEST INTEGER A DOUBLE HOLDS EXACTLY
+
+
+def promote(element):
+    """
+    WIDEN AN INT64 ELEMENT TO DOUBLE, SO IT CAN HOLD ALL JSON NUMBERS
+    (INTEGERS BEYOND 2^53 LOSE PRECISION)
+    """
+    element.type = Type.DOUBLE
+    element.converted_type = None
+    element.type_length = all_type_to_length[float]
+
+
 def merge_schema_element(element, name, value, ptype, ltype, dtype, jtype, ittype, length):
     if not element:
         output = parquet_thrift.SchemaElement(
@@ -211,7 +420,7 @@ all_type_to_parquet_logical_type = {
     none_type: None,
     bool: None,
     text_type: ConvertedType.UTF8,
-    int: ConvertedType.UINT_64,
+    int: ConvertedType.INT_64,
     float: None,
     dict: None,
     object: None,
@@ -233,10 +442,49 @@ all_type_to_length = {
     list: None
 }
 
+# MAP FROM PARQUET TYPE TO THE PYTHON TYPES IT CAN HOLD
+parquet_type_to_python_types = {
+    Type.BOOLEAN: (bool,),
+    Type.BYTE_ARRAY: (text_type,),
+    Type.INT64: (int,),
+    Type.DOUBLE: (float,)
+}
+
+# NAME OF THE TYPED CHILD (mo_json.typed_encoder) HOLDING VALUES OF EACH TYPE
+parquet_type_to_type_name = {
+    Type.BOOLEAN: BOOLEAN_TYPE,
+    Type.BYTE_ARRAY: STRING_TYPE,
+    Type.INT64: NUMBER_TYPE,
+    Type.DOUBLE: NUMBER_TYPE
+}
+
+python_type_to_json_type = {
+    none_type: OBJECT,
+    bool: BOOLEAN,
+    text_type: STRING,
+    int: INTEGER,
+    float: NUMBER,
+    dict: OBJECT,
+    object: OBJECT,
+    Data: OBJECT,
+    Mapping: OBJECT,
+    list: NESTED
+}
+
+json_type_to_inserter_type = {
+    BOOLEAN: BOOLEAN_TYPE,
+    INTEGER: NUMBER_TYPE,
+    NUMBER: NUMBER_TYPE,
+    STRING: STRING_TYPE,
+    NESTED: NESTED_TYPE
+}
+
 if PY2:
+    python_type_to_json_type[long] = NUMBER
     all_type_to_parquet_type[long] = Type.INT64
-    all_type_to_parquet_logical_type[long] = ConvertedType.UINT_64
+    all_type_to_parquet_logical_type[long] = ConvertedType.INT_64
     all_type_to_length[long] = 8
+    parquet_type_to_python_types[Type.INT64] = (int, long)
 
 
 # MAP FROM PYTHON TYPE TO (parquet_type, parquet_logical_type, json_type, inserter_type)
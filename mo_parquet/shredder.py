@@ -0,0 +1,832 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+from itertools import islice
+from multiprocessing import Pool
+from timeit import default_timer as timer
+
+import numpy
+
+from mo_dots import Data, concat_field, coalesce
+from mo_future import binary_type
+from mo_logs import Log
+from mo_parquet.buffer import ColumnBuffer, LevelBuffer, MAX_DICTIONARY_BYTES
+from mo_parquet.schema import MAX_SAFE_INTEGER, SchemaTree, merge_schema_element, promote, python_type_to_all_types, REQUIRED, REPEATED, OPTIONAL, DEFAULT_RECORD, parquet_type_to_python_types
+from mo_parquet.schema import BOOLEAN_TYPE, NUMBER_TYPE, STRING_TYPE, OBJECT, NESTED, STRING
+from parquet_thrift.parquet.ttypes import SchemaElement, Type
+from mo_parquet.table import Table, null_levels
+
+DEFAULT_BATCH_SIZE = 10000  # RECORDS PER PARALLEL TASK
+LEVEL_BYTES = 2  # ONE BYTE FOR EACH OF THE REPETITION AND DEFINITION LEVEL
+
+
+class ColumnShredder(object):
+    """
+    SHRED A STREAM OF RECORDS INTO COLUMNS, EMITTING A Table (ROW GROUP)
+    EACH TIME THE ROW, OR BYTE, BUDGET IS REACHED
+
+    THE SchemaTree IS SHARED BY ALL ROW GROUPS, AND CONTINUES TO EXPAND AS
+    NEW PROPERTIES ARE FOUND, SO EARLY ROW GROUPS MAY BE MISSING COLUMNS
+    """
+
+    def __init__(self, schema=None, max_rows=None, max_bytes=None, max_dictionary_bytes=MAX_DICTIONARY_BYTES, stats=None):
+        """
+        :param schema: Known schema, will be extended to include all properties found in data
+        :param max_rows: Flush row group when it has this many rows
+        :param max_bytes: Flush row group when its values and levels take (approximately) this many bytes
+        :param max_dictionary_bytes: Stop dictionary encoding a string column when its distinct values take this many bytes (0 for never)
+        :param stats: ShredStats TO FILL WITH INSTRUMENTATION (None FOR NO INSTRUMENTATION)
+        """
+        if not schema:
+            schema = SchemaTree()
+        self.schema = schema
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_dictionary_bytes = max_dictionary_bytes
+        self.stats = stats
+        self._flushed = set()  # LEAVES IN ROW GROUPS ALREADY FLUSHED
+        self._reset()
+
+    def _reset(self):
+        all_leaves = self.schema.leaves
+        self.values = {full_name: ColumnBuffer.new_instance(self.schema[full_name].type, self.max_dictionary_bytes) for full_name in all_leaves}
+        self.reps = {full_name: LevelBuffer() for full_name in all_leaves}
+        self.defs = {full_name: LevelBuffer() for full_name in all_leaves}
+        self.num_rows = 0
+        self._new_leaves = []  # LEAVES FOUND WHILE SHREDDING THE CURRENT ROW
+        self._size = [0]  # BYTES IN CURRENT ROW GROUP (A CELL, SO PLANS CAN UPDATE IT)
+        self._invalidate()
+
+    def _invalidate(self):
+        """
+        CALLED WHEN SCHEMA EXPANDS (OR BUFFERS ARE REPLACED) SO THE PLAN IS RECOMPILED
+        """
+        valid = getattr(self, "_valid", None)
+        if valid:
+            valid[0] = False  # RUNNING PLAN WILL FALL BACK TO _value_to_column
+        self._valid = [True]
+        self._plan = None
+
+    @property
+    def num_bytes(self):
+        return self._size[0]
+
+    @property
+    def is_full(self):
+        """
+        :return: True IF THE CURRENT ROW GROUP HAS REACHED ITS BUDGET
+        """
+        if self.max_rows and self.num_rows >= self.max_rows:
+            return True
+        if self.max_bytes and self._size[0] >= self.max_bytes:
+            return True
+        return False
+
+    def append(self, row):
+        """
+        SHRED ONE RECORD INTO THE CURRENT ROW GROUP
+        """
+        size = self._size[0]
+        try:
+            self._shred(row)
+            if self._new_leaves:
+                stats = self.stats
+                start = timer() if stats else None
+                while self._new_leaves:
+                    self._reshred(row, size)
+                if stats:
+                    stats.num_reshreds += 1
+                    stats.reshred_seconds += timer() - start
+        except Exception as e:
+            self._rollback(size)
+            Log.error("can not encode {{row|json}}", row=row, cause=e)
+        self.num_rows += 1
+
+    def _shred(self, row):
+        plan = self._plan
+        if plan is None:
+            plan = self._plan = self._compile(self.schema, '.', 0)
+        plan(row, 0, 0)
+
+    def _reshred(self, row, size):
+        """
+        THE SCHEMA EXPANDED WHILE SHREDDING row, SO THE NEW LEAVES ARE MISSING
+        NULLS FOR EARLIER RECORDS, AND FOR THE PART OF row SHREDDED BEFORE THEY
+        WERE FOUND. REMOVE row, BACKFILL THE NEW LEAVES, AND SHRED row AGAIN
+        """
+        new_leaves = set(self._new_leaves)
+        self._new_leaves = []
+        self._remove_row(new_leaves)
+
+        old_reps = {k: v for k, v in self.reps.items() if k not in new_leaves}
+        for name in new_leaves:
+            null_reps, null_defs = null_levels(self.schema, name, old_reps, self.defs, self.num_rows)
+            self.values[name].truncate(0)
+            self.reps[name].truncate(0)
+            self.reps[name].extend_levels(null_reps)
+            self.defs[name].truncate(0)
+            self.defs[name].extend_levels(null_defs)
+
+        self._size[0] = size
+        self._shred(row)
+
+    def _rollback(self, size):
+        """
+        REMOVE WHATEVER PART OF A ROW WAS SHREDDED BEFORE IT FAILED: EVERY COLUMN
+        IS TRUNCATED TO ITS FIRST num_rows RECORDS. LEAVES FOUND IN THE FAILED
+        ROW STAY IN THE SCHEMA, BACKFILLED WITH NULLS (LIKE _reshred())
+        """
+        new_leaves = set(self._new_leaves)
+        self._new_leaves = []
+        num_rows = self.num_rows
+        for column in self.schema.get_parquet_columns():
+            name = column.name
+            if name in new_leaves:
+                continue
+            reps = self.reps[name]
+            if column.max_repetition_level:
+                starts = numpy.flatnonzero(reps.array == 0)
+                stop = int(starts[num_rows]) if starts.shape[0] > num_rows else len(reps)
+            else:
+                stop = num_rows
+            if stop == len(reps):
+                continue
+            removed = self.defs[name].array[stop:]
+            if column.max_definition_level:
+                num_values = int(numpy.count_nonzero(removed == column.max_definition_level))
+            else:
+                num_values = len(removed)
+            self.values[name].truncate(len(self.values[name]) - num_values)
+            reps.truncate(stop)
+            self.defs[name].truncate(stop)
+
+        old_reps = {k: v for k, v in self.reps.items() if k not in new_leaves}
+        for name in new_leaves:
+            null_reps, null_defs = null_levels(self.schema, name, old_reps, self.defs, num_rows)
+            self.values[name].truncate(0)
+            self.reps[name].truncate(0)
+            self.reps[name].extend_levels(null_reps)
+            self.defs[name].truncate(0)
+            self.defs[name].extend_levels(null_defs)
+        self._size[0] = size
+
+    def _remove_row(self, skip=()):
+        """
+        REMOVE THE LAST ROW FROM ALL COLUMNS, EXCEPT THOSE IN skip.
+        THE ROW MUST HAVE AT LEAST ONE LEVEL IN EVERY COLUMN
+        """
+        for column in self.schema.get_parquet_columns():
+            name = column.name
+            if name in skip:
+                continue
+            reps = self.reps[name]
+            start = len(reps) - 1
+            while reps[start]:
+                start -= 1
+            removed = self.defs[name][start:]
+            if column.max_definition_level:
+                num_values = int(numpy.count_nonzero(removed == column.max_definition_level))
+            else:
+                num_values = len(removed)
+            self.values[name].truncate(len(self.values[name]) - num_values)
+            reps.truncate(start)
+            self.defs[name].truncate(start)
+
+    def append_json(self, line):
+        """
+        SHRED ONE JSON DOCUMENT INTO THE CURRENT ROW GROUP
+
+        :param line: JSON TEXT, OR utf8 BYTES, OF ONE RECORD
+        """
+        if line.__class__ is binary_type:
+            line = line.decode('utf8')
+        try:
+            row = json.loads(line)
+        except Exception as e:
+            Log.error("can not decode {{line|quote}}", line=line, cause=e)
+        self.append(row)
+
+    def shred_lines(self, lines):
+        """
+        :param lines: iterator of JSON documents, one per line (like pyLibrary.env.big_data.GzipLines)
+        :return: GENERATOR OF Table, ONE PER ROW GROUP
+        """
+        for line in lines:
+            if not line or line.isspace():
+                continue
+            self.append_json(line)
+            if self.is_full:
+                yield self.flush()
+        if self.num_rows:
+            yield self.flush()
+
+    def flush(self):
+        """
+        :return: Table WITH ALL RECORDS SHREDDED SINCE LAST flush()
+        """
+        output = Table(self.values, self.reps, self.defs, self.num_rows, self.schema)
+        if self.stats:
+            self.stats.add_table(output)
+        self._flushed.update(self.values.keys())
+        self._reset()
+        return output
+
+    def shred(self, data):
+        """
+        :param data: iterator of records
+        :return: GENERATOR OF Table, ONE PER ROW GROUP
+        """
+        for row in data:
+            self.append(row)
+            if self.is_full:
+                yield self.flush()
+        if self.num_rows:
+            yield self.flush()
+
+    def _compile(self, schema, path, depth, item_element=None):
+        """
+        CONVERT THE SchemaTree INTO NESTED CLOSURES, ONE PER NODE, THAT
+        SHRED VALUES OF THE EXPECTED SHAPE WITHOUT ANY SCHEMA LOOKUPS.
+        ANYTHING UNEXPECTED IS HANDED TO _value_to_column(), WHICH MAY
+        EXPAND THE SCHEMA (AND INVALIDATE THE PLAN)
+
+        :param schema: SchemaTree NODE
+        :param path: FULL PATH TO THE NODE
+        :param depth: NUMBER OF REPEATED NODES ABOVE THIS ONE
+        :param item_element: SchemaElement DESCRIBING THE VALUES, FOR ITEMS OF A REPEATED PRIMITIVE
+        :return: function(value, rep_level, def_level)
+        """
+        slow = self._value_to_column
+        size = self._size
+        element = schema.element
+
+        if element is None:
+            # NOTHING KNOWN, YET
+            def unknown_plan(value, rep_level, def_level):
+                if value is not None:
+                    slow(value, schema, path, rep_level, depth, def_level)
+            return unknown_plan
+
+        nulls = self._compile_nulls(schema)
+
+        if element.repetition_type == REPEATED:
+            valid = self._valid
+            sub_schema = schema.more.get('.')
+            if sub_schema:
+                item_plan = self._compile(sub_schema, path, depth + 1)
+            else:
+                sub_schema = SchemaTree()  # ALL VALUES IN REPEATED MUST EXIST
+                sub_schema.more = schema.more
+                item_plan = self._compile(sub_schema, path, depth + 1, element)
+            next_rep_level = depth + 1
+
+            def repeated_plan(value, rep_level, def_level):
+                if not valid[0]:
+                    slow(value, schema, path, rep_level, depth, def_level)
+                elif value.__class__ is list:
+                    if not value:
+                        nulls(rep_level, def_level)
+                        return
+                    def_level += 1
+                    for v in value:
+                        item_plan(v, rep_level, def_level)
+                        rep_level = next_rep_level
+                elif value is None:
+                    nulls(rep_level, def_level)
+                else:
+                    slow(value, schema, path, rep_level, depth, def_level)
+            return repeated_plan
+
+        required = element.repetition_type == REQUIRED
+        value_element = coalesce(item_element, element)
+
+        if schema.is_typed:
+            valid = self._valid
+            dispatch, absent_bytes = self._compile_types(schema, path, depth)
+            if required:
+                def_offset = 0
+            else:
+                def_offset = 1
+
+            def typed_plan(value, rep_level, def_level):
+                plan = dispatch.get(value.__class__)
+                if not valid[0]:
+                    slow(value, schema, path, rep_level, depth, def_level)
+                elif plan is not None:
+                    child, others = plan
+                    new_def_level = def_level + def_offset
+                    child(value, rep_level, new_def_level)
+                    for reps_append, defs_append in others:
+                        reps_append(rep_level)
+                        defs_append(new_def_level)
+                    size[0] += absent_bytes
+                elif value is None and not required:
+                    nulls(rep_level, def_level)
+                else:
+                    slow(value, schema, path, rep_level, depth, def_level)
+            return typed_plan
+
+        if value_element.type is not None and not schema.more:
+            ptypes = parquet_type_to_python_types.get(value_element.type, ())
+            if value_element.type == Type.DOUBLE:
+                to_float = parquet_type_to_python_types[Type.INT64]
+            else:
+                to_float = ()
+            values_append = self.values[path].append
+            reps_append = self.reps[path].append
+            defs_append = self.defs[path].append
+            width = LEVEL_BYTES + (value_element.type_length or 0)
+            is_text = value_element.type == Type.BYTE_ARRAY
+            if required:
+                def_offset = 0
+            else:
+                def_offset = 1
+
+            def primitive_plan(value, rep_level, def_level):
+                if value.__class__ not in ptypes:
+                    if value.__class__ in to_float and -MAX_SAFE_INTEGER <= value <= MAX_SAFE_INTEGER:
+                        value = float(value)
+                    elif value is None and not required:
+                        reps_append(rep_level)
+                        defs_append(def_level)
+                        size[0] += LEVEL_BYTES
+                        return
+                    else:
+                        slow(value, schema, path, rep_level, depth, def_level)
+                        return
+                if is_text:
+                    value = value.encode('utf8')
+                    size[0] += LEVEL_BYTES + len(value)
+                else:
+                    size[0] += width
+                values_append(value)
+                reps_append(rep_level)
+                defs_append(def_level + def_offset)
+            return primitive_plan
+
+        # OBJECT
+        valid = self._valid
+        shapes = {}
+        children = {
+            name: (self._compile_child(sub_schema, concat_field(path, name), depth), sub_schema)
+            for name, sub_schema in schema.more.items()
+        }
+        is_empty = not schema.more
+        if required:
+            def_offset = 0
+        else:
+            def_offset = 1
+
+        def object_plan(value, rep_level, def_level):
+            if not valid[0]:
+                slow(value, schema, path, rep_level, depth, def_level)
+            elif value.__class__ is dict:
+                new_def_level = def_level + def_offset
+                if is_empty and not value:
+                    nulls(rep_level, new_def_level)
+                    return
+                shape = tuple(value)
+                plan = shapes.get(shape)
+                if plan is None:
+                    plan = shapes[shape] = self._compile_shape(shape, children)
+                    if plan is None:
+                        del shapes[shape]
+                        slow(value, schema, path, rep_level, depth, def_level)
+                        return
+                present, absent, absent_bytes = plan
+                for name, child in present:
+                    child(value[name], rep_level, new_def_level)
+                for reps_append, defs_append in absent:
+                    reps_append(rep_level)
+                    defs_append(new_def_level)
+                size[0] += absent_bytes
+            elif value is None and not required:
+                nulls(rep_level, def_level)
+            else:
+                slow(value, schema, path, rep_level, depth, def_level)
+        return object_plan
+
+    def _compile_child(self, schema, path, depth):
+        """
+        :return: PLAN FOR THE PROPERTY AT path, TIMED IF COLLECTING stats
+        """
+        plan = self._compile(schema, path, depth)
+        if self.stats:
+            return self.stats.timed(path, plan)
+        return plan
+
+    def _expanded(self, event, path, **kwargs):
+        """
+        RECORD A SCHEMA EXPANSION EVENT, IF COLLECTING stats
+        """
+        if self.stats:
+            self.stats.add_event(event, path, self.num_rows, **kwargs)
+
+    def _compile_types(self, schema, path, depth):
+        """
+        :param schema: TYPED SchemaTree NODE (SEE SchemaTree.split())
+        :return: (dispatch, absent_bytes) WHERE dispatch MAPS PYTHON TYPE TO (plan, absent) FOR THE CHILD OF THAT TYPE
+        """
+        dispatch = {}
+        for type_name, sub_schema in schema.more.items():
+            if sub_schema.element is None:
+                continue
+            child = self._compile_child(sub_schema, concat_field(path, type_name), depth)
+            absent = [
+                (self.reps[leaf].append, self.defs[leaf].append)
+                for other_name, other in schema.more.items()
+                if other_name != type_name
+                for leaf in other.leaves
+            ]
+            dispatch[type_name] = (child, absent)
+            for ptype in parquet_type_to_python_types.get(sub_schema.element.type, ()):
+                dispatch[ptype] = (child, absent)
+            if sub_schema.element.type == Type.DOUBLE:
+                for ptype in parquet_type_to_python_types[Type.INT64]:
+                    dispatch[ptype] = (child, absent)
+        return dispatch, LEVEL_BYTES * (len(schema.more) - 1)
+
+    def _compile_shape(self, shape, children):
+        """
+        :param shape: tuple OF PROPERTY NAMES FOUND IN A RECORD
+        :param children: MAP FROM NAME TO (plan, SchemaTree)
+        :return: (present, absent, absent_bytes) TO SHRED RECORDS OF GIVEN SHAPE, OR None IF IT CAN NOT BE PLANNED
+        """
+        if set(shape) - set(children.keys()):
+            return None  # SCHEMA EXPANSION REQUIRED
+        present = [(name, children[name][0]) for name in shape]
+        absent = []
+        absent_bytes = 0
+        for name, (_, sub_schema) in children.items():
+            if name in shape or sub_schema.element is None:
+                continue
+            if sub_schema.element.repetition_type == REQUIRED:
+                return None  # LET _value_to_column() RAISE THE ERROR
+            absent.extend((self.reps[leaf].append, self.defs[leaf].append) for leaf in sub_schema.leaves)
+            absent_bytes += LEVEL_BYTES
+        return present, absent, absent_bytes
+
+    def _compile_nulls(self, schema):
+        """
+        :return: function(rep_level, def_level) THAT RECORDS A NULL FOR ALL LEAVES
+        """
+        appenders = [(self.reps[leaf].append, self.defs[leaf].append) for leaf in schema.leaves]
+        size = self._size
+
+        def nulls(rep_level, def_level):
+            for reps_append, defs_append in appenders:
+                reps_append(rep_level)
+                defs_append(def_level)
+            size[0] += LEVEL_BYTES
+        return nulls
+
+    def _none_to_column(self, schema, path, rep_level, def_level):
+        reps, defs = self.reps, self.defs
+        for full_path in schema.leaves:
+            reps[full_path].append(rep_level)
+            defs[full_path].append(def_level)
+        self._size[0] += LEVEL_BYTES
+
+    def _typed_to_column(self, value, type_name, schema, path, rep_level, depth, def_level):
+        """
+        SHRED PRIMITIVE value INTO THE CHILD OF TYPED schema NAMED type_name, WITH NULLS FOR THE OTHER TYPES
+        """
+        if schema.element.repetition_type != REQUIRED:
+            def_level += 1
+        for name, sub_schema in schema.more.items():
+            if name != type_name:
+                self._value_to_column(None, sub_schema, concat_field(path, name), rep_level, depth, def_level)
+        sub_schema = schema.more.get(type_name)
+        if sub_schema is None:
+            if schema.locked:
+                Log.error("Not expecting {{path|quote}} to have {{type}} values", path=path, type=type_name)
+            sub_schema = schema.more[type_name] = SchemaTree(element=None)
+            self._invalidate()
+        self._value_to_column(value, sub_schema, concat_field(path, type_name), rep_level, depth, def_level)
+
+    def _split(self, schema, path):
+        """
+        MOVE THE COLUMN OF PRIMITIVE LEAF path TO ITS TYPED CHILD (SEE SchemaTree.split()),
+        SO VALUES OF ANOTHER TYPE GET THEIR OWN COLUMN
+        """
+        if schema.locked:
+            Log.error("Not expecting {{path|quote}} to have more than one type", path=path)
+        if path in self._flushed:
+            Log.error("Can not split {{path|quote}} into types after flushing row groups with it; declare the types in the schema", path=path)
+        max_definition_level = self.schema.definition_level(path)
+        type_name = schema.split(path)
+        name = concat_field(path, type_name)
+        self.values[name] = self.values.pop(path)
+        self.reps[name] = self.reps.pop(path)
+        self.defs[name] = self.defs.pop(path).raise_level(max_definition_level)
+        self._new_leaves = [name if n == path else n for n in self._new_leaves]
+        self._invalidate()
+        self._expanded("split", path, type=type_name)
+
+    def _promote(self, schema, path):
+        """
+        WIDEN INT64 LEAF path TO DOUBLE, TO HOLD BOTH INTEGERS AND FLOATS
+        """
+        if schema.locked:
+            Log.error("Not expecting {{path|quote}} to have float values", path=path)
+        promote(schema.element)
+        old_values = self.values[path].array
+        values = ColumnBuffer.new_instance(Type.DOUBLE, self.max_dictionary_bytes)
+        if old_values.dtype != object and numpy.all(numpy.abs(old_values) <= MAX_SAFE_INTEGER):
+            values.extend_array(old_values.astype(numpy.float64))
+        else:
+            # KEEP THE EXACT INTEGERS (THE WRITER WILL NOT ACCEPT THEM)
+            values.extend_array(old_values.astype(object))
+        self.values[path] = values
+        self._invalidate()
+        self._expanded("promote", path)
+
+    def _value_to_column(self, value, schema, path, rep_level, depth, def_level):
+        """
+        GENERIC (SLOW) SHREDDING OF value, WITH SCHEMA EXPANSION
+        :param rep_level: REPETITION LEVEL OF THE FIRST LEAF VALUE FOUND
+        :param depth: NUMBER OF REPEATED NODES ABOVE THIS ONE
+        """
+        ptype = type(value)
+        dtype, ltype, jtype, itype, byte_width = python_type_to_all_types[ptype]
+
+        if jtype is NESTED:
+            if schema.element is None:
+                # NEW PROPERTY, ITS VALUES ARE HELD BY THE '.' CHILD
+                schema.element = SchemaElement(name=path, repetition_type=REPEATED)
+                schema.more['.'] = SchemaTree(element=None)
+                self._invalidate()
+                self._expanded("new_nested", path)
+            elif schema.element.repetition_type != REPEATED:
+                Log.error("Expecting {{path|quote}} to be repeated", path=path)
+
+            new_path = path
+            if not value:
+                self._none_to_column(schema, new_path, rep_level, def_level)
+            else:
+                sub_schema = schema.more.get('.')
+                if not sub_schema:
+                    sub_schema = SchemaTree()  # ALL VALUES IN REPEATED MUST EXIST
+                    sub_schema.more = schema.more
+
+                for k, new_value in enumerate(value):
+                    self._value_to_column(new_value, sub_schema, new_path, depth + 1 if k else rep_level, depth + 1, def_level+1)
+        elif jtype is OBJECT:
+            if value is None:
+                if schema.element is None:
+                    return  # NOTHING KNOWN ABOUT THIS PROPERTY YET
+                if schema.element.repetition_type == REQUIRED:
+                    Log.error("{{path|quote}} is required", path=path)
+                self._none_to_column(schema, path, rep_level, def_level)
+            else:
+                if schema.element is None:
+                    schema.element = SchemaElement(name=path, repetition_type=OPTIONAL)
+                    self._invalidate()
+                    self._expanded("new_object", path)
+                elif schema.element.repetition_type == REPEATED:
+                    Log.error("Expecting {{path|quote}} to be repeated", path=path)
+                elif schema.element.type is not None:
+                    Log.error("Expecting {{path|quote}} to be a primitive value", path=path)
+
+                if schema.element.repetition_type == REQUIRED:
+                    new_def_level = def_level
+                else:
+                    new_def_level = def_level+1
+
+                if schema.is_typed:
+                    Log.error("Expecting {{path|quote}} to be a primitive value", path=path)
+
+                if not schema.more and not value:
+                    # EMPTY OBJECT, WITH NO PROPERTIES, IS RECORDED AS DEFINED
+                    self._none_to_column(schema, path, rep_level, new_def_level)
+                    return
+
+                for name, sub_schema in schema.more.items():
+                    new_path = concat_field(path, name)
+                    new_value = value.get(name, None)
+                    self._value_to_column(new_value, sub_schema, new_path, rep_level, depth, new_def_level)
+
+                for name in set(value.keys()) - set(schema.more.keys()):
+                    if schema.locked:
+                        Log.error("{{path}} is not allowed in the schema", path=path)
+                    new_path = concat_field(path, name)
+                    new_value = value.get(name, None)
+                    sub_schema = schema.more[name] = SchemaTree(element=None)
+                    self._invalidate()
+                    self._value_to_column(new_value, sub_schema, new_path, rep_level, depth, new_def_level)
+        else:
+            if schema.is_typed:
+                # POLYMORPHIC PROPERTY
+                self._typed_to_column(value, itype, schema, path, rep_level, depth, def_level)
+                return
+            element = schema.element
+            if element is not None and element is not DEFAULT_RECORD and element.type not in (None, dtype):
+                if element.type == Type.DOUBLE and dtype == Type.INT64:
+                    if -MAX_SAFE_INTEGER <= value <= MAX_SAFE_INTEGER:
+                        value = float(value)
+                    # ELSE KEEP THE EXACT INTEGER (THE WRITER WILL NOT ACCEPT IT)
+                elif element.type == Type.INT64 and dtype == Type.DOUBLE:
+                    self._promote(schema, path)
+                else:
+                    self._split(schema, path)
+                    self._typed_to_column(value, itype, schema, path, rep_level, depth, def_level)
+                    return
+
+            if jtype is STRING:
+                value = value.encode('utf8')
+                num_bytes = len(value)
+            else:
+                num_bytes = byte_width
+            old_length = schema.element.type_length if schema.element else None
+            element, is_new = merge_schema_element(schema.element, path, value, ptype, ltype, dtype, jtype, itype, byte_width)
+            if is_new:
+                if schema.locked:
+                    Log.error("Not expecting a new value at {{path|quote}}", path=path)
+                schema.element = element
+                self.values[path] = ColumnBuffer.new_instance(element.type, self.max_dictionary_bytes)
+                self.reps[path] = LevelBuffer()
+                self.defs[path] = LevelBuffer()
+                self._new_leaves.append(path)  # BACKFILLED BY _reshred()
+                self._invalidate()
+                self._expanded("new_leaf", path, type=element.type)
+            elif element.type_length != old_length:
+                self._expanded("widen", path, old_length=old_length, new_length=element.type_length)
+            elif element.type is None and element is not DEFAULT_RECORD:
+                Log.error("Expecting {{path|quote}} to be an object", path=path)
+
+            self.values[path].append(value)
+            self.reps[path].append(rep_level)
+            if schema.element.repetition_type == REQUIRED:
+                self.defs[path].append(def_level)
+            else:
+                self.defs[path].append(def_level+1)
+            self._size[0] += num_bytes + LEVEL_BYTES
+
+
+class ShredStats(object):
+    """
+    INSTRUMENTATION FOR ColumnShredder: PER-LEAF COUNTS, TIME PER SUBTREE,
+    AND SCHEMA EXPANSION EVENTS. THE SHREDDER ONLY COMPILES THE TIMERS INTO
+    ITS PLAN WHEN GIVEN AN INSTANCE; LEAF COUNTS ARE TAKEN FROM THE BUFFERS
+    AT flush(), SO COST NOTHING PER VALUE
+    """
+
+    def __init__(self):
+        self.num_rows = 0
+        self.num_row_groups = 0
+        self.leaves = {}  # MAP FROM LEAF PATH TO Data(num_values, num_nulls, num_levels, num_bytes)
+        self.subtrees = {}  # MAP FROM PROPERTY PATH TO [seconds, calls], SECONDS INCLUDE THE CHILDREN
+        self.events = []  # SCHEMA EXPANSION EVENTS, IN THE ORDER FOUND
+        self.num_reshreds = 0
+        self.reshred_seconds = 0
+
+    def timed(self, path, plan):
+        """
+        :return: plan, WRAPPED TO ACCUMULATE ITS TIME UNDER path
+        """
+        cell = self.subtrees.setdefault(path, [0, 0])
+
+        def timed_plan(*args):
+            start = timer()
+            output = plan(*args)
+            cell[0] += timer() - start
+            cell[1] += 1
+            return output
+        return timed_plan
+
+    def add_event(self, event, path, row, **kwargs):
+        """
+        :param event: ONE OF new_leaf, new_object, new_nested, widen
+        :param path: FULL PATH OF THE EXPANDED NODE
+        :param row: NUMBER OF ROWS IN THE CURRENT ROW GROUP BEFORE THE ONE CAUSING THE EXPANSION
+        """
+        self.events.append(Data(event=event, path=path, row=self.num_rows + row, **kwargs))
+
+    def add_table(self, table):
+        """
+        ACCUMULATE THE PER-LEAF COUNTS OF A FLUSHED ROW GROUP
+        """
+        self.num_rows += table.num_rows
+        self.num_row_groups += 1
+        for column in table.schema.get_parquet_columns():
+            name = column.name
+            values, reps, defs = table.values[name], table.reps[name], table.defs[name]
+            leaf = self.leaves.get(name)
+            if leaf is None:
+                leaf = self.leaves[name] = Data(num_values=0, num_nulls=0, num_levels=0, num_bytes=0)
+            leaf.num_values += len(values)
+            leaf.num_levels += len(defs)
+            if column.max_definition_level:
+                leaf.num_nulls += len(defs) - defs.count(column.max_definition_level)
+            leaf.num_bytes += values.nbytes + reps.nbytes + defs.nbytes
+
+    def __data__(self):
+        return {
+            "num_rows": self.num_rows,
+            "num_row_groups": self.num_row_groups,
+            "num_reshreds": self.num_reshreds,
+            "reshred_seconds": self.reshred_seconds,
+            "leaves": {
+                name: {
+                    "num_values": leaf.num_values,
+                    "num_nulls": leaf.num_nulls,
+                    "null_ratio": leaf.num_nulls / leaf.num_levels if leaf.num_levels else None,
+                    "num_bytes": leaf.num_bytes
+                }
+                for name, leaf in self.leaves.items()
+            },
+            "subtrees": {path: {"seconds": seconds, "calls": calls} for path, (seconds, calls) in self.subtrees.items()},
+            "events": [dict(e) for e in self.events]
+        }
+
+    def log(self, limit=10):
+        """
+        SEND A SUMMARY TO mo_logs: THE SLOWEST SUBTREES, AND THE LARGEST LEAVES
+        """
+        slowest = sorted(self.subtrees.items(), key=lambda p: -p[1][0])[:limit]
+        largest = sorted(self.leaves.items(), key=lambda p: -p[1].num_bytes)[:limit]
+        Log.note(
+            "Shredded {{rows}} rows into {{groups}} row groups, with {{events}} schema expansions ({{reshreds}} reshreds taking {{reshred_seconds|round(places=3)}} seconds)\n"
+            "Slowest subtrees:\n{{slowest|json}}\nLargest leaves:\n{{largest|json}}",
+            rows=self.num_rows,
+            groups=self.num_row_groups,
+            events=len(self.events),
+            reshreds=self.num_reshreds,
+            reshred_seconds=self.reshred_seconds,
+            slowest=[{"path": p, "seconds": s, "calls": c} for p, (s, c) in slowest],
+            largest=[{"path": p, "num_bytes": l.num_bytes, "num_values": l.num_values, "num_nulls": l.num_nulls} for p, l in largest]
+        )
+
+
+def get_rep_level(counters):
+    for rep_level, c in reversed(list(enumerate(counters))):
+        if c > 0:
+            return rep_level
+    return 0  # SHOULD BE -1 FOR MISSING RECORD, BUT WE WILL ASSUME THE RECORD EXISTS
+
+
+def shred_parallel(data, schema=None, processes=None, batch_size=DEFAULT_BATCH_SIZE, max_dictionary_bytes=MAX_DICTIONARY_BYTES):
+    """
+    SHRED data IN A POOL OF WORKER PROCESSES, ONE BATCH OF RECORDS PER TASK
+
+    EACH WORKER SHREDS AGAINST ITS OWN COPY OF schema; THE EXPANDED COPIES
+    ARE UNIONED BACK INTO schema, IN ORDER, AND THE BATCHES CONCATENATED.
+    THE RESULT IS THE SAME AS SHREDDING IN ONE PROCESS
+
+    :param data: iterable of objects
+    :param schema: Known schema, will be extended to include all properties found in data
+    :param processes: NUMBER OF WORKER PROCESSES (DEFAULT IS ONE PER CPU)
+    :param batch_size: NUMBER OF RECORDS SENT TO A WORKER AT A TIME
+    :param max_dictionary_bytes: SAME AS ColumnShredder
+    :return: Table
+    """
+    if not schema:
+        schema = SchemaTree()
+
+    if processes == 1:
+        shredder = ColumnShredder(schema, max_dictionary_bytes=max_dictionary_bytes)
+        for row in data:
+            shredder.append(row)
+        return shredder.flush()
+
+    pool = Pool(processes)
+    try:
+        tasks = ((schema, batch, max_dictionary_bytes) for batch in _batches(data, batch_size))
+        tables = list(pool.imap(_shred_batch, tasks))
+    finally:
+        pool.close()
+        pool.join()
+
+    for t in tables:
+        schema.union(t.schema)
+    return Table.concat(tables, schema, max_dictionary_bytes)
+
+
+def _shred_batch(task):
+    """
+    RUN IN THE WORKER PROCESS
+    """
+    schema, rows, max_dictionary_bytes = task
+    shredder = ColumnShredder(schema, max_dictionary_bytes=max_dictionary_bytes)
+    for row in rows:
+        shredder.append(row)
+    return shredder.flush()
+
+
+def _batches(data, batch_size):
+    data = iter(data)
+    while True:
+        batch = list(islice(data, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,216 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import numpy
+
+from mo_dots import Data
+from mo_future import binary_type, long, text_type
+from mo_parquet.encodings import decode_plain, encode_plain
+from parquet_thrift.parquet.ttypes import ConvertedType, Statistics, Type
+
+NUMBER_TYPES = (int, long, float)
+
+
+def get_statistics(values, num_values, element):
+    """
+    :param values: ColumnBuffer (OR LIST) OF THE DEFINED VALUES IN THE COLUMN CHUNK
+    :param num_values: NUMBER OF VALUES, INCLUDING NULLS
+    :param element: SchemaElement OF THE COLUMN
+    :return: Statistics
+    """
+    output = Statistics(null_count=num_values - len(values))
+    if not len(values):
+        return output
+
+    dictionary = getattr(values, "dictionary", None)
+    if dictionary is not None:
+        output.distinct_count = len(dictionary)
+        candidates = dictionary
+    else:
+        candidates = getattr(values, "array", values)
+
+    try:
+        if element.type == Type.DOUBLE or element.type == Type.FLOAT:
+            candidates = numpy.asarray(candidates)
+            if numpy.isnan(candidates).all():
+                return output
+            min_value, max_value = numpy.nanmin(candidates), numpy.nanmax(candidates)
+        elif isinstance(candidates, numpy.ndarray) and candidates.dtype != object:
+            min_value, max_value = candidates.min(), candidates.max()
+        else:
+            min_value, max_value = min(candidates), max(candidates)
+    except Exception:
+        # MIXED TYPES CAN NOT BE COMPARED
+        return output
+
+    output.min_value = _encode_statistic(min_value, element.type)
+    output.max_value = _encode_statistic(max_value, element.type)
+    if element.type != Type.BYTE_ARRAY:
+        # DEPRECATED FIELDS USE SIGNED ORDER, WHICH IS ONLY CORRECT FOR NUMBERS
+        output.min = output.min_value
+        output.max = output.max_value
+    return output
+
+
+def merge_statistics(statistics, element):
+    """
+    :param statistics: LIST OF Statistics (FROM get_statistics()), OF THE PAGES OF ONE COLUMN CHUNK
+    :param element: SchemaElement OF THE COLUMN
+    :return: Statistics OF ALL THE PAGES
+    """
+    if len(statistics) == 1:
+        return statistics[0]
+    output = Statistics(null_count=sum(s.null_count for s in statistics))
+    bounds = [s for s in statistics if s.min_value is not None]
+    if not bounds:
+        return output
+
+    key = lambda v: statistic_key(v, element)
+    output.min_value = min((s.min_value for s in bounds), key=key)
+    output.max_value = max((s.max_value for s in bounds), key=key)
+    if element.type != Type.BYTE_ARRAY:
+        output.min = output.min_value
+        output.max = output.max_value
+    return output
+
+
+def statistic_key(data, element):
+    """
+    :param data: ENCODED min_value OR max_value
+    :return: VALUE THAT COMPARES IN THE COLUMN ORDER (BYTES ARE COMPARED AS UNSIGNED BYTES)
+    """
+    if element.type == Type.BYTE_ARRAY:
+        return data
+    return decode_plain(data, element.type, 1)[0][0]
+
+
+def _encode_statistic(value, parquet_type):
+    if parquet_type == Type.BYTE_ARRAY:
+        return value
+    return encode_plain(numpy.asarray([value]), parquet_type)
+
+
+def decode_statistics(statistics, element):
+    """
+    :param statistics: Statistics (MAY BE None)
+    :param element: SchemaElement OF THE COLUMN
+    :return: Data(min, max, null_count) WITH PYTHON VALUES, OR None IF UNKNOWN
+    """
+    if statistics is None:
+        return None
+    min_value = _decode_statistic(statistics.min_value, element)
+    max_value = _decode_statistic(statistics.max_value, element)
+    if min_value is None and element.type != Type.BYTE_ARRAY:
+        min_value = _decode_statistic(statistics.min, element)
+        max_value = _decode_statistic(statistics.max, element)
+    return Data(
+        min=min_value,
+        max=max_value,
+        null_count=statistics.null_count
+    )
+
+
+def _decode_statistic(data, element):
+    if data is None:
+        return None
+    if element.type == Type.BYTE_ARRAY:
+        if element.converted_type == ConvertedType.UTF8:
+            return data.decode('utf8')
+        return data
+    values, _ = decode_plain(data, element.type, 1)
+    return values[0].item()
+
+
+def can_match(where, get_statistics):
+    """
+    :param where: JSON EXPRESSION (OR jx Expression) FILTER
+    :param get_statistics: FUNCTION FROM COLUMN NAME TO (num_values, decode_statistics() OUTPUT),
+                           WHICH MAY HAVE A bloom FUNCTION, FROM VALUE TO False IF THE VALUE IS CERTAINLY ABSENT
+    :return: False IF THE STATISTICS PROVE NO ROW CAN MATCH where
+    """
+    from jx_base.expressions import Expression, jx_expression
+
+    if not isinstance(where, Expression):
+        where = jx_expression(where)
+    return _can_match(where, get_statistics)
+
+
+def _can_match(expr, get_statistics):
+    from jx_base.expressions import AndOp, EqOp, FalseOp, InequalityOp, InOp, Literal, OrOp, Variable
+
+    if isinstance(expr, AndOp):
+        return all(_can_match(t, get_statistics) for t in expr.terms)
+    elif isinstance(expr, OrOp):
+        return any(_can_match(t, get_statistics) for t in expr.terms)
+    elif isinstance(expr, FalseOp):
+        return False
+    elif isinstance(expr, EqOp):
+        if isinstance(expr.rhs, Variable) and isinstance(expr.lhs, Literal):
+            return _in_range(expr.rhs.var, [expr.lhs.value], get_statistics)
+        if isinstance(expr.lhs, Variable) and isinstance(expr.rhs, Literal):
+            return _in_range(expr.lhs.var, [expr.rhs.value], get_statistics)
+    elif isinstance(expr, InOp):
+        if isinstance(expr.value, Variable) and isinstance(expr.superset, Literal):
+            superset = expr.superset.value
+            if not isinstance(superset, (list, tuple)) and hasattr(superset, "__iter__"):
+                superset = list(superset)
+            return _in_range(expr.value.var, superset, get_statistics)
+    elif isinstance(expr, InequalityOp):
+        if isinstance(expr.lhs, Variable) and isinstance(expr.rhs, Literal):
+            return _compare(expr.lhs.var, expr.op, expr.rhs.value, get_statistics)
+    # ANYTHING ELSE MAY MATCH
+    return True
+
+
+def _in_range(name, candidates, get_statistics):
+    num_values, stats = get_statistics(name)
+    if stats == None:
+        return True
+    if stats.null_count == num_values:
+        return False  # ALL NULL
+    if stats.min == None:
+        return True
+    bloom = stats.bloom
+    for value in candidates:
+        if not _comparable(value, stats.min):
+            return True
+        if stats.min <= value <= stats.max and (not bloom or bloom(value)):
+            return True
+    return False
+
+
+def _compare(name, op, value, get_statistics):
+    num_values, stats = get_statistics(name)
+    if stats == None:
+        return True
+    if stats.null_count == num_values:
+        return False  # ALL NULL
+    if stats.min == None or not _comparable(value, stats.min):
+        return True
+    if op == "gt":
+        return stats.max > value
+    elif op == "gte":
+        return stats.max >= value
+    elif op == "lt":
+        return stats.min < value
+    else:
+        return stats.min <= value
+
+
+def _comparable(a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if isinstance(a, NUMBER_TYPES):
+        return isinstance(b, NUMBER_TYPES)
+    if isinstance(a, (text_type, binary_type)):
+        return isinstance(b, a.__class__)
+    return False
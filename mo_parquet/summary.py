@@ -0,0 +1,175 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+from copy import copy
+
+from mo_logs import Log
+from mo_parquet.encodings import UINT32
+from mo_parquet.schema import SchemaTree
+from mo_parquet.writer import CREATED_BY, MAGIC
+from parquet_thrift.parquet.ttypes import FileMetaData, KeyValue
+from thrift.protocol.TCompactProtocol import TCompactProtocolAccelerated
+from thrift.transport.TTransport import TMemoryBuffer
+from thrift_structures import read_thrift, write_thrift
+
+SUMMARY_NAME = "_metadata"
+SUMMARY_KEY = "mo_parquet.summary"  # key_value_metadata OF EACH FileMetaData IN THE SUMMARY
+
+
+class SummaryEntry(object):
+    """
+    THE FOOTER OF ONE DATA FILE, AS RECORDED IN THE SUMMARY
+    """
+
+    __slots__ = ["path", "mtime", "size", "metadata"]
+
+    def __init__(self, path, mtime, size, metadata):
+        """
+        :param path: FILENAME, RELATIVE TO THE DATASET, WITH / SEPARATORS
+        :param mtime: MODIFIED TIME OF THE FILE WHEN SUMMARIZED
+        :param size: BYTES IN THE FILE WHEN SUMMARIZED
+        :param metadata: FileMetaData OF THE FILE
+        """
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.metadata = metadata
+
+
+def read_summary(filename):
+    """
+    :param filename: THE SUMMARY FILE
+    :return: (SchemaTree OF ALL FILES, LIST OF SummaryEntry)
+    """
+    with io.open(filename, "rb") as file:
+        data = file.read()
+    footer_start = _footer_start(data)
+    footer = read_thrift(io.BytesIO(data[footer_start:-8]), FileMetaData)
+
+    entries = []
+    # ONE TRANSPORT FOR ALL ENTRIES (read_thrift() WOULD BUFFER 64K FOR EACH)
+    body = TMemoryBuffer(data)
+    body.cstringio_buf.seek(len(MAGIC))
+    protocol = TCompactProtocolAccelerated(body)
+    while body.cstringio_buf.tell() < footer_start:
+        metadata = FileMetaData()
+        metadata.read(protocol)
+        kv = metadata.key_value_metadata or []
+        found = [p for p in kv if p.key == SUMMARY_KEY]
+        if not found:
+            Log.error("Expecting {{key|quote}} in every summary entry", key=SUMMARY_KEY)
+        details = json.loads(found[0].value)
+        metadata.key_value_metadata = [p for p in kv if p.key != SUMMARY_KEY] or None
+        entries.append(SummaryEntry(details["path"], details["mtime"], details["size"], metadata))
+    return SchemaTree.new_instance(footer.schema), entries
+
+
+def write_summary(filename, entries):
+    """
+    WRITE A NEW SUMMARY FILE: A PARQUET FILE WITH NO ROWS, WHOSE FOOTER HAS THE
+    SCHEMA OF ALL THE FILES, AND WHOSE BODY HAS THE FileMetaData OF EACH FILE
+    :param filename: THE SUMMARY FILE (REPLACED ATOMICALLY)
+    :param entries: LIST OF SummaryEntry
+    """
+    temp = filename + ".tmp"
+    with io.open(temp, "wb") as file:
+        file.write(MAGIC)
+        schema = SchemaTree()
+        _write_entries(file, entries, schema)
+        _write_footer(file, schema)
+    if os.path.exists(filename):
+        os.remove(filename)  # WINDOWS CAN NOT RENAME OVER A FILE
+    os.rename(temp, filename)
+
+
+def append_summary(filename, entries):
+    """
+    ADD entries TO THE END OF AN EXISTING SUMMARY, REWRITING ONLY ITS FOOTER
+    :param filename: THE SUMMARY FILE
+    :param entries: LIST OF SummaryEntry, FOR FILES NOT ALREADY IN THE SUMMARY
+    """
+    with io.open(filename, "r+b") as file:
+        file.seek(0, io.SEEK_END)
+        size = file.tell()
+        file.seek(size - 8)
+        tail = file.read(8)
+        if tail[4:] != MAGIC:
+            Log.error("{{filename|quote}} is not a summary file", filename=filename)
+        footer_length, = UINT32.unpack(tail[:4])
+        footer_start = size - 8 - footer_length
+        file.seek(footer_start)
+        footer = read_thrift(io.BytesIO(file.read(footer_length)), FileMetaData)
+
+        file.seek(footer_start)
+        file.truncate()
+        schema = SchemaTree.new_instance(footer.schema)
+        _write_entries(file, entries, schema)
+        _write_footer(file, schema)
+
+
+def _write_entries(file, entries, schema):
+    """
+    WRITE THE FileMetaData OF EACH ENTRY, AND ADD ITS SCHEMA TO schema
+    """
+    for entry in entries:
+        metadata = copy(entry.metadata)
+        details = json.dumps({"path": entry.path, "mtime": entry.mtime, "size": entry.size})
+        metadata.key_value_metadata = (entry.metadata.key_value_metadata or []) + [KeyValue(key=SUMMARY_KEY, value=details)]
+        write_thrift(file, metadata)
+        schema.union(SchemaTree.new_instance(entry.metadata.schema))
+
+
+def _write_footer(file, schema):
+    footer = io.BytesIO()
+    write_thrift(footer, FileMetaData(
+        version=1,
+        schema=schema.get_parquet_metadata(),
+        num_rows=0,  # THE SUMMARY HAS NO ROWS OF ITS OWN
+        row_groups=[],
+        created_by=CREATED_BY
+    ))
+    footer = footer.getvalue()
+    file.write(footer + UINT32.pack(len(footer)) + MAGIC)
+
+
+def _footer_start(data):
+    if data[:len(MAGIC)] != MAGIC or data[-len(MAGIC):] != MAGIC:
+        Log.error("Not a summary file")
+    footer_length, = UINT32.unpack(data[-8:-4])
+    return len(data) - 8 - footer_length
+
+
+def main():
+    """
+    CREATE, OR UPDATE, THE SUMMARY OF THE DATASET IN A DIRECTORY
+    """
+    import argparse
+    from mo_parquet.dataset import Dataset
+
+    parser = argparse.ArgumentParser(description="Write the " + SUMMARY_NAME + " summary of the parquet files in a directory")
+    parser.add_argument("directory", help="root of the dataset")
+    parser.add_argument("--rebuild", action="store_true", help="write a new summary, rather than adding new files to the existing one")
+    args = parser.parse_args()
+
+    dataset = Dataset(args.directory, use_summary=not args.rebuild)
+    if args.rebuild:
+        dataset.write_summary()
+    else:
+        dataset.update_summary()
+    Log.note("{{num}} files in {{filename|quote}}", num=len(dataset.files), filename=os.path.join(args.directory, SUMMARY_NAME))
+
+
+if __name__ == "__main__":
+    main()
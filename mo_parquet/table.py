@@ -11,12 +11,12 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import numpy
-import pandas as pd
 
-from jx_base.expressions import extend
-from mo_dots import split_field, startswith_field, coalesce, join_field
+from mo_dots import split_field, join_field
 from mo_future import text_type
-from mo_json.typed_encoder import TYPE_PREFIX
+from mo_logs import Log
+from mo_parquet.buffer import ColumnBuffer, LevelBuffer, MAX_DICTIONARY_BYTES, _array
+from mo_parquet.schema import DEFAULT_RECORD, REPEATED, REQUIRED, TYPE_PREFIX, SchemaTree, parquet_type_to_type_name
 
 
 class Table(object):
@@ -26,30 +26,85 @@ class Table(object):
 
     def __init__(self, values, reps, defs, num_rows, schema, max_definition_level=None):
         """
-        :param values: dict from full name to list of values
-        :param reps:  dict from full name to list of values
-        :param defs: dict from full name to list of values
+        :param values: dict from full name to ColumnBuffer of values
+        :param reps:  dict from full name to LevelBuffer of repetition levels
+        :param defs: dict from full name to LevelBuffer of definition levels
         :param num_rows: number of rows in the dataset
         :param schema: The complete SchemaTree
         """
-        self.values = {untype_path(k): v for k, v in values.items()}
-        self.reps = {untype_path(k): v for k, v in reps.items()}
-        self.defs = {untype_path(k): v for k, v in defs.items()}
+        names = _untyped_names(values.keys())
+        self.values = {names[k]: v for k, v in values.items()}
+        self.reps = {names[k]: v for k, v in reps.items()}
+        self.defs = {names[k]: v for k, v in defs.items()}
         self.num_rows = num_rows
         self.schema = schema
         self.max_definition_level = max_definition_level or schema.max_definition_level()
+        self._row_index = {}
+        self._path_index = None
+
+    @staticmethod
+    def _view(values, reps, defs, num_rows, schema, max_definition_level, path_index=None, row_index=None):
+        """
+        Table OVER COLUMNS THAT ARE ALREADY NORMALIZED, SO NO NAME IS TOUCHED
+        """
+        output = object.__new__(Table)
+        output.values = values
+        output.reps = reps
+        output.defs = defs
+        output.num_rows = num_rows
+        output.schema = schema
+        output.max_definition_level = max_definition_level
+        output._row_index = {} if row_index is None else row_index
+        output._path_index = path_index
+        return output
 
     def __getattr__(self, item):
+        if item == "values" or item.startswith("_"):
+            # NOT SET YET (eg WHILE UNPICKLING)
+            raise AttributeError(item)
         return getattr(self.values, item)
 
-    def get_column(self, item):
-        sub_schema = self.schema
-        for n in split_field(item):
-            if n in sub_schema.more:
-                sub_schema = sub_schema.more.get(n)
-            else:
-                sub_schema = sub_schema.values.get(n)
+    @staticmethod
+    def concat(tables, schema=None, max_dictionary_bytes=MAX_DICTIONARY_BYTES, columns=None):
+        """
+        APPEND THE ROWS OF MANY TABLES
+        :param tables: LIST OF Table
+        :param schema: SchemaTree THAT COVERS ALL tables (DEFAULT IS THE UNION OF THEIR SCHEMAS)
+        :param max_dictionary_bytes: SAME AS ColumnShredder
+        :param columns: NAMES OF THE schema COLUMNS TO KEEP (None FOR ALL)
+        :return: Table, WITH NULLS FOR THE COLUMNS A TABLE DOES NOT HAVE
+        """
+        if schema is None:
+            schema = SchemaTree()
+            for t in tables:
+                schema.union(t.schema)
+
+        all_columns = schema.get_parquet_columns()
+        tables = [_split_columns(t, all_columns) for t in tables]
+        values = {}
+        reps = {}
+        defs = {}
+        for column in all_columns:
+            if columns is not None and column.name not in columns:
+                continue
+            name = column.name
+            column_values = values[name] = ColumnBuffer.new_instance(column.element.type, max_dictionary_bytes)
+            column_reps = reps[name] = LevelBuffer()
+            column_defs = defs[name] = LevelBuffer()
+            for t in tables:
+                if name in t.values:
+                    column_values.extend_array(_array(t.values[name]))
+                    column_reps.extend_levels(t.reps[name])
+                    column_defs.extend_levels(t.defs[name])
+                else:
+                    null_reps, null_defs = null_levels(schema, name, t.reps, t.defs, t.num_rows)
+                    column_reps.extend_levels(null_reps)
+                    column_defs.extend_levels(null_defs)
 
+        return Table(values, reps, defs, sum(t.num_rows for t in tables), schema)
+
+    def get_column(self, item):
+        sub_schema = self.schema.get_nodes(item)[-1]
         return Column(
             item,
             self.values[item],
@@ -57,70 +112,236 @@ class Table(object):
             self.defs[item],
             self.num_rows,
             sub_schema,
-            self.max_definition_level
+            self.max_definition_level,
+            self.get_row_index(item)
         )
 
+    def get_row_index(self, name):
+        """
+        :param name: FULL NAME OF A COLUMN
+        :return: RowIndex OF THE COLUMN (BUILT ON FIRST USE)
+        """
+        index = self._row_index.get(name)
+        if index is None:
+            index = self._row_index[name] = RowIndex(self.values[name], self.reps[name], self.defs[name], self.num_rows)
+        return index
+
+    def get_path_index(self):
+        """
+        :return: PathIndex OF THE COLUMN NAMES (BUILT ON FIRST USE)
+        """
+        if self._path_index is None:
+            self._path_index = PathIndex(self.values.keys())
+        return self._path_index
+
     @property
     def columns(self):
         return self.values.keys()
 
+    def project(self, path):
+        """
+        :param path: PATH TO A PROPERTY (OR SUB-OBJECT)
+        :return: Table VIEW OF THE COLUMNS UNDER path, SHARING THIS TABLE'S
+                 BUFFERS, AND ITS (COMPLETE) SCHEMA, LIKE A PROJECTED read()
+        """
+        path_index = self.get_path_index().subtree(path)
+        names = path_index.names
+        values, reps, defs = self.values, self.reps, self.defs
+        return Table._view(
+            {n: values[n] for n in names},
+            {n: reps[n] for n in names},
+            {n: defs[n] for n in names},
+            self.num_rows,
+            self.schema,
+            self.max_definition_level,
+            path_index,
+            self._row_index  # SAME ROWS, SO THE CACHE IS SHARED
+        )
+
     def __getitem__(self, item):
         if isinstance(item, text_type):
-            sub_schema = self.schema
-            for n in split_field(item):
-                if n in sub_schema.more:
-                    sub_schema = sub_schema.more.get(n)
-                else:
-                    sub_schema = sub_schema.values.get(n)
-
-            return Table(
-                {k: v for k, v in self.values.items() if startswith_field(k, item)},
-                {k: v for k, v in self.reps.items() if startswith_field(k, item)},
-                {k: v for k, v in self.defs.items() if startswith_field(k, item)},
-                self.num_rows,
-                sub_schema,
-                self.max_definition_level
-            )
+            return self.project(item)
         elif isinstance(item, slice):
-            start = coalesce(item.start, 0)
-            stop = coalesce(item.stop, self.num_rows)
-
+            start, stop, step = item.indices(self.num_rows)
+            if step != 1:
+                Log.error("Can only slice contiguous rows")
+            stop = max(start, stop)
             if start == 0 and stop == self.num_rows:
                 return self
 
-            first = 0
-            last = 0
-            counter = 0
-            for i, r in enumerate(self.reps):
-                if counter == start:
-                    first = i
-                elif counter == stop:
-                    last = i
-                    break
-                if r == 0:
-                    counter += 1
-
-            return Table(
-                {k: v[first:last] for k, v in self.values.items()},
-                {k: v[first:last] for k, v in self.reps.items()},
-                {k: v[first:last] for k, v in self.defs.items()},
-                stop - start,
-                self.schema
+            values = {}
+            reps = {}
+            defs = {}
+            for name in self.values:
+                index = self.get_row_index(name)
+                values[name], reps[name], defs[name] = index.slice(self.values[name], self.reps[name], self.defs[name], start, stop)
+            return Table._view(values, reps, defs, stop - start, self.schema, self.max_definition_level, self._path_index)
+
+    def get_arrays(self, name):
+        """
+        :param name: FULL NAME OF A COLUMN
+        :return: ArrayColumn OF THE COLUMN
+        """
+        return ArrayColumn.new_instance(name, self.values[name], self.reps[name], self.defs[name], self.num_rows, self.schema)
+
+    def to_numpy(self):
+        """
+        :return: MAP FROM COLUMN NAME TO ArrayColumn (values, validity AND offsets)
+        """
+        return {name: self.get_arrays(name) for name in self.values}
+
+    def to_pandas(self, explode=False):
+        """
+        :param explode: False - ONE ROW PER RECORD, REPEATED COLUMNS HOLD (NESTED) LISTS
+                        True - ONE FRAME PER REPEATED PROPERTY, ONE ROW PER ITEM
+        :return: DataFrame, OR (WHEN explode) MAP FROM REPEATED PROPERTY ("." FOR
+                 THE RECORD) TO DataFrame, INDEXED BY THE RECORD NUMBER
+        """
+        pd = _pandas()
+        arrays = [self.get_arrays(name) for name in sorted(self.values)]
+        if not explode:
+            return pd.DataFrame(
+                {a.name: a.dense() if not a.offsets else a.to_list() for a in arrays},
+                columns=[a.name for a in arrays]
+            )
+
+        groups = {}
+        for a in arrays:
+            groups.setdefault(a.path, []).append(a)
+        output = {}
+        for path, group in groups.items():
+            index = pd.Index(group[0].row_ids(self.num_rows), name="row")
+            output[path] = pd.DataFrame(
+                {a.name: a.dense() for a in group},
+                index=index,
+                columns=[a.name for a in group]
             )
+        return output
 
     def __len__(self):
         return self.num_rows
 
 
+class ArrayColumn(object):
+    """
+    ONE COLUMN AS ARROW-STYLE ARRAYS, DERIVED FROM ITS LEVELS:
+
+    values - THE DEFINED VALUES (THE COLUMN BUFFER ITSELF, NO COPY)
+    validity - BOOLEAN MASK, ONE PER SLOT, OF THE SLOTS THAT HAVE A VALUE (None IF ALL DO)
+    offsets - ONE ARRAY PER REPEATED ANCESTOR, OUTERMOST FIRST: THE ITEMS OF
+              PARENT i ARE offsets[i]:offsets[i+1] (THE PARENTS OF THE FIRST
+              ARE THE RECORDS)
+
+    A SLOT IS AN ITEM OF THE INNERMOST REPEATED PROPERTY (OR A RECORD, IF
+    THERE ARE NONE).  A MISSING LIST IS EXPORTED AS AN EMPTY LIST.
+    """
+
+    __slots__ = ["name", "path", "values", "validity", "offsets"]
+
+    def __init__(self, name, path, values, validity, offsets):
+        self.name = name
+        self.path = path
+        self.values = values
+        self.validity = validity
+        self.offsets = offsets
+
+    @staticmethod
+    def new_instance(name, values, reps, defs, num_rows, schema):
+        """
+        :param name: FULL NAME OF THE COLUMN
+        :param schema: SchemaTree WITH THE COLUMN
+        """
+        steps = split_field(name)
+        path = "."
+        list_levels = []  # DEFINITION LEVEL OF EACH REPEATED ANCESTOR
+        max_definition_level = 0
+        depth = 0
+        parent = schema
+        for node in schema.get_nodes(name):
+            if parent.more.get(".") is not node:
+                depth += 1
+            parent = node
+            element = node.element
+            if element is None or element is DEFAULT_RECORD:
+                continue
+            if element.repetition_type != REQUIRED:
+                max_definition_level += 1
+            if element.repetition_type == REPEATED:
+                list_levels.append(max_definition_level)
+                path = join_field(steps[:depth])
+
+        values = _array(values)
+        reps = _array(reps)
+        defs = _array(defs)
+        if not list_levels:
+            if len(values) == num_rows:
+                return ArrayColumn(name, path, values, None, [])
+            return ArrayColumn(name, path, values, defs == max_definition_level, [])
+
+        num_levels = max(len(reps), len(defs))
+        if not len(defs):
+            defs = numpy.full(num_levels, max_definition_level, dtype=numpy.uint8)
+        offsets = []
+        parent_level = 0
+        for repetition_level, list_level in enumerate(list_levels):
+            # A LEVEL STARTS A NEW PARENT, AND/OR A NEW ITEM, IF IT REPEATS
+            # NO DEEPER THAN THE LIST, AND IS DEFINED AT LEAST AS FAR
+            parents = numpy.flatnonzero((reps <= repetition_level) & (defs >= parent_level))
+            items = (reps <= repetition_level + 1) & (defs >= list_level)
+            count = numpy.concatenate(([0], numpy.cumsum(items)))
+            offsets.append(count[numpy.append(parents, num_levels)])
+            parent_level = list_level
+
+        if len(values) == offsets[-1][-1]:
+            return ArrayColumn(name, path, values, None, offsets)
+        slot_defs = defs[defs >= parent_level]
+        return ArrayColumn(name, path, values, slot_defs == max_definition_level, offsets)
+
+    def dense(self):
+        """
+        :return: ONE VALUE PER SLOT, WITH NaN (FOR NUMBERS) OR None FOR THE
+                 MISSING VALUES (values ITSELF IF THERE ARE NONE MISSING)
+        """
+        if self.validity is None:
+            return self.values
+        if self.values.dtype.kind in "iuf":
+            output = numpy.full(len(self.validity), numpy.nan)
+        else:
+            output = numpy.empty(len(self.validity), dtype=object)
+        output[self.validity] = self.values
+        return output
+
+    def row_ids(self, num_rows):
+        """
+        :return: THE RECORD NUMBER OF EACH SLOT
+        """
+        output = numpy.arange(num_rows)
+        for offsets in self.offsets:
+            output = numpy.repeat(output, numpy.diff(offsets))
+        return output
+
+    def to_list(self):
+        """
+        :return: ONE (NESTED) LIST OF SLOTS PER RECORD
+        """
+        output = self.dense().tolist()
+        for offsets in reversed(self.offsets):
+            output = [output[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+        return output
+
+
 class Column(object):
     """
     REPRESENT A DATA FRAME
     """
 
-    def __init__(self, name, values, reps, defs, num_rows, schema, max_definition_level):
+    def __init__(self, name, values, reps, defs, num_rows, schema, max_definition_level, row_index=None):
         """
-        :param values: MAP FROM NAME TO LIST OF PARQUET VALUES
+        :param values: ColumnBuffer OF PARQUET VALUES
+        :param reps: LevelBuffer OF REPETITION LEVELS
+        :param defs: LevelBuffer OF DEFINITION LEVELS
         :param schema:
+        :param row_index: RowIndex OF THE COLUMN (DEFAULT IS TO BUILD IT)
         """
         self.name = name
         self.values = values
@@ -129,37 +350,262 @@ class Column(object):
         self.num_rows = num_rows
         self.schema = schema
         self.max_definition_level = max_definition_level
+        self.row_index = row_index or RowIndex(values, reps, defs, num_rows)
+
+    def get_row(self, row):
+        """
+        :return: (values, reps, defs) OF ONE ROW, AS numpy VIEWS
+        """
+        if not 0 <= row < self.num_rows:
+            raise IndexError("row out of range")
+        return self.row_index.slice(self.values, self.reps, self.defs, row, row + 1)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self.get_row(item)
+        start, stop, step = item.indices(self.num_rows)
+        if step != 1:
+            Log.error("Can only slice contiguous rows")
+        stop = max(start, stop)
+        values, reps, defs = self.row_index.slice(self.values, self.reps, self.defs, start, stop)
+        return Column(self.name, values, reps, defs, stop - start, self.schema, self.max_definition_level)
 
     def __len__(self):
         return self.num_rows
 
 
+class PathIndex(object):
+    """
+    TRIE OF COLUMN NAMES, ONE NODE PER PROPERTY ON THE PATH, EACH HOLDING
+    THE NAMES OF ALL COLUMNS BELOW IT, SO THE COLUMNS UNDER A PATH ARE FOUND
+    WITHOUT LOOKING AT THE OTHER COLUMNS
+    """
 
-eq_backup = pd.DataFrame.__eq__
-ne_backup = pd.DataFrame.__ne__
+    __slots__ = ["children", "names"]
 
+    def __init__(self, names=()):
+        self.children = {}
+        self.names = []
+        for name in names:
+            self.add(name)
 
-@extend(pd.DataFrame)
-def __eq__(self, other):
-    try:
-        return eq_backup(self, other)
-    except Exception as e:
-        return False
+    def add(self, name):
+        node = self
+        node.names.append(name)
+        for step in split_field(name):
+            child = node.children.get(step)
+            if child is None:
+                child = node.children[step] = PathIndex()
+            child.names.append(name)
+            node = child
 
+    def find(self, path):
+        """
+        :return: PathIndex NODE AT path, OR None
+        """
+        node = self
+        for step in split_field(path):
+            node = node.children.get(step)
+            if node is None:
+                return None
+        return node
 
-@extend(pd.DataFrame)
-def __ne__(self, other):
-    try:
-        return ne_backup(self, other)
-    except Exception as e:
-        return True
+    def subtree(self, path):
+        """
+        :return: NEW ROOT, WITH ONLY THE COLUMNS UNDER path (THE NODES BELOW path ARE SHARED)
+        """
+        node = self.find(path)
+        if node is None:
+            return PathIndex()
+        steps = split_field(path)
+        if not steps:
+            return node
+        root = parent = PathIndex()
+        for step in steps[:-1]:
+            child = PathIndex()
+            child.names = node.names
+            parent.names = node.names
+            parent.children[step] = child
+            parent = child
+        parent.names = node.names
+        parent.children[steps[-1]] = node
+        return root
 
-def untype_path(path):
-    return join_field(c for c in split_field(path) if not c.startswith(TYPE_PREFIX))
 
+class RowIndex(object):
+    """
+    WHERE EACH ROW STARTS, IN THE LEVELS AND IN THE VALUES, OF ONE COLUMN,
+    SO FINDING THE ROWS OF A SLICE IS A LOOKUP, NOT A SCAN OF THE LEVELS
+    """
+
+    __slots__ = ["levels", "values"]
+
+    def __init__(self, values, reps, defs, num_rows):
+        """
+        :param values: THE DEFINED VALUES OF THE COLUMN
+        :param reps: REPETITION LEVELS (MAY BE EMPTY IF THE COLUMN IS NOT REPEATED)
+        :param defs: DEFINITION LEVELS (MAY BE EMPTY IF THE COLUMN IS REQUIRED)
+        :param num_rows: NUMBER OF ROWS IN THE COLUMN
+        """
+        reps = _array(reps)
+        num_values = len(values)
+        num_levels = max(len(reps), len(defs))
+        if len(reps):
+            self.levels = numpy.append(numpy.flatnonzero(reps == 0), num_levels)
+        else:
+            self.levels = numpy.arange(num_rows + 1)
+
+        if num_values == num_levels:
+            self.values = self.levels  # EVERY LEVEL HAS A VALUE
+        elif not num_values:
+            self.values = numpy.zeros(num_rows + 1, dtype=numpy.intp)
+        else:
+            # THE DEFINED VALUES ARE THE ONES AT THE MAXIMUM DEFINITION LEVEL
+            defs = _array(defs)
+            defined = numpy.cumsum(defs == defs.max())
+            self.values = numpy.concatenate(([0], defined))[self.levels]
 
-@extend(pd.DataFrame)
-def __data__(self):
-    return {k:v for k,v in self.to_dict().items()}
+    def row_of(self, position):
+        """
+        :param position: INDEX (OR numpy ARRAY OF INDEXES) INTO THE LEVELS
+        :return: THE ROW HOLDING THE LEVEL (BINARY SEARCH)
+        """
+        return numpy.searchsorted(self.levels, position, side="right") - 1
+
+    def slice(self, values, reps, defs, start, stop):
+        """
+        :return: (values, reps, defs) OF ROWS [start, stop), AS numpy VIEWS
+        """
+        first, last = self.levels[start], self.levels[stop]
+        reps = _array(reps)
+        defs = _array(defs)
+        return (
+            _array(values)[self.values[start]:self.values[stop]],
+            reps[first:last] if len(reps) else reps,
+            defs[first:last] if len(defs) else defs
+        )
 
 
+def null_levels(schema, name, reps, defs, num_rows):
+    """
+    THE LEVELS OF A LEAF THAT HAS NO VALUES IN ANY OF num_rows RECORDS
+
+    THEY ARE DERIVED FROM A SIBLING COLUMN UNDER THE DEEPEST ANCESTOR THAT
+    HAS ANY COLUMNS: THE LEAF HAS ONE NULL FOR EACH ITEM OF THAT ANCESTOR,
+    DEFINED UP TO (AT MOST) THAT ANCESTOR
+
+    :param schema: SchemaTree THAT HAS THE LEAF
+    :param name: FULL NAME OF THE LEAF
+    :param reps: MAP FROM NAME TO REPETITION LEVELS OF THE COLUMNS WE HAVE
+    :param defs: MAP FROM NAME TO DEFINITION LEVELS OF THE COLUMNS WE HAVE
+    :param num_rows: NUMBER OF RECORDS IN reps AND defs
+    :return: (reps, defs) AS LevelBuffer, COMPACTED TO (level, count) RUNS WHEN POSSIBLE
+    """
+    repetition_level = 0
+    definition_level = 0
+    sibling = None
+    for node in schema.get_nodes(name)[:-1]:
+        element = node.element
+        if element is not None:
+            if element.repetition_type == REPEATED:
+                repetition_level += 1
+            if element.repetition_type != REQUIRED:
+                definition_level += 1
+        found = sorted(leaf for leaf in node.leaves if leaf != name and leaf in reps)
+        if not found:
+            break
+        sibling = found[0], repetition_level, definition_level
+
+    if sibling is None:
+        return LevelBuffer.zeros(num_rows), LevelBuffer.zeros(num_rows)
+
+    sibling_name, repetition_level, definition_level = sibling
+    sibling_reps = numpy.asarray(getattr(reps[sibling_name], "array", reps[sibling_name]))
+    sibling_defs = numpy.asarray(getattr(defs[sibling_name], "array", defs[sibling_name]))
+    keep = sibling_reps <= repetition_level
+    null_reps = LevelBuffer()
+    null_reps.extend_levels(sibling_reps[keep])
+    null_defs = LevelBuffer()
+    null_defs.extend_levels(numpy.minimum(sibling_defs[keep], definition_level))
+    return null_reps, null_defs
+
+
+_pandas_module = []
+
+
+def _pandas():
+    """
+    :return: THE pandas MODULE, IMPORTED (AND EXTENDED) ON FIRST USE, BECAUSE IT IS SLOW TO IMPORT
+    """
+    if _pandas_module:
+        return _pandas_module[0]
+
+    import pandas as pd
+    from jx_base.expressions import extend
+
+    eq_backup = pd.DataFrame.__eq__
+    ne_backup = pd.DataFrame.__ne__
+
+    @extend(pd.DataFrame)
+    def __eq__(self, other):
+        try:
+            return eq_backup(self, other)
+        except Exception as e:
+            return False
+
+    @extend(pd.DataFrame)
+    def __ne__(self, other):
+        try:
+            return ne_backup(self, other)
+        except Exception as e:
+            return True
+
+    @extend(pd.DataFrame)
+    def __data__(self):
+        return {k:v for k,v in self.to_dict().items()}
+
+    _pandas_module.append(pd)
+    return pd
+
+def _untyped_names(names):
+    """
+    :return: MAP FROM COLUMN NAME TO ITS NAME WITHOUT TYPES, UNLESS THAT IS
+    SHARED WITH ANOTHER COLUMN (THE PER-TYPE COLUMNS OF A POLYMORPHIC PROPERTY)
+    """
+    untyped = {name: untype_path(name) for name in names}
+    counts = {}
+    for name in untyped.values():
+        counts[name] = counts.get(name, 0) + 1
+    return {name: u if counts[u] == 1 else name for name, u in untyped.items()}
+
+
+def _split_columns(table, columns):
+    """
+    :param columns: COLUMNS OF A SCHEMA THAT MAY HAVE SPLIT SOME OF THE table LEAVES INTO TYPES
+    :return: table, WITH THOSE LEAVES MOVED TO THEIR TYPED NAME (SEE SchemaTree.split())
+    """
+    values, reps, defs = dict(table.values), dict(table.reps), dict(table.defs)
+    moved = False
+    for column in columns:
+        path = split_field(column.name)
+        if not path[-1].startswith(TYPE_PREFIX) or column.name in values:
+            continue
+        parent = join_field(path[:-1])
+        if parent not in values:
+            continue
+        element = table.schema.get_nodes(parent)[-1].element
+        if parquet_type_to_type_name.get(element.type) != path[-1]:
+            continue
+        parent_defs = LevelBuffer()
+        parent_defs.extend_levels(defs.pop(parent))
+        values[column.name] = values.pop(parent)
+        reps[column.name] = reps.pop(parent)
+        defs[column.name] = parent_defs.raise_level(table.schema.definition_level(parent))
+        moved = True
+    if not moved:
+        return table
+    return Table._view(values, reps, defs, table.num_rows, table.schema, table.max_definition_level)
+
+
+def untype_path(path):
+    return join_field(c for c in split_field(path) if not c.startswith(TYPE_PREFIX))
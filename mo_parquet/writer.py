@@ -0,0 +1,662 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import mmap
+import tempfile
+import zlib
+
+import numpy
+
+from mo_future import binary_type, text_type
+from mo_logs import Log
+from mo_parquet.bloom import BLOOM_TYPES, BloomFilter, DEFAULT_FPP, hash_values
+from mo_parquet.buffer import LevelBuffer, MAX_DICTIONARY_BYTES
+from mo_parquet.encodings import UINT32, bit_width, decode_levels, encode_indices, encode_levels, encode_plain
+from mo_parquet.statistics import get_statistics, merge_statistics, statistic_key
+from mo_parquet.table import RowIndex, null_levels
+from parquet_thrift.parquet.ttypes import BoundaryOrder, ColumnChunk, ColumnIndex, ColumnMetaData, ColumnOrder, CompressionCodec, DataPageHeader, DictionaryPageHeader, Encoding, FileMetaData, OffsetIndex, PageHeader, PageLocation, PageType, RowGroup, TypeDefinedOrder
+from thrift_structures import write_thrift
+
+MAGIC = b"PAR1"
+CREATED_BY = "mo-parquet"
+
+
+class ParquetWriter(object):
+    """
+    WRITE Table ROW GROUPS TO A PARQUET FILE
+
+    A ROW GROUP IS BUILT FROM ONE OR MORE Table (SEE append()), EACH ENCODED
+    AS ONE PAGE PER COLUMN AS SOON AS IT ARRIVES. THE ENCODED PAGES ARE HELD
+    IN MEMORY, UP TO max_memory BYTES, AFTER WHICH THE PAGES OF THE LARGEST
+    COLUMNS ARE SPILLED TO A TEMPORARY FILE, AND COPIED BACK (THROUGH mmap)
+    WHEN THE ROW GROUP ENDS
+
+    THE SchemaTree MAY EXPAND BETWEEN ROW GROUPS: COLUMNS MISSING FROM AN
+    EARLY ROW GROUP ARE WRITTEN AS ALL-NULL CHUNKS WHEN THE FILE IS CLOSED
+
+    THE PAGE INDEX (A ColumnIndex AND OffsetIndex PER COLUMN CHUNK) IS
+    WRITTEN AFTER THE LAST ROW GROUP, SO READERS CAN SKIP PAGES
+
+    COLUMNS NAMED IN bloom_filters GET A SPLIT-BLOCK BLOOM FILTER PER COLUMN
+    CHUNK, WRITTEN AFTER THE CHUNKS OF ITS ROW GROUP, SO READERS CAN SKIP
+    ROW GROUPS THAT DO NOT HAVE THE (HIGH CARDINALITY) VALUE LOOKED FOR
+    """
+
+    def __init__(self, file, schema=None, compression=None, use_dictionary=True, max_memory=None, max_dictionary_bytes=MAX_DICTIONARY_BYTES, max_page_rows=None, bloom_filters=None, bloom_filter_fpp=DEFAULT_FPP):
+        """
+        :param file: FILENAME, OR BINARY FILE-LIKE OBJECT
+        :param schema: SchemaTree (DEFAULT IS THE SCHEMA OF THE FIRST Table WRITTEN)
+        :param compression: None, OR "gzip"
+        :param use_dictionary: DICTIONARY ENCODE COLUMNS THAT HAVE A DICTIONARY (SEE DictionaryBuffer)
+        :param max_memory: BYTES OF ENCODED PAGES TO HOLD FOR THE OPEN ROW GROUP BEFORE SPILLING (None FOR NO LIMIT)
+        :param max_dictionary_bytes: STOP DICTIONARY ENCODING A COLUMN CHUNK WHEN ITS DICTIONARY TAKES THIS MANY BYTES
+        :param max_page_rows: MAXIMUM ROWS IN A DATA PAGE (None FOR ONE PAGE PER Table)
+        :param bloom_filters: LIST OF COLUMN NAMES THAT GET A BLOOM FILTER
+        :param bloom_filter_fpp: FALSE POSITIVE PROBABILITY OF EACH BLOOM FILTER
+        """
+        if isinstance(file, (text_type, binary_type)):
+            self.file = io.open(file, "wb")
+            self.close_file = True
+        else:
+            self.file = file
+            self.close_file = False
+        self.schema = schema
+        self.use_dictionary = use_dictionary
+        self.codec = compression_to_codec.get(compression)
+        if self.codec is None:
+            Log.error("Do not know compression {{compression|quote}}", compression=compression)
+        self.max_memory = max_memory
+        self.max_dictionary_bytes = max_dictionary_bytes
+        self.max_page_rows = max_page_rows
+        self.bloom_filters = set(bloom_filters or [])
+        self.bloom_filter_fpp = bloom_filter_fpp
+        self.row_groups = []  # LIST OF (num_rows, MAP FROM COLUMN NAME TO (ColumnChunk, ColumnIndex, OffsetIndex))
+        self.num_rows = 0
+        self.offset = 0
+        self._chunks = {}  # MAP FROM COLUMN NAME TO ChunkBuffer, FOR THE OPEN ROW GROUP
+        self._row_group_rows = 0  # ROWS IN THE OPEN ROW GROUP
+        self._memory = 0  # BYTES OF PAGES HELD IN MEMORY
+        self._spill = None  # SpillFile, CREATED ON FIRST SPILL
+        self._level_nodes = {}  # MAP FROM id() TO SCHEMA NODE THAT HAS A COLUMN IN _level_columns
+        self._level_columns = set()  # COLUMNS WHOSE LEVELS ARE KEPT, TO GIVE LATE COLUMNS THEIR NULLS (SEE _keeps_levels())
+        self._row_group_levels = []  # FOR EACH ROW GROUP, MAP FROM COLUMN NAME TO ITS _pack_levels() (reps, defs)
+        self._write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, data):
+        self.file.write(data)
+        self.offset += len(data)
+
+    def write(self, table):
+        """
+        WRITE Table AS ONE ROW GROUP
+        """
+        self.append(table)
+        self.end_row_group()
+
+    def append(self, table):
+        """
+        ADD THE ROWS OF Table TO THE OPEN ROW GROUP
+        """
+        if self.schema is None:
+            self.schema = table.schema
+        if not table.num_rows:
+            return
+
+        columns = self.schema.get_parquet_columns()
+        kept_reps = {n: c.reps for n, c in self._chunks.items() if c.reps is not None}
+        kept_defs = {n: c.defs for n, c in self._chunks.items() if c.defs is not None}
+        for column in columns:
+            name = column.name
+            if name in self._chunks:
+                continue
+            chunk = self._chunks[name] = ChunkBuffer(column, self.max_dictionary_bytes if self.use_dictionary else 0)
+            if name in self.bloom_filters:
+                if column.element.type not in BLOOM_TYPES:
+                    Log.error("{{name|quote}} can not have a bloom filter", name=name)
+                chunk.hashes = []
+            if self._keeps_levels(column):
+                chunk.reps, chunk.defs = LevelBuffer(), LevelBuffer()
+            if self._row_group_rows:
+                # NEW COLUMN, NULL FOR THE EARLIER Table IN THIS ROW GROUP
+                if not column.max_definition_level:
+                    Log.error("{{name|quote}} is required, can not fill with nulls", name=name)
+                reps, defs = null_levels(self.schema, name, kept_reps, kept_defs, self._row_group_rows)
+                self._add_pages(chunk, [], reps, defs, self._row_group_rows)
+
+        for column in columns:
+            name = column.name
+            chunk = self._chunks[name]
+            if name in table.values:
+                self._add_pages(chunk, table.values[name], table.reps[name], table.defs[name], table.num_rows)
+            else:
+                if not column.max_definition_level:
+                    Log.error("{{name|quote}} is required, can not fill with nulls", name=name)
+                reps, defs = null_levels(self.schema, name, table.reps, table.defs, table.num_rows)
+                self._add_pages(chunk, [], reps, defs, table.num_rows)
+        self._row_group_rows += table.num_rows
+
+        if self.max_memory is not None and self._memory > self.max_memory:
+            if self._spill is None:
+                self._spill = SpillFile()
+            for chunk in sorted(self._chunks.values(), key=lambda c: -c.memory):
+                if self._memory <= self.max_memory:
+                    break
+                self._memory -= chunk.spill(self._spill)
+
+    def end_row_group(self):
+        """
+        WRITE THE OPEN ROW GROUP (ITS PAGES IN MEMORY, AND SPILLED) TO THE FILE
+        """
+        if not self._row_group_rows:
+            return
+        chunks = {}
+        for name, chunk in self._chunks.items():
+            chunks[name] = self._write_chunk(chunk)
+        for name, chunk in self._chunks.items():
+            if chunk.hashes is not None:
+                column_chunk = chunks[name][0]
+                column_chunk.meta_data.bloom_filter_offset, column_chunk.meta_data.bloom_filter_length = self._write_bloom_filter(chunk)
+        self.row_groups.append((self._row_group_rows, chunks))
+        self._row_group_levels.append({
+            name: (_pack_levels(chunk.reps, chunk.column.max_repetition_level), _pack_levels(chunk.defs, chunk.column.max_definition_level))
+            for name, chunk in self._chunks.items()
+            if chunk.reps is not None
+        })
+        self.num_rows += self._row_group_rows
+
+        self._chunks = {}
+        self._row_group_rows = 0
+        self._memory = 0
+        if self._spill is not None:
+            self._spill.reset()
+
+    def _keeps_levels(self, column):
+        """
+        :return: True IF THE LEVELS OF column ARE KEPT: IT IS THE FIRST COLUMN
+        SEEN UNDER ONE OF ITS PARENTS, SO A COLUMN FOUND UNDER THAT PARENT LATER
+        CAN GET ITS NULLS FROM IT (SEE null_levels())
+        """
+        name = column.name
+        if name not in self._level_columns:
+            for node in self.schema.get_nodes(name)[:-1]:
+                if id(node) not in self._level_nodes:
+                    self._level_nodes[id(node)] = node
+                    self._level_columns.add(name)
+        return name in self._level_columns
+
+    def _add_pages(self, chunk, values, reps, defs, num_rows):
+        """
+        ENCODE num_rows ROWS OF chunk, AS DATA PAGES OF (AT MOST) max_page_rows
+        """
+        if chunk.reps is not None:
+            chunk.reps.extend_levels(reps)
+            chunk.defs.extend_levels(defs)
+        indices = chunk.add_dictionary(values)
+        if chunk.hashes is not None and indices is None and len(values):
+            # DICTIONARY VALUES ARE HASHED WHEN THE CHUNK IS WRITTEN
+            chunk.hashes.append(numpy.unique(hash_values(getattr(values, "array", values), chunk.column.element.type)))
+        max_page_rows = self.max_page_rows
+        if not max_page_rows or num_rows <= max_page_rows:
+            self._add_page(chunk, values, reps, defs, indices, num_rows)
+            return
+
+        index = RowIndex(values, reps, defs, num_rows)
+        for start in range(0, num_rows, max_page_rows):
+            stop = min(start + max_page_rows, num_rows)
+            page_values, page_reps, page_defs = index.slice(values, reps, defs, start, stop)
+            page_indices = None if indices is None else indices[index.values[start]:index.values[stop]]
+            self._add_page(chunk, page_values, page_reps, page_defs, page_indices, stop - start)
+
+    def _add_page(self, chunk, values, reps, defs, indices, num_rows):
+        """
+        ENCODE ONE DATA PAGE OF chunk
+        :param indices: INDEXES OF values IN THE chunk DICTIONARY (None FOR PLAIN ENCODING)
+        """
+        column = chunk.column
+        element = column.element
+        num_values = len(defs)
+
+        if column.max_definition_level:
+            num_defined = _count(defs, column.max_definition_level)
+        else:
+            num_values = len(values)
+            num_defined = num_values
+        if num_defined != len(values):
+            Log.error(
+                "{{name|quote}} has {{num}} values, but definition levels expect {{expect}}",
+                name=column.name,
+                num=len(values),
+                expect=num_defined
+            )
+
+        body = []
+        if column.max_repetition_level:
+            encoded = encode_levels(reps, bit_width(column.max_repetition_level))
+            body.append(UINT32.pack(len(encoded)))
+            body.append(encoded)
+        if column.max_definition_level:
+            encoded = encode_levels(defs, bit_width(column.max_definition_level))
+            body.append(UINT32.pack(len(encoded)))
+            body.append(encoded)
+
+        if indices is not None:
+            encoding = Encoding.PLAIN_DICTIONARY
+            body.append(encode_indices(indices, len(chunk.dictionary)))
+        else:
+            encoding = Encoding.PLAIN
+            body.append(encode_plain(values, element.type))
+
+        page, compressed_size, uncompressed_size = self._encode_page(
+            b"".join(body),
+            type=PageType.DATA_PAGE,
+            data_page_header=DataPageHeader(
+                num_values=num_values,
+                encoding=encoding,
+                definition_level_encoding=Encoding.RLE,
+                repetition_level_encoding=Encoding.RLE
+            )
+        )
+        chunk.add_page(page, compressed_size, uncompressed_size, num_rows, num_values, encoding, get_statistics(values, num_values, element))
+        self._memory += len(page)
+
+    def _write_chunk(self, chunk):
+        """
+        WRITE THE DICTIONARY, AND DATA PAGES, OF ONE COLUMN CHUNK
+        :return: (ColumnChunk, ColumnIndex, OffsetIndex) (ColumnIndex IS None IF PAGES HAVE NO BOUNDS)
+        """
+        column = chunk.column
+        element = column.element
+        total_compressed_size = chunk.compressed_size
+        total_uncompressed_size = chunk.uncompressed_size
+        encodings = sorted(chunk.encodings) + [Encoding.RLE]
+
+        if chunk.dictionary:
+            dictionary_page_offset = self.offset
+            page, compressed_size, uncompressed_size = self._encode_page(
+                encode_plain(chunk.dictionary, element.type),
+                type=PageType.DICTIONARY_PAGE,
+                dictionary_page_header=DictionaryPageHeader(
+                    num_values=len(chunk.dictionary),
+                    encoding=Encoding.PLAIN_DICTIONARY
+                )
+            )
+            self._write(page)
+            total_compressed_size += compressed_size
+            total_uncompressed_size += uncompressed_size
+        else:
+            dictionary_page_offset = None
+
+        data_page_offset = self.offset
+        locations = []
+        for page, first_row in zip(chunk.pages, chunk.first_rows):
+            if isinstance(page, tuple):
+                page = self._spill.read(*page)
+            locations.append(PageLocation(offset=self.offset, compressed_page_size=len(page), first_row_index=first_row))
+            self._write(page)
+
+        statistics = merge_statistics(chunk.statistics, element)
+        if len(chunk.statistics) > 1:
+            statistics.distinct_count = len(chunk.dictionary) if chunk.encodings == {Encoding.PLAIN_DICTIONARY} else None
+
+        column_chunk = ColumnChunk(
+            file_offset=self.offset,
+            meta_data=ColumnMetaData(
+                type=element.type,
+                encodings=encodings,
+                path_in_schema=list(column.path_in_schema),
+                codec=self.codec,
+                num_values=chunk.num_values,
+                total_uncompressed_size=total_uncompressed_size,
+                total_compressed_size=total_compressed_size,
+                data_page_offset=data_page_offset,
+                dictionary_page_offset=dictionary_page_offset,
+                statistics=statistics
+            )
+        )
+        return column_chunk, _column_index(chunk), OffsetIndex(page_locations=locations)
+
+    def _write_bloom_filter(self, chunk):
+        """
+        WRITE THE BLOOM FILTER OF THE HASHES OF THE chunk VALUES
+        :return: (offset, length) OF THE BloomFilterHeader AND BITSET
+        """
+        hashes = chunk.hashes
+        if chunk.dictionary:
+            hashes = hashes + [hash_values(chunk.dictionary, chunk.column.element.type)]
+        hashes = numpy.unique(numpy.concatenate(hashes)) if hashes else numpy.zeros(0, dtype=numpy.uint64)
+        bloom = BloomFilter.new_instance(hashes.shape[0], self.bloom_filter_fpp)
+        bloom.insert_hashes(hashes)
+        offset, header_length = self._write_thrift(bloom.header())
+        self._write(bloom.to_bytes())
+        return offset, header_length + bloom.num_bytes
+
+    def _encode_page(self, uncompressed, **header):
+        """
+        :param uncompressed: PAGE BODY
+        :param header: PageHeader PROPERTIES (EXCEPT SIZES)
+        :return: (page, compressed_size, uncompressed_size) OF THE PAGE, INCLUDING HEADER
+        """
+        compressed = compress(uncompressed, self.codec)
+        header = thrift_to_bytes(PageHeader(
+            uncompressed_page_size=len(uncompressed),
+            compressed_page_size=len(compressed),
+            **header
+        ))
+        return header + compressed, len(header) + len(compressed), len(header) + len(uncompressed)
+
+    def _write_thrift(self, thrift):
+        """
+        :return: (offset, length) OF THE thrift STRUCTURE WRITTEN
+        """
+        data = thrift_to_bytes(thrift)
+        offset = self.offset
+        self._write(data)
+        return offset, len(data)
+
+    def _write_nulls(self, column, num_rows, levels):
+        """
+        :param levels: THE _row_group_levels OF THE ROW GROUP
+        :return: _write_chunk() FOR A COLUMN THAT DID NOT EXIST WHEN ROW GROUP WAS WRITTEN
+        """
+        if not column.max_definition_level:
+            Log.error("{{name|quote}} is required, can not fill with nulls", name=column.name)
+        kept_reps = {name: _unpack_levels(r) for name, (r, _) in levels.items()}
+        kept_defs = {name: _unpack_levels(d) for name, (_, d) in levels.items()}
+        reps, defs = null_levels(self.schema, column.name, kept_reps, kept_defs, num_rows)
+        chunk = ChunkBuffer(column, 0)
+        self._add_pages(chunk, [], reps, defs, num_rows)
+        self._memory -= chunk.memory
+        return self._write_chunk(chunk)
+
+    def close(self):
+        """
+        WRITE THE FOOTER
+        """
+        if self.file is None:
+            return
+        if self.schema is None:
+            Log.error("Expecting at least one Table, or a schema, before close()")
+        self.end_row_group()
+
+        columns = self.schema.get_parquet_columns()
+        all_chunks = [
+            [chunks.get(c.name) or self._write_nulls(c, num_rows, levels) for c in columns]
+            for (num_rows, chunks), levels in zip(self.row_groups, self._row_group_levels)
+        ]
+
+        # PAGE INDEX: ALL ColumnIndex, THEN ALL OffsetIndex
+        for row_group_chunks in all_chunks:
+            for column_chunk, column_index, _ in row_group_chunks:
+                if column_index is not None:
+                    column_chunk.column_index_offset, column_chunk.column_index_length = self._write_thrift(column_index)
+        for row_group_chunks in all_chunks:
+            for column_chunk, _, offset_index in row_group_chunks:
+                column_chunk.offset_index_offset, column_chunk.offset_index_length = self._write_thrift(offset_index)
+
+        row_groups = []
+        for (num_rows, _), row_group_chunks in zip(self.row_groups, all_chunks):
+            row_groups.append(RowGroup(
+                columns=[c for c, _, _ in row_group_chunks],
+                total_byte_size=sum(c.meta_data.total_uncompressed_size for c, _, _ in row_group_chunks),
+                num_rows=num_rows
+            ))
+
+        footer = thrift_to_bytes(FileMetaData(
+            version=1,
+            schema=self.schema.get_parquet_metadata(),
+            num_rows=self.num_rows,
+            row_groups=row_groups,
+            created_by=CREATED_BY,
+            column_orders=[ColumnOrder(TYPE_ORDER=TypeDefinedOrder()) for _ in columns]
+        ))
+        self._write(footer + UINT32.pack(len(footer)) + MAGIC)
+
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        if self.close_file:
+            self.file.close()
+        else:
+            self.file.flush()
+        self.file = None
+
+
+class ChunkBuffer(object):
+    """
+    THE ENCODED DATA PAGES OF ONE COLUMN CHUNK, WHILE ITS ROW GROUP IS OPEN,
+    WITH THE DICTIONARY THEY SHARE. EACH PAGE IS EITHER bytes (IN MEMORY) OR
+    (offset, length) OF ITS COPY IN THE SpillFile
+    """
+
+    __slots__ = [
+        "column", "pages", "first_rows", "page_values", "num_rows", "memory", "num_values", "compressed_size", "uncompressed_size",
+        "encodings", "statistics", "lookup", "dictionary", "dictionary_bytes", "max_dictionary_bytes", "hashes", "reps", "defs"
+    ]
+
+    def __init__(self, column, max_dictionary_bytes):
+        """
+        :param column: COLUMN DESCRIPTION (FROM SchemaTree.get_parquet_columns())
+        :param max_dictionary_bytes: STOP ADDING TO THE DICTIONARY WHEN IT TAKES THIS MANY BYTES (0 FOR NO DICTIONARY)
+        """
+        self.column = column
+        self.pages = []
+        self.first_rows = []  # ROW (IN THE ROW GROUP) OF THE FIRST RECORD OF EACH PAGE
+        self.page_values = []  # NUMBER OF VALUES (INCLUDING NULLS) OF EACH PAGE
+        self.num_rows = 0
+        self.memory = 0  # BYTES OF PAGES IN MEMORY
+        self.num_values = 0
+        self.compressed_size = 0
+        self.uncompressed_size = 0
+        self.encodings = set()
+        self.statistics = []  # Statistics OF EACH PAGE
+        self.lookup = {} if max_dictionary_bytes else None  # MAP FROM VALUE TO INDEX (None WHEN NOT ADDING)
+        self.dictionary = []
+        self.dictionary_bytes = 0
+        self.max_dictionary_bytes = max_dictionary_bytes
+        self.hashes = None  # LIST OF numpy ARRAYS OF THE HASHES OF PLAIN ENCODED VALUES (None FOR NO BLOOM FILTER)
+        self.reps = None  # LevelBuffer OF ALL THE REPETITION LEVELS (None WHEN NOT KEPT, SEE ParquetWriter._keeps_levels())
+        self.defs = None  # LevelBuffer OF ALL THE DEFINITION LEVELS
+
+    def add_dictionary(self, values):
+        """
+        ADD THE DICTIONARY OF values (A DictionaryBuffer) TO THE DICTIONARY OF THE CHUNK
+        :return: numpy ARRAY OF THE INDEXES OF values IN THE CHUNK DICTIONARY, OR None IF THEY CAN NOT BE DICTIONARY ENCODED
+        """
+        if self.lookup is None:
+            return None
+        dictionary = getattr(values, "dictionary", None)
+        if not dictionary:
+            return None
+
+        lookup = self.lookup
+        new_values = [v for v in dictionary if v not in lookup]
+        new_bytes = sum(4 + len(v) for v in new_values)
+        if self.dictionary_bytes + new_bytes > self.max_dictionary_bytes:
+            # DICTIONARY IS FULL; EARLIER PAGES KEEP IT, THE REST ARE PLAIN
+            self.lookup = None
+            return None
+        for v in new_values:
+            lookup[v] = len(self.dictionary)
+            self.dictionary.append(v)
+        self.dictionary_bytes += new_bytes
+
+        remap = numpy.array([lookup[v] for v in dictionary], dtype=numpy.int32)
+        return remap[values.indices.array]
+
+    def add_page(self, page, compressed_size, uncompressed_size, num_rows, num_values, encoding, statistics):
+        self.pages.append(page)
+        self.first_rows.append(self.num_rows)
+        self.page_values.append(num_values)
+        self.num_rows += num_rows
+        self.memory += len(page)
+        self.num_values += num_values
+        self.compressed_size += compressed_size
+        self.uncompressed_size += uncompressed_size
+        self.encodings.add(encoding)
+        self.statistics.append(statistics)
+
+    def spill(self, spill_file):
+        """
+        MOVE THE PAGES IN MEMORY TO spill_file
+        :return: NUMBER OF BYTES RELEASED
+        """
+        released = self.memory
+        self.pages = [
+            page if isinstance(page, tuple) else spill_file.write(page)
+            for page in self.pages
+        ]
+        self.memory = 0
+        return released
+
+
+def _pack_levels(levels, max_level):
+    """
+    :return: (bytes, bit_width, count) OF THE RLE ENCODED levels
+    """
+    width = bit_width(max_level)
+    return encode_levels(levels, width) if width else b"", width, len(levels)
+
+
+def _unpack_levels(packed):
+    """
+    :return: numpy ARRAY OF THE _pack_levels() LEVELS
+    """
+    data, width, count = packed
+    if not width:
+        return numpy.zeros(count, dtype=numpy.uint8)
+    return decode_levels(data, width, count)[0]
+
+
+class SpillFile(object):
+    """
+    TEMPORARY FILE OF PAGES, READ BACK THROUGH A MEMORY MAP
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+        self._map = None
+
+    def write(self, data):
+        """
+        :return: (offset, length) OF data IN THE FILE
+        """
+        offset = self.size
+        self.file.write(data)
+        self.size += len(data)
+        return offset, len(data)
+
+    def read(self, offset, length):
+        if self._map is None or len(self._map) < offset + length:
+            self._close_map()
+            self.file.flush()
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def reset(self):
+        """
+        FORGET ALL PAGES (THE ROW GROUP WAS WRITTEN)
+        """
+        self._close_map()
+        self.file.seek(0)
+        self.file.truncate()
+        self.size = 0
+
+    def close(self):
+        self._close_map()
+        self.file.close()
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _column_index(chunk):
+    """
+    :return: ColumnIndex OF THE chunk PAGES, OR None IF A PAGE WITH VALUES HAS NO BOUNDS
+    """
+    element = chunk.column.element
+    null_pages, min_values, max_values, null_counts = [], [], [], []
+    bounds = []
+    for statistics, num_values in zip(chunk.statistics, chunk.page_values):
+        null_counts.append(statistics.null_count)
+        if statistics.min_value is not None:
+            null_pages.append(False)
+            min_values.append(statistics.min_value)
+            max_values.append(statistics.max_value)
+            bounds.append((statistic_key(statistics.min_value, element), statistic_key(statistics.max_value, element)))
+        elif statistics.null_count != num_values:
+            return None
+        else:
+            null_pages.append(True)
+            min_values.append(b"")
+            max_values.append(b"")
+
+    pairs = list(zip(bounds, bounds[1:]))
+    if all(a[0] <= b[0] and a[1] <= b[1] for a, b in pairs):
+        boundary_order = BoundaryOrder.ASCENDING
+    elif all(a[0] >= b[0] and a[1] >= b[1] for a, b in pairs):
+        boundary_order = BoundaryOrder.DESCENDING
+    else:
+        boundary_order = BoundaryOrder.UNORDERED
+
+    return ColumnIndex(
+        null_pages=null_pages,
+        min_values=min_values,
+        max_values=max_values,
+        boundary_order=boundary_order,
+        null_counts=null_counts
+    )
+
+
+def write_table(file, table, compression=None, use_dictionary=True):
+    """
+    WRITE SINGLE Table TO PARQUET FILE
+    """
+    with ParquetWriter(file, table.schema, compression=compression, use_dictionary=use_dictionary) as writer:
+        writer.write(table)
+
+
+def thrift_to_bytes(thrift):
+    buffer = io.BytesIO()
+    write_thrift(buffer, thrift)
+    return buffer.getvalue()
+
+
+def compress(data, codec):
+    if codec == CompressionCodec.UNCOMPRESSED:
+        return data
+    elif codec == CompressionCodec.GZIP:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    Log.error("Do not know how to compress with {{codec}}", codec=codec)
+
+
+def _count(levels, level):
+    if isinstance(levels, LevelBuffer):
+        return levels.count(level)
+    return int(numpy.count_nonzero(numpy.asarray(levels) == level))
+
+
+compression_to_codec = {
+    None: CompressionCodec.UNCOMPRESSED,
+    "none": CompressionCodec.UNCOMPRESSED,
+    "gzip": CompressionCodec.GZIP
+}
@@ -0,0 +1,94 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from itertools import islice
+from random import Random
+
+from mo_future import text_type
+from tests import test_generator
+from tests.test_generator import make_const, make_optional, make_repeated, make_required
+
+SEED = 42  # SAME CORPUS ON EVERY RUN, SO RESULTS CAN BE COMPARED BETWEEN COMMITS
+
+
+def nested_corpus(num_rows):
+    """
+    EVERY COMBINATION OF REQUIRED/OPTIONAL/REPEATED NESTING, FROM THE test_generator COMBINATORS
+    """
+    test_generator.counter[0] = 0
+    generator = make_repeated("a", make_optional("b", make_repeated("c", make_required("d", make_const))))
+    rows = [d for d, _, _, _ in generator()]
+    return _cycle(rows, num_rows)
+
+
+def wide_corpus(num_rows, num_properties=200):
+    """
+    EVERY RECORD HAS EVERY PROPERTY, OF MIXED PRIMITIVE TYPES
+    """
+    random = Random(SEED)
+    names = ["p" + text_type(i) for i in range(num_properties)]
+    output = []
+    for i in range(num_rows):
+        row = {}
+        for j, name in enumerate(names):
+            kind = j % 3
+            if kind == 0:
+                row[name] = random.randint(0, 1000000)
+            elif kind == 1:
+                row[name] = random.random()
+            else:
+                row[name] = random.choice(STATUS)
+        output.append(row)
+    return output
+
+
+def sparse_corpus(num_rows, num_properties=1000, per_row=20):
+    """
+    LIKE TELEMETRY: A FEW REQUIRED PROPERTIES, AND A FEW OF MANY SPARSE
+    PROPERTIES PER RECORD, SOME NESTED, MANY FIRST SEEN LATE
+    """
+    random = Random(SEED)
+    output = []
+    for i in range(num_rows):
+        row = {
+            "id": i,
+            "task": {"id": "task" + text_type(random.randint(0, 1000)), "status": random.choice(STATUS)},
+            "measures": {}
+        }
+        measures = row["measures"]
+        for _ in range(per_row):
+            # LATER RECORDS SEE MORE OF THE PROPERTIES
+            p = random.randint(0, max(1, num_properties * (i + 1) // num_rows) - 1)
+            if p % 10 == 0:
+                measures["m" + text_type(p)] = {"value": random.random(), "unit": "ms"}
+            else:
+                measures["m" + text_type(p)] = random.random()
+        if random.random() < 0.1:
+            row["tags"] = [{"name": "t" + text_type(random.randint(0, 20))} for _ in range(random.randint(1, 4))]
+        output.append(row)
+    return output
+
+
+def _cycle(rows, num_rows):
+    output = []
+    while len(output) < num_rows:
+        output.extend(islice(rows, num_rows - len(output)))
+    return output
+
+
+STATUS = ["ok", "failed", "exception", "retry", "busted"]
+
+CORPORA = {
+    "nested": nested_corpus,
+    "wide": wide_corpus,
+    "sparse": sparse_corpus
+}
@@ -0,0 +1,201 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import timeit
+from multiprocessing import Process, Queue
+
+from mo_dots import Data
+from mo_json import value2json
+from mo_parquet import assemble, read_table, rows_to_columns, write_table
+from tests.benchmarks.corpus import CORPORA
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # PY2
+
+
+def _shred(rows):
+    return rows, lambda: rows_to_columns(rows)
+
+
+def _shred_known_schema(rows):
+    # SAME AS shred, BUT WITHOUT SCHEMA EXPANSION
+    schema = rows_to_columns(rows).schema
+    return rows, lambda: rows_to_columns(rows, schema)
+
+
+def _decode_and_shred(rows):
+    lines = [json.dumps(r) for r in rows]
+    return rows, lambda: rows_to_columns(json.loads(l) for l in lines)
+
+
+def _encode(rows):
+    table = rows_to_columns(rows)
+
+    def encode():
+        buffer = io.BytesIO()
+        write_table(buffer, table)
+        return buffer.getvalue()
+    return rows, encode
+
+
+def _write(rows):
+    table = rows_to_columns(rows)
+    filename = os.path.join(tempfile.mkdtemp(), "benchmark.parquet")
+
+    def write():
+        write_table(filename, table)
+        with io.open(filename, "rb") as file:
+            return file.read()
+    return rows, write
+
+
+def _read(rows):
+    buffer = io.BytesIO()
+    write_table(buffer, rows_to_columns(rows))
+    data = buffer.getvalue()
+    return rows, lambda: read_table(io.BytesIO(data))
+
+
+def _assemble(rows):
+    table = rows_to_columns(rows)
+    return rows, lambda: assemble(table)
+
+
+# MAP FROM CASE NAME TO FUNCTION(rows) RETURNING (rows, FUNCTION TO TIME)
+CASES = {
+    "shred": _shred,
+    "shred_known_schema": _shred_known_schema,
+    "decode_and_shred": _decode_and_shred,
+    "encode": _encode,
+    "write": _write,
+    "read": _read,
+    "assemble": _assemble
+}
+
+
+def measure(case, corpus, num_rows, repeat=3):
+    """
+    RUN ONE CASE, IN THIS PROCESS
+    :return: Data WITH THE MEASUREMENTS
+    """
+    rows, run = CASES[case](CORPORA[corpus](num_rows))
+    rss_before = _max_rss()
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    result = run()
+
+    output = Data(
+        case=case,
+        corpus=corpus,
+        rows=len(rows),
+        seconds=seconds,
+        rows_per_second=len(rows) / seconds if seconds else None,
+        bytes_per_row=_bytes_per_row(result, len(rows)),
+        peak_rss=_max_rss(),
+        rss_growth=_max_rss() - rss_before
+    )
+
+    if tracemalloc:
+        tracemalloc.start()
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+        output.allocated_peak = peak
+        output.allocations = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+    return output
+
+
+def _bytes_per_row(result, num_rows):
+    """
+    :return: SIZE OF THE CASE OUTPUT (ENCODED BYTES, OR BUFFER BYTES OF A Table) PER ROW
+    """
+    if isinstance(result, bytes):
+        return len(result) / num_rows
+    if isinstance(result, list):
+        return None
+    return sum(
+        getattr(v, "nbytes", 0)
+        for columns in (result.values, result.reps, result.defs)
+        for v in columns.values()
+    ) / num_rows
+
+
+def _max_rss():
+    # KILOBYTES ON LINUX
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _measure_in_child(queue, case, corpus, num_rows):
+    queue.put(dict(measure(case, corpus, num_rows)))
+
+
+def run_all(cases, corpora, num_rows):
+    """
+    EACH MEASUREMENT RUNS IN A FRESH PROCESS, SO peak_rss IS ITS OWN
+    :return: LIST OF MEASUREMENTS
+    """
+    output = []
+    for corpus in corpora:
+        for case in cases:
+            queue = Queue()
+            child = Process(target=_measure_in_child, args=(queue, case, corpus, num_rows))
+            child.start()
+            output.append(queue.get())
+            child.join()
+    return output
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"]).strip().decode("ascii")
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mo_parquet")
+    parser.add_argument("--rows", type=int, default=10000, help="number of records in each corpus")
+    parser.add_argument("--case", action="append", choices=sorted(CASES.keys()), help="case to run (default all)")
+    parser.add_argument("--corpus", action="append", choices=sorted(CORPORA.keys()), help="corpus to use (default all)")
+    parser.add_argument("--output", default="benchmarks.json", help="file to write the results")
+    args = parser.parse_args()
+
+    results = run_all(args.case or sorted(CASES.keys()), args.corpus or sorted(CORPORA.keys()), args.rows)
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    with io.open(args.output, "w", encoding="utf8") as output:
+        output.write(value2json(report, pretty=True))
+    for r in results:
+        sys.stdout.write("{corpus:>8} {case:>20} {rows_per_second:>12.0f} rows/sec {bytes_per_row:>10.1f} bytes/row\n".format(
+            corpus=r["corpus"],
+            case=r["case"],
+            rows_per_second=r["rows_per_second"] or 0,
+            bytes_per_row=r["bytes_per_row"] or 0
+        ))
+
+
+if __name__ == "__main__":
+    main()
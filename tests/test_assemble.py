@@ -6,11 +6,69 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import io
+
+from mo_future import text_type
+from mo_parquet import rows_to_columns, assemble, Assembler, SchemaTree, read_table, write_table
+from mo_parquet.schema import REQUIRED, REPEATED, OPTIONAL
 from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_columns import DREMEL_DATA
+from tests.test_writer import dremel_schema
+
+
+class TestAssemble(FuzzyTestCase):
+
+    def test_dremel(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        self.assertEqual(assemble(table), DREMEL_DATA)
+
+    def test_classic_nested(self):
+        data = [
+            {"a": "value0"},
+            {"a": "value1", "b": [{"c": -1, "d": 0}]},
+            {"a": "value2", "b": [{"c": 1, "d": 2}, {"c": 3, "d": 4}]},
+            {"a": "value3", "b": [{"c": 5, "d": 6}, {"c": 7}, {"e": [{"g": 1}, {"g": 2}]}, {"c": 9, "d": 10}]}
+        ]
+        schema = SchemaTree(locked=True)
+        schema.add("a", REQUIRED, text_type)
+        schema.add("b", REPEATED, object)
+        schema.add("b.c", OPTIONAL, int)
+        schema.add("b.d", OPTIONAL, int)
+        schema.add("b.e", REPEATED, object)
+        schema.add("b.e.g", REQUIRED, int)
+
+        result = assemble(rows_to_columns(data, schema))
+        self.assertEqual(result, data)
+        self.assertIsInstance(result[0]["a"], text_type)
+
+    def test_null_repeated(self):
+        schema = SchemaTree(locked=True)
+        schema.add("v", (REPEATED, OPTIONAL), int)
+        data = [{"v": None}, {"v": [1]}, {"v": [None]}, {"v": [None, 2]}]
+
+        result = assemble(rows_to_columns(data, schema))
+        self.assertEqual(result, [{}, {"v": [1]}, {"v": [None]}, {"v": [None, 2]}])
+
+    def test_partial_records(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
 
+        result = assemble(table, ["DocId", "Name.Language.Country"])
+        self.assertEqual(result, [
+            {"DocId": 10, "Name": [{"Language": [{"Country": "us"}, {}]}, {}, {"Language": [{"Country": "gb"}]}]},
+            {"DocId": 20, "Name": [{}]}
+        ])
+        self.assertRaises(Exception, assemble, table, ["Nothing"])
 
-class TestColumns(FuzzyTestCase):
-    def test_assemble(self):
-        expected = {}
+    def test_batches(self):
+        data = DREMEL_DATA * 5
+        assembler = Assembler(rows_to_columns(data, dremel_schema()))
+        batches = list(assembler.batches(3))
 
+        self.assertEqual([len(b) for b in batches], [3, 3, 3, 1])
+        self.assertEqual(sum(batches, []), data)
+        self.assertEqual(list(assembler), data)
 
+    def test_read_file(self):
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(DREMEL_DATA))
+        self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), DREMEL_DATA)
@@ -0,0 +1,30 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+from tests.benchmarks.corpus import CORPORA
+from tests.benchmarks.run import CASES, measure
+
+
+class TestBenchmarks(FuzzyTestCase):
+
+    def test_corpora_are_reproducible(self):
+        for name, corpus in CORPORA.items():
+            self.assertEqual(corpus(20), corpus(20))
+
+    def test_every_case_runs(self):
+        for case in CASES.keys():
+            result = measure(case, "nested", 20, repeat=1)
+            self.assertAlmostEqual(result, {"case": case, "corpus": "nested", "rows": 20})
+            self.assertGreater(result.rows_per_second, 0)
+            self.assertGreater(result.peak_rss, 0)
@@ -0,0 +1,116 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import hashlib
+import io
+
+from mo_future import text_type
+from mo_parquet import ColumnShredder, ParquetReader, ParquetWriter
+from mo_parquet.bloom import BloomFilter, hash_values, optimal_num_bytes, xxhash64
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from parquet_thrift.parquet.ttypes import Encoding, Type
+from tests.test_writer import read_footer
+
+
+class TestBloom(FuzzyTestCase):
+
+    def test_xxhash64(self):
+        self.assertEqual(xxhash64(b""), 0xEF46DB3751D8E999)
+        self.assertEqual(xxhash64(b"a"), 0xD24EC4F1A98C6E5B)
+        self.assertEqual(xxhash64(b"abc"), 0x44BC2CF5AD770999)
+        # VALUES OF DIFFERENT LENGTHS ARE HASHED IN SEPARATE BATCHES
+        self.assertEqual(hash_values([b"abc", "a", b""], Type.BYTE_ARRAY).tolist(), [0x44BC2CF5AD770999, 0xD24EC4F1A98C6E5B, 0xEF46DB3751D8E999])
+
+    def test_no_false_negatives(self):
+        for parquet_type, values in [
+            (Type.INT32, list(range(-500, 500))),
+            (Type.INT64, [i * 7919 for i in range(1000)]),
+            (Type.DOUBLE, [i / 3 for i in range(1000)]),
+            (Type.BYTE_ARRAY, ids(1000))
+        ]:
+            bloom = BloomFilter.new_instance(len(values), 0.01)
+            bloom.insert_hashes(hash_values(values, parquet_type))
+            self.assertTrue(all(bloom.check(v, parquet_type) for v in values))
+            self.assertTrue(bloom.check_hashes(hash_values(values, parquet_type)).all())
+
+        bloom = BloomFilter.new_instance(1000, 0.01)
+        bloom.insert_hashes(hash_values(list(range(1000)), Type.INT64))
+        false_positives = bloom.check_hashes(hash_values(list(range(1000, 21000)), Type.INT64)).mean()
+        self.assertLess(false_positives, 0.02)
+        self.assertFalse(bloom.check(1.5, Type.INT64))  # CAN NOT BE IN AN INTEGER COLUMN
+
+    def test_optimal_num_bytes(self):
+        self.assertEqual(optimal_num_bytes(0), 32)
+        self.assertEqual(optimal_num_bytes(1000, 0.01), 2048)
+        self.assertEqual(optimal_num_bytes(10 ** 9), 1024 * 1024)
+
+    def test_write_bloom_filter(self):
+        file = id_file()
+        meta = read_footer(file.getvalue())
+        for row_group in meta.row_groups:
+            id_meta, num_meta = [c.meta_data for c in row_group.columns]
+            self.assertIsNotNone(id_meta.bloom_filter_offset)
+            self.assertIsNotNone(id_meta.bloom_filter_length)
+            self.assertIsNone(num_meta.bloom_filter_offset)
+
+        reader = ParquetReader(file)
+        id_column, num_column = reader.columns
+        for i, values in enumerate(chunks(ids(500), 100)):
+            bloom = reader.get_bloom_filter(i, id_column)
+            self.assertTrue(all(bloom.check(v, Type.BYTE_ARRAY) for v in values))
+            self.assertIsNone(reader.get_bloom_filter(i, num_column))
+
+    def test_prune_by_id(self):
+        reader = ParquetReader(id_file())
+        all_ids = ids(500)
+
+        # EVERY ID IS WITHIN THE min/max OF EVERY ROW GROUP, ONLY THE BLOOM FILTER CAN PRUNE
+        self.assertEqual(reader.filter_row_groups(None), [0, 1, 2, 3, 4])
+        self.assertEqual(reader.filter_row_groups({"eq": {"id": all_ids[250]}}), [2])
+        self.assertEqual(reader.filter_row_groups({"in": {"id": [all_ids[10], all_ids[420]]}}), [0, 4])
+        self.assertEqual(reader.filter_row_groups({"eq": {"id": ids(600)[550]}}), [])
+
+        self.assertEqual(reader.read(where={"eq": {"id": all_ids[250]}}).num_rows, 100)
+
+    def test_dictionary_and_plain_pages(self):
+        # THE DICTIONARY FILLS PART WAY THROUGH THE CHUNK, BOTH KINDS OF PAGE ARE IN THE FILTER
+        buffer = io.BytesIO()
+        data = [{"id": v} for v in ids(1000)]
+        with ParquetWriter(buffer, max_dictionary_bytes=4000, bloom_filters=["id"]) as writer:
+            for table in ColumnShredder(max_rows=100).shred(data):
+                writer.append(table)
+        encodings = read_footer(buffer.getvalue()).row_groups[0].columns[0].meta_data.encodings
+        self.assertTrue(Encoding.PLAIN in encodings and Encoding.PLAIN_DICTIONARY in encodings)
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        bloom = reader.get_bloom_filter(0, reader.columns[0])
+        self.assertTrue(all(bloom.check(d["id"], Type.BYTE_ARRAY) for d in data))
+
+
+def ids(num):
+    return [text_type(hashlib.md5(str(i).encode("ascii")).hexdigest()) for i in range(num)]
+
+
+def chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def id_file():
+    """
+    :return: FILE OF FIVE ROW GROUPS, EACH WITH 100 RANDOM ids
+    """
+    buffer = io.BytesIO()
+    data = [{"id": v, "num": i} for i, v in enumerate(ids(500))]
+    with ParquetWriter(buffer, bloom_filters=["id"]) as writer:
+        for table in ColumnShredder(max_rows=100).shred(data):
+            writer.write(table)
+    return io.BytesIO(buffer.getvalue())
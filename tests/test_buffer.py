@@ -0,0 +1,143 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import numpy
+
+from mo_future import text_type
+from mo_parquet import rows_to_columns, SchemaTree
+from mo_parquet.buffer import ColumnBuffer, DictionaryBuffer, LevelBuffer
+from mo_parquet.schema import REQUIRED, REPEATED, OPTIONAL
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from parquet_thrift.parquet.ttypes import Type
+
+
+class TestBuffer(FuzzyTestCase):
+
+    def test_growth(self):
+        buffer = ColumnBuffer.new_instance(Type.INT64)
+        for i in range(1000):
+            buffer.append(i)
+        self.assertEqual(len(buffer), 1000)
+        self.assertEqual(buffer.tolist(), list(range(1000)))
+        self.assertEqual(buffer.array.dtype, numpy.int64)
+        self.assertEqual(buffer.nbytes, 8000)
+
+    def test_mixed_types_demote(self):
+        buffer = ColumnBuffer.new_instance(Type.INT64)
+        buffer.append(1)
+        buffer.append(2.5)
+        buffer.append(2 ** 70)
+        self.assertEqual(buffer.tolist(), [1, 2.5, 2 ** 70])
+        self.assertEqual(buffer.array.dtype, object)
+
+    def test_levels_widen(self):
+        levels = LevelBuffer.zeros(3)
+        levels.append(255)
+        self.assertEqual(levels.array.dtype, numpy.uint8)
+        levels.append(256)
+        self.assertEqual(levels.array.dtype, numpy.uint16)
+        self.assertEqual(levels.tolist(), [0, 0, 0, 255, 256])
+
+    def test_level_runs(self):
+        levels = LevelBuffer.zeros(1000)
+        levels.extend_run(0, 500)
+        levels.extend_run(1, 10)
+        self.assertEqual(levels.runs, [(0, 1500), (1, 10)])
+        self.assertEqual(levels.length, 0)
+
+        levels.append(2)
+        levels.extend_run(0, 3)
+        self.assertEqual(len(levels), 1514)
+        self.assertEqual(levels.dense.tolist(), [2, 0, 0, 0])
+        self.assertEqual(levels.array.tolist(), [0] * 1500 + [1] * 10 + [2, 0, 0, 0])
+        self.assertEqual(levels[1505], 1)
+        self.assertEqual(levels[1510], 2)
+        self.assertEqual(levels[1510:].tolist(), [2, 0, 0, 0])
+        self.assertEqual(levels.count(0), 1503)
+
+        levels.truncate(1505)
+        self.assertEqual(levels.runs, [(0, 1500), (1, 5)])
+        self.assertEqual(len(levels), 1505)
+
+    def test_extend_levels_keeps_runs(self):
+        levels = LevelBuffer()
+        levels.extend_levels(numpy.array([0] * 100 + [1] * 100))
+        self.assertEqual(levels.runs, [(0, 100), (1, 100)])
+
+        # SHORT RUNS ARE KEPT DENSE
+        levels = LevelBuffer()
+        levels.extend_levels(numpy.array([0, 1, 0, 1]))
+        self.assertEqual(levels.runs, [])
+        self.assertEqual(levels.dense.tolist(), [0, 1, 0, 1])
+
+    def test_dictionary(self):
+        buffer = ColumnBuffer.new_instance(Type.BYTE_ARRAY)
+        for v in [b"a", b"b", b"a", b"c", b"a"]:
+            buffer.append(v)
+        self.assertIsInstance(buffer, DictionaryBuffer)
+        self.assertEqual(buffer.tolist(), [b"a", b"b", b"a", b"c", b"a"])
+        self.assertEqual(buffer.dictionary, [b"a", b"b", b"c"])
+        self.assertEqual(buffer.indices.tolist(), [0, 1, 0, 2, 0])
+
+    def test_dictionary_shares_values(self):
+        buffer = ColumnBuffer.new_instance(Type.BYTE_ARRAY)
+        for i in range(3):
+            buffer.append(b"".join([b"value", b"1"]))  # A NEW OBJECT EACH TIME
+        buffer.extend([b"".join([b"value", b"1"])])
+        values = buffer.array
+        self.assertIs(values[1], values[0])
+        self.assertIs(values[3], values[0])
+
+    def test_dictionary_truncate(self):
+        buffer = DictionaryBuffer()
+        buffer.extend([b"b", b"a", b"b", b"zz", b"a", b"yy"])
+        buffer.truncate(3)
+        self.assertEqual(buffer.tolist(), [b"b", b"a", b"b"])
+        self.assertEqual(buffer.dictionary, [b"b", b"a"])
+        self.assertEqual(buffer.dictionary_bytes, 10)
+
+        buffer.append(b"yy")
+        self.assertEqual(buffer.dictionary, [b"b", b"a", b"yy"])
+        self.assertEqual(buffer.indices.tolist(), [0, 1, 0, 2])
+
+        buffer.truncate(0)
+        self.assertEqual(buffer.dictionary, [])
+        self.assertEqual(buffer.lookup, {})
+
+    def test_dictionary_fallback(self):
+        buffer = DictionaryBuffer(max_dictionary_bytes=20)
+        buffer.extend([b"aaaa", b"bbbb", b"aaaa"])
+        self.assertEqual(buffer.indices.tolist(), [0, 1, 0])
+        buffer.append(b"cccc")
+        self.assertEqual(buffer.dictionary, None)
+        self.assertEqual(buffer.tolist(), [b"aaaa", b"bbbb", b"aaaa", b"cccc"])
+
+        self.assertNotIsInstance(ColumnBuffer.new_instance(Type.BYTE_ARRAY, max_dictionary_bytes=0), DictionaryBuffer)
+
+    def test_table_buffers(self):
+        schema = SchemaTree(locked=True)
+        schema.add("a", REQUIRED, int)
+        schema.add("b", REPEATED, float)
+        schema.add("c", OPTIONAL, text_type)
+        schema.add("d", OPTIONAL, bool)
+
+        table = rows_to_columns(
+            [
+                {"a": 1, "b": [1.5, 2.5], "c": "x", "d": True},
+                {"a": 2, "b": [], "d": False}
+            ],
+            schema
+        )
+
+        self.assertEqual(table.values["a"].array.dtype, numpy.int64)
+        self.assertEqual(table.values["b"].array.dtype, numpy.float64)
+        self.assertEqual(table.values["c"].array.dtype, object)
+        self.assertEqual(table.values["d"].array.dtype, numpy.bool_)
+        self.assertEqual(table.reps["b"].array.dtype, numpy.uint8)
+        self.assertEqual(table.defs["b"].tolist(), [1, 1, 0])
+        self.assertEqual(table.get_column("b").values.tolist(), [1.5, 2.5])
@@ -0,0 +1,135 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from mo_parquet import Dataset, assemble, rows_to_columns, write_table
+from mo_parquet.dataset import FooterCache
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+class TestDataset(FuzzyTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # ONE FILE PER DAY, 10 ROWS EACH, t INCREASES WITH THE DAY
+        for month in (1, 2):
+            for day in (1, 2, 3):
+                start = (month * 10 + day) * 10
+                data = [{"t": t, "name": "n" + str(t)} for t in range(start, start + 10)]
+                if month == 2:
+                    for row in data:
+                        row["extra"] = {"value": row["t"] * 2}
+                write_file(self.directory, "month=" + str(month), "day" + str(day) + ".parquet", data)
+        # NOT PART OF THE DATA
+        write_file(self.directory, "month=1", "_summary.parquet", [{"t": 0}])
+        write_file(self.directory, "month=1", "notes.txt", [{"t": 0}])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_files(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        self.assertEqual(
+            [(os.path.basename(f.path), f.partition) for f in dataset.files],
+            [
+                ("day1.parquet", {"month": 1}),
+                ("day2.parquet", {"month": 1}),
+                ("day3.parquet", {"month": 1}),
+                ("day1.parquet", {"month": 2}),
+                ("day2.parquet", {"month": 2}),
+                ("day3.parquet", {"month": 2})
+            ]
+        )
+        self.assertEqual(sorted(c.name for c in dataset.columns), ["extra.value", "name", "t"])
+        self.assertEqual(dataset.num_rows, 60)
+
+    def test_footer_cache(self):
+        cache = FooterCache()
+        Dataset(self.directory, footer_cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 6))
+
+        dataset = Dataset(self.directory, footer_cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (6, 6))
+
+        # A CHANGED FILE IS READ AGAIN
+        path = dataset.files[0].path
+        write_table(path, rows_to_columns([{"t": 1}, {"t": 2}]))
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        dataset = Dataset(self.directory, footer_cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (11, 7))
+        self.assertEqual(dataset.num_rows, 52)
+
+    def test_footer_cache_lru(self):
+        cache = FooterCache(max_size=2)
+        dataset = Dataset(self.directory, footer_cache=cache)
+        first, second, third = [f.path for f in dataset.files[:3]]
+        cache.get(first)
+        cache.get(second)
+        cache.get(first)
+        cache.get(third)  # second IS LEAST RECENTLY USED
+        self.assertEqual(list(cache.footers.keys()), [first, third])
+
+    def test_plan_partition(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        plan = dataset.plan({"eq": {"month": 2}})
+        self.assertEqual([f.partition["month"] for f, _ in plan], [2, 2, 2])
+
+    def test_plan_statistics(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        plan = dataset.plan({"and": [{"gte": {"t": 120}}, {"lt": {"t": 215}}]})
+        self.assertEqual([(f.partition["month"], os.path.basename(f.path)) for f, _ in plan], [(1, "day2.parquet"), (1, "day3.parquet"), (2, "day1.parquet")])
+        self.assertEqual(dataset.plan({"eq": {"t": 999}}), [])
+
+    def test_read(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache(), threads=3)
+        table = dataset.read()
+        self.assertEqual(table.num_rows, 60)
+        rows = list(assemble(table))
+        self.assertEqual([r["t"] for r in rows], [t for m in (1, 2) for d in (1, 2, 3) for t in range((m * 10 + d) * 10, (m * 10 + d) * 10 + 10)])
+        self.assertEqual(rows[0], {"t": 110, "name": "n110"})
+        self.assertEqual(rows[30], {"t": 210, "name": "n210", "extra": {"value": 420}})
+
+    def test_read_columns_where(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        table = dataset.read(columns=["extra"], where={"or": [{"eq": {"t": 115}}, {"eq": {"t": 225}}]})
+        self.assertEqual(sorted(table.values.keys()), ["extra.value"])
+        self.assertEqual(table.num_rows, 20)
+        self.assertEqual(list(assemble(table))[10:12], [{"extra": {"value": 440}}, {"extra": {"value": 442}}])
+
+    def test_scan(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache(), threads=2)
+        tables = list(dataset.scan(columns=["t"], where={"gte": {"month": 2}}))
+        self.assertEqual(len(tables), 3)
+        self.assertEqual(sorted(t for table in tables for t in table.values["t"].tolist()), list(range(210, 220)) + list(range(220, 230)) + list(range(230, 240)))
+
+        # STOPPING EARLY STOPS THE WORKERS
+        scan = dataset.scan()
+        next(scan)
+        scan.close()
+
+    def test_scan_error(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        with open(dataset.files[2].path, "r+b") as file:
+            file.write(b"X" * 100)  # DAMAGE THE PAGES, NOT THE (CACHED) FOOTER
+        os.utime(dataset.files[2].path, None)
+        self.assertRaises(Exception, lambda: dataset.read())
+
+
+def write_file(directory, partition, filename, data):
+    path = os.path.join(directory, partition)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    write_table(os.path.join(path, filename), rows_to_columns(data))
@@ -0,0 +1,58 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+# PACKAGES ONLY NEEDED BY SOME FEATURES, NOT BY import mo_parquet
+LAZY_PACKAGES = ["pandas", "jx_base", "jx_python", "jx_elasticsearch", "pyLibrary", "mo_times", "mo_json", "mo_threads", "requests"]
+MAX_IMPORT_SECONDS = 0.5  # BEST OF A FEW FRESH PROCESSES
+
+IMPORT_SCRIPT = """
+import json, sys
+from timeit import default_timer as timer
+start = timer()
+import mo_parquet
+print(json.dumps({"seconds": timer() - start, "modules": sorted(sys.modules.keys())}))
+"""
+
+
+def fresh_import():
+    """
+    :return: (seconds, modules) OF import mo_parquet IN A NEW PROCESS
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    output = json.loads(subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], env=env).decode("utf8"))
+    return output["seconds"], output["modules"]
+
+
+class TestImport(FuzzyTestCase):
+
+    def test_lazy_packages(self):
+        seconds, modules = fresh_import()
+        loaded = sorted(set(m.split(".")[0] for m in modules) & set(LAZY_PACKAGES))
+        self.assertEqual(loaded, [])
+
+    def test_import_time(self):
+        seconds = min(fresh_import()[0] for _ in range(3))
+        self.assertLess(seconds, MAX_IMPORT_SECONDS)
+
+    def test_lazy_features(self):
+        from mo_parquet import rows_to_columns
+
+        frame = rows_to_columns([{"a": 1}, {"a": 2}]).to_pandas()
+        self.assertEqual(frame["a"].tolist(), [1, 2])
@@ -0,0 +1,80 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+
+from mo_parquet import rows_to_columns, ColumnShredder, SchemaTree, read_table, ParquetReader
+from mo_parquet.writer import ParquetWriter, write_table
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_columns import DREMEL_DATA
+from tests.test_writer import dremel_schema
+
+
+class TestReader(FuzzyTestCase):
+
+    def test_schema_from_footer(self):
+        schema = dremel_schema()
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(DREMEL_DATA, schema))
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        self.assertIsInstance(reader.schema, SchemaTree)
+        self.assertEqual(reader.schema.leaves, schema.leaves)
+        self.assertEqual(
+            [c.name for c in reader.columns],
+            [c.name for c in schema.get_parquet_columns()]
+        )
+        self.assertEqual(
+            [(c.max_repetition_level, c.max_definition_level) for c in reader.columns],
+            [(c.max_repetition_level, c.max_definition_level) for c in schema.get_parquet_columns()]
+        )
+
+    def test_dremel_round_trip(self):
+        expected = rows_to_columns(DREMEL_DATA, dremel_schema())
+        buffer = io.BytesIO()
+        write_table(buffer, expected, compression="gzip")
+
+        result = read_table(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(result.num_rows, 2)
+        self.assertEqual(set(result.columns), set(expected.columns))
+        for name in expected.columns:
+            self.assertEqual(result.values[name].tolist(), expected.values[name].tolist())
+            self.assertEqual(result.reps[name].tolist(), expected.reps[name].tolist())
+            self.assertEqual(result.defs[name].tolist(), expected.defs[name].tolist())
+
+    def test_projection(self):
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(DREMEL_DATA, dremel_schema()))
+
+        with ParquetReader(io.BytesIO(buffer.getvalue())) as reader:
+            result = reader.read(["Name.Language", "DocId"])
+        self.assertEqual(set(result.columns), {"DocId", "Name.Language.Code", "Name.Language.Country"})
+        self.assertEqual(result.values["DocId"].tolist(), [10, 20])
+        self.assertEqual(result.reps["Name.Language.Country"].tolist(), [0, 2, 1, 1, 0])
+        self.assertEqual(result.defs["Name.Language.Country"].tolist(), [3, 2, 1, 3, 1])
+
+    def test_unknown_column(self):
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(DREMEL_DATA, dremel_schema()))
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        self.assertRaises(Exception, reader.read, ["Nothing"])
+
+    def test_row_groups(self):
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=2).shred({"a": i, "b": "x" * i} for i in range(5)):
+                writer.write(table)
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(reader.num_row_groups, 3)
+        self.assertEqual(reader.read().values["a"].tolist(), [0, 1, 2, 3, 4])
+
+        result = reader.read(["b"], row_groups=[1])
+        self.assertEqual(result.num_rows, 2)
+        self.assertEqual(result.values, {"b": [b"xx", b"xxx"]})
@@ -0,0 +1,208 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import threading
+
+from mo_parquet import ColumnShredder, ParquetReader, ParquetWriter, RemoteFile, assemble
+from mo_parquet.encodings import UINT32
+from mo_parquet.remote import coalesce, http_url
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_bloom import ids
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+class TestRemote(FuzzyTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.content = sample_file()
+
+    def setUp(self):
+        self.server = RangeServer(self.content)
+        self.local = ParquetReader(io.BytesIO(self.content))
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_footer_one_request(self):
+        footer_length, = UINT32.unpack(self.content[-8:-4])
+        self.assertLess(footer_length + 8, 8192)
+
+        with RemoteFile(self.server.url, footer_bytes=8192) as file:
+            reader = ParquetReader(file)
+            self.assertEqual(self.server.requests, ["bytes=-8192"])
+            self.assertEqual(file.size, len(self.content))
+            self.assertEqual(reader.num_rows, 4000)
+            self.assertEqual([c.name for c in reader.columns], ["a", "b", "c"])
+
+    def test_projected_columns(self):
+        with RemoteFile(self.server.url, footer_bytes=8192, max_gap=0) as file:
+            reader = ParquetReader(file)
+            table = reader.read(["b"])
+        self.assertEqual(list(assemble(table)), list(assemble(self.local.read(["b"]))))
+
+        # ONLY THE BYTES OF THE b CHUNKS ARE FETCHED
+        spans = [chunk_span(g.columns[1].meta_data) for g in self.local.metadata.row_groups]
+        for byte_range in self.server.requests[1:]:
+            start, stop = parse_range(byte_range, len(self.content))
+            self.assertTrue(any(s <= start and stop <= e for s, e in spans), byte_range + " is not a b chunk")
+        self.assertGreater(len(self.server.requests), 1)
+
+    def test_coalesce(self):
+        self.assertEqual(coalesce([(100, 110), (15, 20), (0, 10), (5, 12)], max_gap=5), [(0, 20), (100, 110)])
+        self.assertEqual(coalesce([(0, 10), (10, 20), (20, 30)], max_gap=0, max_request=20), [(0, 20), (20, 30)])
+        self.assertEqual(coalesce([(0, 50), (60, 70)], max_request=20), [(0, 50), (60, 70)])
+        self.assertEqual(coalesce([]), [])
+
+    def test_coalesced_requests(self):
+        expected = list(assemble(self.local.read()))
+
+        with RemoteFile(self.server.url, footer_bytes=8192) as file:
+            reader = ParquetReader(file)
+            self.assertEqual(list(assemble(reader.read())), expected)
+            self.assertEqual(file.num_requests, 2)  # FOOTER, AND ALL CHUNKS IN ONE
+            self.assertEqual(len(self.server.requests), 2)
+
+        del self.server.requests[:]
+        with RemoteFile(self.server.url, footer_bytes=8192, max_request=1, threads=4) as file:
+            reader = ParquetReader(file)
+            self.assertEqual(list(assemble(reader.read())), expected)
+            self.assertGreater(file.num_requests, 10)  # ONE PER CHUNK, FETCHED CONCURRENTLY
+            self.assertEqual(len(self.server.requests), file.num_requests)
+            self.assertEqual(len(file._worker_sessions), 4)  # ONE Session PER WORKER
+            # THE WORKERS ENDED WITH THE prefetch()
+            self.assertEqual([t.name for t in threading.enumerate() if t.name.startswith("remote range")], [])
+
+    def test_read_where_pages(self):
+        where = {"and": [{"gte": {"a": 1250}}, {"lt": {"a": 1420}}]}
+        with RemoteFile(self.server.url, footer_bytes=8192, max_gap=0) as file:
+            reader = ParquetReader(file)
+            table = reader.read(["a", "c"], where=where)
+            self.assertEqual(list(assemble(table)), list(assemble(self.local.read(["a", "c"], where=where))))
+            self.assertEqual([r["a"] for r in assemble(table)], list(range(1200, 1500)))
+
+            # ONLY THE PAGES HOLDING THE ROWS ARE FETCHED, NOT THE WHOLE CHUNKS
+            row_group = self.local.metadata.row_groups[1]
+            chunk_bytes = sum(row_group.columns[i].meta_data.total_compressed_size for i in (0, 2))
+            self.assertLess(file.bytes_fetched - 8192, chunk_bytes / 2)
+
+    def test_missing_file(self):
+        with RemoteFile(self.server.url + ".missing") as file:
+            self.assertRaises(Exception, lambda: ParquetReader(file))
+
+    def test_http_url(self):
+        self.assertEqual(http_url("s3://my-bucket/path/to/data.parquet"), "https://my-bucket.s3.amazonaws.com/path/to/data.parquet")
+        self.assertEqual(http_url("https://example.com/data.parquet?X-Amz-Signature=1"), "https://example.com/data.parquet?X-Amz-Signature=1")
+        self.assertRaises(Exception, lambda: http_url("s3://my-bucket"))
+
+
+class RangeServer(object):
+    """
+    LOCAL STAND-IN FOR S3: SERVES content AT url, WITH Range SUPPORT, AND RECORDS THE Range OF EACH REQUEST
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/data.parquet":
+                    self.send_error(404)
+                    return
+                byte_range = self.headers.get("Range")
+                server.requests.append(byte_range)
+                size = len(server.content)
+                if byte_range is None:
+                    start, stop = 0, size
+                    self.send_response(200)
+                else:
+                    start, stop = parse_range(byte_range, size)
+                    self.send_response(206)
+                    self.send_header("Content-Range", "bytes " + str(start) + "-" + str(stop - 1) + "/" + str(size))
+                self.send_header("Content-Length", str(stop - start))
+                self.end_headers()
+                self.wfile.write(server.content[start:stop])
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:" + str(self.httpd.server_address[1]) + "/data.parquet"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="range server")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        """
+        STOP SERVING, AND WAIT FOR THE SERVING THREAD, AND THE REQUEST THREADS, TO END
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+        for thread in self.httpd.threads:
+            thread.join()
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    ONE THREAD PER REQUEST, KEPT IN threads SO THEY CAN BE JOINED
+    (HTTP/1.0: EACH CONNECTION IS CLOSED AFTER ITS RESPONSE, SO THE THREADS END)
+    """
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        HTTPServer.__init__(self, *args, **kwargs)
+        self.threads = []
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self.process_request_thread, args=(request, client_address))
+        thread.daemon = True
+        self.threads.append(thread)
+        thread.start()
+
+
+def parse_range(byte_range, size):
+    """
+    :return: (start, stop) OF A "bytes=first-last" OR "bytes=-suffix" Range
+    """
+    first, last = byte_range.split("=")[1].split("-")
+    if not first:
+        return max(0, size - int(last)), size
+    return int(first), min(int(last) + 1, size)
+
+
+def chunk_span(meta):
+    start = meta.data_page_offset
+    if meta.dictionary_page_offset is not None:
+        start = min(start, meta.dictionary_page_offset)
+    return start, start + meta.total_compressed_size
+
+
+def sample_file():
+    """
+    :return: BYTES OF FOUR ROW GROUPS OF 1000 ROWS, PAGES OF 100 ROWS
+    """
+    buffer = io.BytesIO()
+    data = [{"a": i, "b": v, "c": i / 7} for i, v in enumerate(ids(4000))]
+    with ParquetWriter(buffer, max_page_rows=100) as writer:
+        for table in ColumnShredder(max_rows=1000).shred(data):
+            writer.write(table)
+    return buffer.getvalue()
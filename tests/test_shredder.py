@@ -0,0 +1,342 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import json
+import pickle
+
+import numpy
+
+from mo_parquet import rows_to_columns, lines_to_columns, assemble, read_table, shred_parallel, write_table, ColumnShredder, SchemaTree, ShredStats, Table
+from mo_parquet.schema import REPEATED, REQUIRED, OPTIONAL
+from mo_future import text_type
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_columns import DREMEL_DATA
+from tests.test_generator import make_repeated, make_optional, make_required, make_const
+
+
+class TestShredder(FuzzyTestCase):
+
+    def test_generator_input(self):
+        table = rows_to_columns({"a": i} for i in range(5))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.values, {"a": [0, 1, 2, 3, 4]})
+
+    def test_row_budget(self):
+        shredder = ColumnShredder(max_rows=2)
+        tables = list(shredder.shred({"a": i} for i in range(5)))
+
+        self.assertEqual([t.num_rows for t in tables], [2, 2, 1])
+        self.assertEqual([t.values["a"].tolist() for t in tables], [[0, 1], [2, 3], [4]])
+
+    def test_byte_budget(self):
+        shredder = ColumnShredder(max_bytes=100)
+        tables = list(shredder.shred({"a": "x" * 30} for i in range(10)))
+
+        # EACH ROW IS 30 BYTES OF STRING PLUS 2 BYTES OF LEVELS
+        self.assertEqual([t.num_rows for t in tables], [4, 4, 2])
+
+    def test_schema_expands_across_batches(self):
+        data = [
+            {"a": 1},
+            {"a": 2},
+            {"a": 3, "b": {"c": "x"}},
+            {"d": [1, 2]},
+            {"a": 5}
+        ]
+        shredder = ColumnShredder(max_rows=2)
+        tables = list(shredder.shred(iter(data)))
+
+        self.assertEqual(shredder.schema.leaves, {"a", "b.c", "d"})
+        self.assertEqual(tables[0].values, {"a": [1, 2]})
+        self.assertEqual(set(tables[0].values.keys()), {"a"})
+        self.assertEqual(tables[1].values, {"a": [3], "b.c": ["x"], "d": [1, 2]})
+        self.assertEqual(tables[1].reps, {"a": [0, 0], "b.c": [0, 0], "d": [0, 0, 1]})
+        self.assertEqual(tables[1].defs, {"a": [1, 0], "b.c": [2, 0], "d": [0, 2, 2]})
+        # ALL KNOWN COLUMNS ARE PRESENT IN LATER ROW GROUPS
+        self.assertEqual(tables[2].values, {"a": [5], "b.c": [], "d": []})
+        self.assertEqual(tables[2].defs, {"a": [1], "b.c": [0], "d": [0]})
+
+    def test_batches_match_single_table(self):
+        expected = rows_to_columns(DREMEL_DATA * 3)
+        tables = list(ColumnShredder(max_rows=2).shred(DREMEL_DATA * 3))
+
+        for name in expected.columns:
+            self.assertEqual(sum((t.values[name].tolist() for t in tables), []), expected.values[name])
+            self.assertEqual(sum((t.reps[name].tolist() for t in tables), []), expected.reps[name])
+            self.assertEqual(sum((t.defs[name].tolist() for t in tables), []), expected.defs[name])
+
+    def test_late_leaves_are_runs(self):
+        data = [{"a": i} for i in range(1000)] + [{"a": 1000, "b": "x", "c": {"d": 1}}]
+        table = rows_to_columns(data)
+
+        self.assertEqual(table.reps["b"].runs, [(0, 1000)])
+        self.assertEqual(table.defs["c.d"].runs, [(0, 1000)])
+        self.assertEqual(table.defs["c.d"].dense.tolist(), [2])
+        self.assertLess(table.defs["c.d"].nbytes, 100)
+        self.assertEqual(assemble(table), data)
+
+        buffer = io.BytesIO()
+        write_table(buffer, table)
+        self.assertEqual(read_table(io.BytesIO(buffer.getvalue())).defs["c.d"].tolist(), [0] * 1000 + [2])
+
+    def test_plan_matches_generic(self):
+        data = DREMEL_DATA + [
+            {"a": 1, "b": [{"c": 1}, {"c": 2, "d": "new"}, {"c": 3}]},
+            {"b": [{"d": "x"}, {}]},
+            {"a": None, "b": None},
+            {"a": 2, "b": [{"c": 4, "e": [1, 2]}, {"e": []}]}
+        ] + DREMEL_DATA
+        self._assert_same(data)
+
+        # b.d IS FOUND MID-LIST, SO EARLIER ITEMS, AND EARLIER ROWS, GET NULLS
+        table = rows_to_columns(data)
+        self.assertEqual(table.reps["b.d"], [0, 0, 0, 1, 1, 0, 1, 0, 0, 1, 0, 0])
+        self.assertEqual(table.defs["b.d"], [0, 0, 2, 3, 2, 3, 2, 0, 2, 2, 0, 0])
+
+        # NULLS, AND EMPTY LISTS, ARE NOT DISTINGUISHED FROM MISSING
+        expected = list(data)
+        expected[4] = {}
+        expected[5] = {"a": 2, "b": [{"c": 4, "e": [1, 2]}, {}]}
+        self.assertEqual(assemble(table), expected)
+
+    def test_plan_matches_generic_locked(self):
+        schema = SchemaTree(locked=True)
+        schema.add("a", OPTIONAL, object)
+        schema.add("a.b", REPEATED, object)
+        schema.add("a.b.c", REQUIRED, int)
+        schema.add("a.b.d", REPEATED, int)
+        generator = make_optional("a", make_repeated("b", make_required("c", make_const)))
+        data = [d for d, _, _, _ in generator()]
+        self._assert_same(data, schema)
+
+    def test_new_leaf_mid_row(self):
+        # b.d IS FOUND AFTER THE FIRST ITEM OF b, WHICH STILL NEEDS A NULL
+        data = [{"a": 1}, {"b": [{"c": 1}, {"d": 2}]}]
+        table = rows_to_columns(data)
+
+        self.assertEqual(table.reps["b.d"], [0, 0, 1])
+        self.assertEqual(table.defs["b.d"], [0, 2, 3])
+        self.assertEqual(assemble(table), data)
+
+    def test_new_leaf_nested(self):
+        data = [
+            {"b": [{"c": 1}, {"c": 2}]},
+            {"b": [{"c": 3}, {"c": 4, "e": [{"f": 1}]}, {"c": 5}]}
+        ]
+        table = rows_to_columns(data)
+
+        self.assertEqual(table.reps["b.e.f"], [0, 1, 0, 1, 1])
+        self.assertEqual(assemble(table), data)
+
+    def test_parallel_matches_single(self):
+        data = [{"a": 1}, {"a": 2}] + DREMEL_DATA + [
+            {"a": 3, "b": [{"c": 1}, {"c": 2, "d": "new"}, {"c": 3}]},
+            {"b": [{"d": "x"}, {}]},
+            {"Name": [{"Language": [{"Code": "fr", "Script": "latin"}]}]}
+        ] + DREMEL_DATA
+        expected = rows_to_columns(data)
+        schema = SchemaTree()
+        result = shred_parallel(data, schema, processes=2, batch_size=2)
+
+        self.assertEqual(result.num_rows, expected.num_rows)
+        self.assertEqual(schema.leaves, expected.schema.leaves)
+        self.assertEqual(set(result.columns), set(expected.columns))
+        for name in expected.columns:
+            self.assertEqual(result.values[name].tolist(), expected.values[name].tolist())
+            self.assertEqual(result.reps[name].tolist(), expected.reps[name].tolist())
+            self.assertEqual(result.defs[name].tolist(), expected.defs[name].tolist())
+
+    def test_concat_backfills_columns(self):
+        first = rows_to_columns([{"a": 1}, {"a": 2}])
+        second = rows_to_columns([{"b": [{"c": 1}, {"c": 2}]}])
+        result = Table.concat([first, second])
+
+        self.assertEqual(result.num_rows, 3)
+        self.assertEqual(result.values, {"a": [1, 2], "b.c": [1, 2]})
+        self.assertEqual(result.defs, {"a": [1, 1, 0], "b.c": [0, 0, 3, 3]})
+        self.assertEqual(result.reps, {"a": [0, 0, 0], "b.c": [0, 0, 0, 1]})
+
+    def test_pickle_table(self):
+        table = rows_to_columns(DREMEL_DATA)
+        result = pickle.loads(pickle.dumps(table, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(result.num_rows, table.num_rows)
+        self.assertEqual(result.schema.leaves, table.schema.leaves)
+        self.assertEqual(assemble(result), DREMEL_DATA)
+
+    def test_schema_union(self):
+        schema = SchemaTree()
+        schema.add("a", OPTIONAL, int)
+        other = SchemaTree()
+        other.add("b", REPEATED, object)
+        other.add("b.c", OPTIONAL, int)
+        other.add("a", OPTIONAL, int)
+
+        schema.union(other)
+        self.assertEqual(set(schema.leaves), {"a", "b.c"})
+        self.assertIsNot(schema.more["b"], other.more["b"])
+
+        conflict = SchemaTree()
+        conflict.add("a", REPEATED, int)
+        self.assertRaises(Exception, schema.union, conflict)
+
+    def test_stats(self):
+        data = [{"a": 1}, {"a": None}, {"a": 3, "b": [{"c": "x"}, {}]}, {"b": []}]
+        stats = ShredStats()
+        table = rows_to_columns(data, stats=stats)
+
+        self.assertEqual(assemble(table), [{"a": 1}, {}, {"a": 3, "b": [{"c": "x"}, {}]}, {}])
+        self.assertEqual(stats.num_rows, 4)
+        self.assertEqual(stats.num_reshreds, 2)
+        self.assertEqual(stats.__data__(), {
+            "leaves": {
+                "a": {"num_values": 2, "num_nulls": 2, "null_ratio": 0.5},
+                "b.c": {"num_values": 1, "num_nulls": 4, "null_ratio": 0.8}
+            },
+            "events": [
+                {"event": "new_leaf", "path": "a", "row": 0},
+                {"event": "new_nested", "path": "b", "row": 2},
+                {"event": "new_object", "path": "b", "row": 2},
+                {"event": "new_leaf", "path": "b.c", "row": 2}
+            ]
+        })
+        self.assertGreater(stats.subtrees["a"][1], 0)
+        self.assertGreater(stats.leaves["b.c"].num_bytes, 0)
+
+    def test_no_stats(self):
+        shredder = ColumnShredder()
+        shredder.append({"a": {"b": 1}})
+        self.assertEqual(shredder._compile_child(shredder.schema.more["a"], "a", 0).__name__, "object_plan")
+
+    def test_lines_match_rows(self):
+        data = DREMEL_DATA + [
+            {"a": 1, "b": [{"c": 1}, {"c": 2, "d": "new"}, {"c": 3}]},
+            {"b": [{"d": "x"}, {}]},
+            {"a": None, "b": None},
+            {"a": 2, "b": [{"c": 4, "e": [1, 2]}, {"e": []}]},
+            {"a": 3, "b": [{"c": 5, "d": "caf\u00e9 \"quoted\"", "e": [3]}]},
+            {"a": 4, "f": {"i": 1}, "g": [True, False, None], "h": 1.5},
+            {"a": 5, "h": 2, "f": None},
+            {"a": 6, "f": {}}
+        ] + DREMEL_DATA
+        lines = [json.dumps(d) for d in data]
+        lines[3] = "  " + lines[3].replace(": ", ":").replace(", ", " ,\t") + " "
+        lines.insert(4, "")
+        result = lines_to_columns(lines)
+        expected = rows_to_columns(data)
+
+        self.assertEqual(result.num_rows, expected.num_rows)
+        self.assertEqual(result.schema.leaves, expected.schema.leaves)
+        for name in expected.columns:
+            self.assertEqual(result.values[name].tolist(), expected.values[name].tolist())
+            self.assertEqual(result.reps[name].tolist(), expected.reps[name].tolist())
+            self.assertEqual(result.defs[name].tolist(), expected.defs[name].tolist())
+
+    def test_lines_reject_bad_json(self):
+        shredder = ColumnShredder()
+        shredder.append_json('{"a": 1}')
+        self.assertRaises(Exception, shredder.append_json, '{"a": 1} x')
+        self.assertRaises(Exception, shredder.append_json, '{"a" 1}')
+        shredder.append_json('{"a": 2}')
+        self.assertEqual(assemble(shredder.flush()), [{"a": 1}, {"a": 2}])
+
+    def test_bad_row_is_removed(self):
+        good = [{"a": [{"x": 1}], "k": 1}, {"a": [{"x": 4}, {"y": 6}], "k": 3}]
+        bad = [
+            {"a": {"x": 2}, "k": 2},
+            {"a": [{"x": 2, "y": 5}, {"x": 3}], "k": {"q": 1}},  # a.y IS FOUND BEFORE THE ERROR
+            {"a": [{"x": [2]}], "k": 2}
+        ]
+        for row in bad:
+            for append in (ColumnShredder.append, lambda s, r: s.append_json(json.dumps(r))):
+                shredder = ColumnShredder()
+                append(shredder, good[0])
+                self.assertRaises(Exception, append, shredder, row)
+                append(shredder, good[1])
+                table = shredder.flush()
+                self.assertEqual(table.num_rows, 2)
+                self.assertEqual(assemble(table), good)
+
+    def test_polymorphic_leaves(self):
+        data = [
+            {"a": 1, "b": [1, 2]},
+            {"a": "x", "b": [3, "y", True]},
+            {"a": 2.5, "b": [2.5]},
+            {"a": None},
+            {"a": False}
+        ]
+        table = rows_to_columns(data)
+
+        self.assertEqual(table.schema.leaves, {"a.~n~", "a.~s~", "a.~b~", "b.~n~", "b.~s~", "b.~b~"})
+        self.assertEqual(table.values, {
+            "a.~n~": [1, 2.5],
+            "a.~s~": ["x"],
+            "a.~b~": [False],
+            "b.~n~": [1, 2, 3, 2.5],
+            "b.~s~": ["y"],
+            "b.~b~": [True]
+        })
+        self.assertEqual(table.values["a.~n~"].dtype, numpy.float64)
+        self.assertEqual(table.defs["a.~s~"], [1, 2, 1, 0, 1])
+        self.assertEqual(assemble(table), data[:3] + [{}, {"a": False}])
+
+        lines = lines_to_columns(json.dumps(d) for d in data)
+        for name in table.columns:
+            self.assertEqual(lines.values[name].tolist(), table.values[name].tolist())
+            self.assertEqual(lines.reps[name].tolist(), table.reps[name].tolist())
+            self.assertEqual(lines.defs[name].tolist(), table.defs[name].tolist())
+
+        buffer = io.BytesIO()
+        write_table(buffer, table)
+        self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), assemble(table))
+
+    def test_split_after_flush(self):
+        shredder = ColumnShredder(max_rows=1)
+        list(shredder.shred([{"a": 1}]))
+        self.assertRaises(Exception, shredder.append, {"a": "x"})
+
+        # DECLARED TYPES CAN BE SHREDDED IN ANY ROW GROUP
+        schema = SchemaTree()
+        schema.add("a.~n~", OPTIONAL, int)
+        schema.add("a.~s~", OPTIONAL, text_type)
+        tables = list(ColumnShredder(schema, max_rows=1).shred([{"a": 1}, {"a": "x"}]))
+        self.assertEqual(assemble(Table.concat(tables)), [{"a": 1}, {"a": "x"}])
+
+    def test_parallel_polymorphic(self):
+        data = [{"a": 1}, {"a": 2}, {"a": "x"}, {"a": 3.5}, {"a": 4}]
+        expected = rows_to_columns(data)
+        result = shred_parallel(data, processes=2, batch_size=2)
+
+        self.assertEqual(result.schema.leaves, expected.schema.leaves)
+        for name in expected.columns:
+            self.assertEqual(result.values[name].tolist(), expected.values[name].tolist())
+            self.assertEqual(result.defs[name].tolist(), expected.defs[name].tolist())
+        self.assertEqual(assemble(result), data)
+
+    def _assert_same(self, data, schema=None):
+        expected = GenericShredder(schema)
+        for row in data:
+            expected.append(row)
+        expected = expected.flush()
+
+        result = rows_to_columns(data, schema)
+        self.assertEqual(set(result.columns), set(expected.columns))
+        for name in expected.columns:
+            self.assertEqual(result.values[name].tolist(), expected.values[name].tolist())
+            self.assertEqual(result.reps[name].tolist(), expected.reps[name].tolist())
+            self.assertEqual(result.defs[name].tolist(), expected.defs[name].tolist())
+
+
+class GenericShredder(ColumnShredder):
+    """
+    SHRED WITHOUT COMPILED PLANS
+    """
+
+    def _shred(self, row):
+        self._value_to_column(row, self.schema, '.', 0, 0, 0)
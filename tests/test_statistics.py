@@ -0,0 +1,124 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+
+from mo_parquet import ColumnShredder, ParquetReader, ParquetWriter, assemble, rows_to_columns, write_table
+from mo_parquet.statistics import decode_statistics
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from parquet_thrift.parquet.ttypes import BoundaryOrder
+from tests.test_columns import DREMEL_DATA
+from tests.test_writer import read_footer
+
+
+class TestStatistics(FuzzyTestCase):
+
+    def test_column_statistics(self):
+        data = [
+            {"t": 30, "s": "b", "f": 1.5},
+            {"t": -5, "s": "a"},
+            {"t": 12, "f": -2.5},
+            {"s": "b"}
+        ]
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(data))
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        stats = {c.name: _stats(reader, c.name) for c in reader.columns}
+        self.assertEqual(stats["t"], {"min": -5, "max": 30, "null_count": 1})
+        self.assertEqual(stats["s"], {"min": "a", "max": "b", "null_count": 1})
+        self.assertEqual(stats["f"], {"min": -2.5, "max": 1.5, "null_count": 2})
+
+        meta = read_footer(buffer.getvalue())
+        self.assertEqual(meta.row_groups[0].columns[1].meta_data.statistics.distinct_count, 2)
+
+    def test_removed_values_not_in_statistics(self):
+        shredder = ColumnShredder()
+        shredder.append({"a": [{"s": "m"}, {"s": "b"}]})
+        self.assertRaises(Exception, shredder.append, {"a": [{"s": "zzz"}, {"s": {"q": 1}}]})  # "zzz" IS SHREDDED BEFORE THE ERROR
+        shredder.append({"a": [{"s": "c"}]})
+        buffer = io.BytesIO()
+        write_table(buffer, shredder.flush())
+
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(_stats(reader, "a.s"), {"min": "b", "max": "m", "null_count": 0})
+        meta = read_footer(buffer.getvalue())
+        self.assertEqual(meta.row_groups[0].columns[0].meta_data.statistics.distinct_count, 3)
+
+    def test_prune_row_groups(self):
+        reader = ParquetReader(time_series())
+
+        self.assertEqual(reader.filter_row_groups({"gte": {"t": 250}}), [2, 3, 4])
+        self.assertEqual(reader.filter_row_groups({"and": [{"gte": {"t": 150}}, {"lt": {"t": 300}}]}), [1, 2])
+        self.assertEqual(reader.filter_row_groups({"eq": {"t": 199}}), [1])
+        self.assertEqual(reader.filter_row_groups({"in": {"t": [5, 405]}}), [0, 4])
+        self.assertEqual(reader.filter_row_groups({"or": [{"lt": {"t": 50}}, {"gt": {"t": 480}}]}), [0, 4])
+        self.assertEqual(reader.filter_row_groups({"eq": {"status": "failed"}}), [3])
+        self.assertEqual(reader.filter_row_groups({"eq": {"t": 1000}}), [])
+
+        # UNKNOWN COLUMNS, AND UNSUPPORTED EXPRESSIONS, CAN NOT PRUNE
+        self.assertEqual(reader.filter_row_groups({"eq": {"nothing": 1}}), [0, 1, 2, 3, 4])
+        self.assertEqual(reader.filter_row_groups({"exists": "t"}), [0, 1, 2, 3, 4])
+        self.assertEqual(reader.filter_row_groups({"eq": {"t": "text"}}), [0, 1, 2, 3, 4])
+
+    def test_read_where(self):
+        reader = ParquetReader(time_series())
+        table = reader.read(["t"], where={"gte": {"t": 420}})
+        self.assertEqual(table.num_rows, 100)
+        self.assertEqual(table.values["t"].tolist(), list(range(400, 500)))
+
+    def test_page_index(self):
+        reader = ParquetReader(time_series(max_page_rows=10))
+        t = reader.get_columns(["t"])[0]
+        offset_index, column_index = reader.get_page_index(1, t)
+
+        self.assertEqual([p.first_row_index for p in offset_index.page_locations], list(range(0, 100, 10)))
+        self.assertEqual(column_index.null_pages, [False] * 10)
+        self.assertEqual(column_index.boundary_order, BoundaryOrder.ASCENDING)
+        self.assertEqual(column_index.null_counts, [0] * 10)
+
+    def test_read_where_pages(self):
+        reader = ParquetReader(time_series(max_page_rows=10))
+        self.assertEqual(reader.filter_rows({"gte": {"t": 425}}, 4), [(20, 100)])
+        self.assertEqual(reader.filter_rows({"eq": {"nothing": 1}}, 4), [(0, 100)])
+
+        table = reader.read(["t"], where={"gte": {"t": 425}})
+        self.assertEqual(table.values["t"].tolist(), list(range(420, 500)))
+
+        table = reader.read(where={"eq": {"status": "failed"}})
+        self.assertEqual(table.values["t"].tolist(), list(range(300, 310)))
+
+    def test_read_rows(self):
+        reader = ParquetReader(time_series(max_page_rows=10))
+        self.assertEqual(reader.read_rows(195, 215, ["t"]).values["t"].tolist(), list(range(195, 215)))
+        self.assertEqual(reader.read_rows(42, 43).values["t"].tolist(), [42])
+
+        # REPEATED COLUMNS, WITH PAGES THAT DO NOT LINE UP
+        data = DREMEL_DATA * 20
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer, max_page_rows=3) as writer:
+            for table in ColumnShredder(max_rows=16).shred(data):
+                writer.append(table)
+        reader = ParquetReader(io.BytesIO(buffer.getvalue()))
+        for start, stop in [(0, 1), (5, 12), (13, 40), (39, 40)]:
+            self.assertEqual(assemble(reader.read_rows(start, stop)), data[start:stop])
+
+
+def time_series(max_page_rows=None):
+    buffer = io.BytesIO()
+    data = [{"t": t, "status": "failed" if 300 <= t < 310 else "ok"} for t in range(500)]
+    with ParquetWriter(buffer, max_page_rows=max_page_rows) as writer:
+        for table in ColumnShredder(max_rows=100).shred(data):
+            writer.write(table)
+    return io.BytesIO(buffer.getvalue())
+
+
+def _stats(reader, name):
+    column = [c for c in reader.columns if c.name == name][0]
+    meta = reader.metadata.row_groups[0].columns[reader.columns.index(column)].meta_data
+    return decode_statistics(meta.statistics, column.element)
@@ -0,0 +1,125 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from mo_parquet import Dataset, ParquetReader, assemble
+from mo_parquet.dataset import FooterCache
+from mo_parquet.encodings import UINT32
+from mo_parquet.summary import SUMMARY_NAME, read_summary
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_dataset import write_file
+
+
+class TestSummary(FuzzyTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.summary = os.path.join(self.directory, SUMMARY_NAME)
+        for month in (1, 2):
+            for day in (1, 2):
+                add_day(self.directory, month, day)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_summary(self):
+        Dataset(self.directory, footer_cache=FooterCache()).write_summary()
+
+        schema, entries = read_summary(self.summary)
+        self.assertEqual([e.path for e in entries], ["month=1/day1.parquet", "month=1/day2.parquet", "month=2/day1.parquet", "month=2/day2.parquet"])
+        self.assertEqual(sorted(c.name for c in schema.get_parquet_columns()), ["extra.value", "name", "t"])
+        self.assertEqual([e.metadata.num_rows for e in entries], [10, 10, 10, 10])
+
+        # THE SUMMARY IS A PARQUET FILE, WITH NO ROWS
+        with ParquetReader(self.summary) as reader:
+            self.assertEqual(reader.num_rows, 0)
+            self.assertEqual(sorted(c.name for c in reader.columns), ["extra.value", "name", "t"])
+
+    def test_plan_from_summary(self):
+        Dataset(self.directory, footer_cache=FooterCache()).write_summary()
+
+        cache = FooterCache()
+        dataset = Dataset(self.directory, footer_cache=cache)
+        plan = dataset.plan({"and": [{"eq": {"month": 2}}, {"gte": {"t": 220}}]})
+        self.assertEqual([os.path.basename(f.path) for f, _ in plan], ["day2.parquet"])
+        self.assertEqual(dataset.num_rows, 40)
+        self.assertEqual(cache.misses, 0)  # NO FOOTER WAS READ FROM A DATA FILE
+
+        table = dataset.read(where={"eq": {"t": 125}})
+        self.assertEqual([r["t"] for r in assemble(table)], list(range(120, 130)))
+
+    def test_update_summary_appends(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        self.assertEqual(len(dataset.update_summary()), 4)  # CREATED
+        with io.open(self.summary, "rb") as file:
+            before = file.read()
+
+        add_day(self.directory, 2, 3)
+        add_day(self.directory, 3, 1)
+        added = dataset.update_summary()
+        self.assertEqual([os.path.basename(os.path.dirname(f.path)) for f in added], ["month=2", "month=3"])
+        with io.open(self.summary, "rb") as file:
+            after = file.read()
+
+        # ONLY THE FOOTER OF THE OLD SUMMARY IS REPLACED
+        footer_start = len(before) - 8 - UINT32.unpack(before[-8:-4])[0]
+        self.assertEqual(after[:footer_start], before[:footer_start])
+        self.assertEqual(len(dataset.files), 6)
+        self.assertEqual(dataset.read().num_rows, 60)
+        self.assertEqual(dataset.plan({"eq": {"month": 3}})[0][0].partition, {"month": 3})
+
+        self.assertEqual(dataset.update_summary(), [])
+
+    def test_update_summary_rewrites(self):
+        dataset = Dataset(self.directory, footer_cache=FooterCache())
+        dataset.write_summary()
+
+        os.remove(dataset.files[0].path)
+        add_day(self.directory, 1, 1, rows=3)
+        path = dataset.files[1].path
+        os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime + 10))
+        os.remove(dataset.files[3].path)
+
+        self.assertEqual(dataset.update_summary(), [])
+        self.assertEqual([os.path.basename(f.path) for f in dataset.files], ["day1.parquet", "day2.parquet", "day1.parquet"])
+        self.assertEqual(dataset.num_rows, 23)
+        _, entries = read_summary(self.summary)
+        self.assertEqual(len(entries), 3)
+
+    def test_without_summary(self):
+        Dataset(self.directory, footer_cache=FooterCache()).write_summary()
+        add_day(self.directory, 3, 1)
+
+        self.assertEqual(len(Dataset(self.directory, footer_cache=FooterCache()).files), 4)
+        self.assertEqual(len(Dataset(self.directory, footer_cache=FooterCache(), use_summary=False).files), 5)
+
+    def test_tool(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        subprocess.check_output([sys.executable, "-m", "mo_parquet.summary", self.directory], env=env, stderr=subprocess.STDOUT)
+        _, entries = read_summary(self.summary)
+        self.assertEqual(len(entries), 4)
+
+
+def add_day(directory, month, day, rows=10):
+    start = (month * 10 + day) * 10
+    data = [{"t": t, "name": "n" + str(t)} for t in range(start, start + rows)]
+    if month == 2:
+        for row in data:
+            row["extra"] = {"value": row["t"] * 2}
+    write_file(directory, "month=" + str(month), "day" + str(day) + ".parquet", data)
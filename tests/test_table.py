@@ -0,0 +1,140 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import numpy
+
+from mo_parquet import rows_to_columns, assemble
+from mo_parquet.table import PathIndex
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from tests.test_columns import DREMEL_DATA
+from tests.test_writer import dremel_schema
+
+
+class TestTable(FuzzyTestCase):
+
+    def test_slice(self):
+        data = DREMEL_DATA * 3 + [{"DocId": 30}]
+        table = rows_to_columns(data)
+
+        for start, stop in [(0, 1), (1, 4), (5, 7), (6, 7), (3, 3), (-2, None)]:
+            result = table[start:stop]
+            self.assertEqual(result.num_rows, len(data[start:stop]))
+            self.assertEqual(assemble(result), data[start:stop])
+
+        self.assertIs(table[:], table)
+        self.assertRaises(Exception, lambda: table[0:4:2])
+
+    def test_slice_is_view(self):
+        table = rows_to_columns(DREMEL_DATA * 3)
+        result = table[2:4]
+
+        for name in table.columns:
+            self.assertTrue(numpy.shares_memory(result.values[name], table.values[name].data))
+            self.assertTrue(numpy.shares_memory(result.reps[name], table.reps[name].data))
+            self.assertTrue(numpy.shares_memory(result.defs[name], table.defs[name].data))
+
+    def test_row_index(self):
+        table = rows_to_columns(DREMEL_DATA * 2)
+        index = table.get_row_index("Name.Language.Code")
+
+        self.assertEqual(index.levels.tolist(), [0, 4, 5, 9, 10])
+        self.assertEqual(index.values.tolist(), [0, 3, 3, 6, 6])
+        self.assertEqual(index.row_of(numpy.array([0, 3, 4, 9])).tolist(), [0, 0, 1, 3])
+        self.assertIs(table.get_row_index("Name.Language.Code"), index)
+
+    def test_column_rows(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        column = table.get_column("Name.Language.Country")
+
+        values, reps, defs = column.get_row(0)
+        self.assertEqual(values.tolist(), [b"us", b"gb"])
+        self.assertEqual(reps.tolist(), [0, 2, 1, 1])
+        self.assertEqual(defs.tolist(), [3, 2, 1, 3])
+        self.assertEqual(column[1:].reps.tolist(), [0])
+        self.assertRaises(IndexError, column.get_row, 2)
+
+    def test_project(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        result = table["Name.Language"]
+
+        self.assertEqual(set(result.columns), {"Name.Language.Code", "Name.Language.Country"})
+        self.assertIs(result.values["Name.Language.Code"], table.values["Name.Language.Code"])
+        self.assertIs(result.schema, table.schema)
+        self.assertEqual(assemble(result), assemble(table, ["Name.Language"]))
+
+        # PROJECTIONS OF PROJECTIONS
+        self.assertEqual(list(result["Name.Language.Code"].columns), ["Name.Language.Code"])
+        self.assertEqual(list(table["Name"]["Name.Language"]["Name.Language.Country"].columns), ["Name.Language.Country"])
+        self.assertEqual(list(result["Name.Url"].columns), [])
+        self.assertEqual(list(table["Nothing"].columns), [])
+
+    def test_path_index(self):
+        index = PathIndex(["a", "b.c", "b.d.e", "b.d.f"])
+
+        self.assertEqual(index.find("b").names, ["b.c", "b.d.e", "b.d.f"])
+        self.assertEqual(index.find("b.d.f").names, ["b.d.f"])
+        self.assertEqual(index.find("b.x"), None)
+
+        sub = index.subtree("b.d")
+        self.assertEqual(sub.names, ["b.d.e", "b.d.f"])
+        self.assertEqual(sub.find("b.d.e").names, ["b.d.e"])
+        self.assertEqual(sub.find("a"), None)
+
+    def test_to_numpy(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        arrays = table.to_numpy()
+
+        doc_id = arrays["DocId"]
+        self.assertTrue(numpy.shares_memory(doc_id.values, table.values["DocId"].data))
+        self.assertEqual(doc_id.validity, None)
+        self.assertEqual(doc_id.offsets, [])
+
+        url = arrays["Name.Url"]
+        self.assertEqual(url.path, "Name")
+        self.assertEqual(url.validity.tolist(), [True, True, False, True])
+        self.assertEqual([o.tolist() for o in url.offsets], [[0, 3, 4]])
+
+        country = arrays["Name.Language.Country"]
+        self.assertEqual(country.path, "Name.Language")
+        self.assertEqual(country.values.tolist(), [b"us", b"gb"])
+        self.assertEqual(country.validity.tolist(), [True, False, True])
+        self.assertEqual([o.tolist() for o in country.offsets], [[0, 3, 4], [0, 2, 2, 3, 3]])
+        self.assertEqual(country.to_list(), [[[b"us", None], [], [b"gb"]], [[]]])
+
+        self.assertEqual([o.tolist() for o in arrays["Links.Backward"].offsets], [[0, 0, 2]])
+
+    def test_to_numpy_nulls(self):
+        table = rows_to_columns([{"a": 1}, {}, {"a": 3}])
+        a = table.to_numpy()["a"]
+
+        self.assertEqual(a.values.tolist(), [1, 3])
+        self.assertEqual(a.validity.tolist(), [True, False, True])
+        dense = a.dense()
+        self.assertEqual(dense[[0, 2]].tolist(), [1, 3])
+        self.assertTrue(numpy.isnan(dense[1]))
+
+    def test_to_pandas(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        frame = table.to_pandas()
+
+        self.assertEqual(len(frame), 2)
+        self.assertEqual(frame["DocId"].tolist(), [10, 20])
+        self.assertEqual(frame["Links.Forward"].tolist(), [[20, 40, 60], [80]])
+        self.assertEqual(frame["Name.Url"].tolist(), [[b"http://A", b"http://B", None], [b"http://C"]])
+
+    def test_to_pandas_explode(self):
+        table = rows_to_columns(DREMEL_DATA, dremel_schema())
+        frames = table.to_pandas(explode=True)
+
+        self.assertEqual(set(frames.keys()), {".", "Links.Backward", "Links.Forward", "Name", "Name.Language"})
+        language = frames["Name.Language"]
+        self.assertEqual(language.index.tolist(), [0, 0, 0])
+        self.assertEqual(language["Name.Language.Code"].tolist(), [b"en-us", b"en", b"en-gb"])
+        self.assertEqual(language["Name.Language.Country"].tolist(), [b"us", None, b"gb"])
+        self.assertEqual(frames["Links.Backward"].index.tolist(), [1, 1])
+        self.assertEqual(frames["."]["DocId"].tolist(), [10, 20])
@@ -0,0 +1,308 @@
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import zlib
+
+import numpy
+
+from mo_future import text_type
+from mo_parquet import rows_to_columns, assemble, SchemaTree, ColumnShredder, read_table
+from mo_parquet.buffer import LevelBuffer
+from mo_parquet.encodings import decode_levels, decode_plain, encode_levels, encode_plain, UINT32
+from mo_parquet.schema import REQUIRED, REPEATED, OPTIONAL
+from mo_parquet.writer import ParquetWriter, write_table, MAGIC
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from parquet_thrift.parquet.ttypes import FileMetaData, PageHeader, Type, CompressionCodec, Encoding
+from tests.test_columns import DREMEL_DATA
+from thrift_structures import read_thrift
+
+
+class TestWriter(FuzzyTestCase):
+
+    def test_plain_round_trip(self):
+        for ptype, values in [
+            (Type.INT64, [1, -2, 3]),
+            (Type.DOUBLE, [1.5, -2.25]),
+            (Type.BOOLEAN, [True, False, True, True, False, False, False, False, True]),
+            (Type.BYTE_ARRAY, [b"hello", b"", b"world"])
+        ]:
+            data = encode_plain(values, ptype)
+            result, end = decode_plain(data, ptype, len(values))
+            self.assertEqual(result.tolist(), values)
+            self.assertEqual(end, len(data))
+
+    def test_levels_round_trip(self):
+        levels = [0, 0, 0, 1, 2, 2, 2, 0, 3, 1]
+        data = encode_levels(levels, 2)
+        result, end = decode_levels(data, 2, len(levels))
+        self.assertEqual(result.tolist(), levels)
+        self.assertEqual(end, len(data))
+
+    def test_levels_hybrid(self):
+        # SHORT RUNS ARE BIT-PACKED, LONG RUNS ARE RLE, AND BIT-PACKED GROUPS BORROW FROM THE NEXT RUN
+        levels = [0, 1, 2, 1, 0] + [3] * 20 + [1, 2] + [0] * 9 + [2, 1, 3]
+        for width in [2, 3, 9]:
+            data = encode_levels(levels, width)
+            result, end = decode_levels(data, width, len(levels))
+            self.assertEqual(result.tolist(), levels)
+            self.assertEqual(end, len(data))
+
+        data = encode_levels(levels, 2)
+        self.assertEqual(data[0:1], b"\x03")  # ONE BIT-PACKED GROUP
+        self.assertEqual(data[3:5], b"\x22\x03")  # RLE OF 17 THREES
+
+    def test_levels_random(self):
+        random = numpy.random.RandomState(42)
+        levels = numpy.repeat(random.randint(0, 5, 1000), random.randint(1, 20, 1000))
+        data = encode_levels(levels, 3)
+        result, end = decode_levels(data, 3, len(levels))
+        self.assertEqual(result.tolist(), levels.tolist())
+        self.assertEqual(end, len(data))
+
+    def test_levels_runs(self):
+        levels = LevelBuffer.zeros(10000)
+        levels.extend_run(1, 3)
+        levels.extend([2, 0, 1, 1])
+        data = encode_levels(levels, 2)
+        self.assertLess(len(data), 10)
+        result, end = decode_levels(data, 2, len(levels))
+        self.assertEqual(result.tolist(), levels.tolist())
+        self.assertEqual(end, len(data))
+
+    def test_dremel_file(self):
+        schema = dremel_schema()
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns(DREMEL_DATA, schema), use_dictionary=False)
+        data = buffer.getvalue()
+
+        self.assertEqual(data[:4], MAGIC)
+        self.assertEqual(data[-4:], MAGIC)
+        meta = read_footer(data)
+        self.assertEqual(meta.num_rows, 2)
+        self.assertEqual(len(meta.row_groups), 1)
+        self.assertEqual(
+            [e.name for e in meta.schema],
+            [".", "DocId", "Links", "Backward", "Forward", "Name", "Language", "Code", "Country", "Url"]
+        )
+        self.assertEqual([e.num_children for e in meta.schema], [3, None, 2, None, None, 2, 2, None, None, None])
+        self.assertEqual(
+            [c.meta_data.path_in_schema for c in meta.row_groups[0].columns],
+            [["DocId"], ["Links", "Backward"], ["Links", "Forward"], ["Name", "Language", "Code"], ["Name", "Language", "Country"], ["Name", "Url"]]
+        )
+
+        # Name.Language.Country HAS REPETITION AND DEFINITION LEVELS
+        country = meta.row_groups[0].columns[4].meta_data
+        self.assertEqual(country.num_values, 5)
+        reps, defs, values = read_page(data, country.data_page_offset, 2, 2, 3, country.num_values, Type.BYTE_ARRAY)
+        self.assertEqual(reps, [0, 2, 1, 1, 0])
+        self.assertEqual(defs, [3, 2, 1, 3, 1])
+        self.assertEqual(values, [b"us", b"gb"])
+
+    def test_gzip(self):
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns([{"a": i} for i in range(100)]), compression="gzip")
+        meta = read_footer(buffer.getvalue())
+        column = meta.row_groups[0].columns[0].meta_data
+        self.assertEqual(column.codec, CompressionCodec.GZIP)
+        self.assertLess(column.total_compressed_size, column.total_uncompressed_size)
+
+    def test_mixed_types(self):
+        # AN INT64 COLUMN CAN NOT HOLD HUGE INTEGERS
+        self.assertRaises(Exception, write_table, io.BytesIO(), rows_to_columns([{"a": 1}, {"a": 2 ** 70}]))
+
+        # FLOATS PROMOTE THE COLUMN TO DOUBLE, BOOLEANS GET THEIR OWN COLUMN
+        for data in [[{"a": 1}, {"a": 2.5}], [{"a": 1}, {"a": True}]]:
+            buffer = io.BytesIO()
+            write_table(buffer, rows_to_columns(data))
+            self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), data)
+
+        # A DOUBLE COLUMN CAN HOLD SMALL INTEGERS
+        buffer = io.BytesIO()
+        write_table(buffer, rows_to_columns([{"a": 2.5}, {"a": 1}]))
+        self.assertEqual(read_table(io.BytesIO(buffer.getvalue())).values["a"].tolist(), [2.5, 1.0])
+        self.assertRaises(Exception, write_table, io.BytesIO(), rows_to_columns([{"a": 2.5}, {"a": 2 ** 60 + 1}]))
+
+    def test_file_name(self):
+        temp = tempfile.mkdtemp()
+        try:
+            filename = str(os.path.join(temp, "test.parquet"))  # bytes IN PY2
+            write_table(filename, rows_to_columns([{"a": 1}, {"a": 2}]))
+            self.assertEqual(read_table(filename).values["a"].tolist(), [1, 2])
+        finally:
+            shutil.rmtree(temp)
+
+    def test_dictionary(self):
+        data = [{"status": ["ok", "failed", None, "ok"][i % 4]} for i in range(1000)]
+        plain = io.BytesIO()
+        write_table(plain, rows_to_columns(data), use_dictionary=False)
+        encoded = io.BytesIO()
+        write_table(encoded, rows_to_columns(data))
+
+        column = read_footer(encoded.getvalue()).row_groups[0].columns[0].meta_data
+        self.assertEqual(column.encodings, [Encoding.PLAIN_DICTIONARY, Encoding.RLE])
+        self.assertEqual(column.dictionary_page_offset, 4)
+        self.assertGreater(column.data_page_offset, column.dictionary_page_offset)
+        self.assertLess(len(encoded.getvalue()) * 10, len(plain.getvalue()))
+
+        self.assertEqual(read_table(io.BytesIO(encoded.getvalue())).values["status"], rows_to_columns(data).values["status"])
+
+    def test_dictionary_fallback(self):
+        values = [text_type(i % 10) for i in range(50)] + ["value" + text_type(i) for i in range(50)]
+        data = [{"a": v} for v in values]
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=50, max_dictionary_bytes=300).shred(data):
+                writer.write(table)
+
+        meta = read_footer(buffer.getvalue())
+        # FIRST ROW GROUP FITS IN DICTIONARY, SECOND DOES NOT
+        self.assertEqual([g.columns[0].meta_data.encodings[0] for g in meta.row_groups], [Encoding.PLAIN_DICTIONARY, Encoding.PLAIN])
+        self.assertEqual(read_table(io.BytesIO(buffer.getvalue())).values["a"], [v.encode("utf8") for v in values])
+
+    def test_schema_expansion_fills_nulls(self):
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=2).shred([{"a": 1}, {"a": 2}, {"b": "x"}]):
+                writer.write(table)
+
+        meta = read_footer(buffer.getvalue())
+        self.assertEqual(meta.num_rows, 3)
+        self.assertEqual([g.num_rows for g in meta.row_groups], [2, 1])
+        # EVERY ROW GROUP HAS EVERY COLUMN
+        for g in meta.row_groups:
+            self.assertEqual([c.meta_data.path_in_schema for c in g.columns], [["a"], ["b"]])
+        self.assertEqual(meta.row_groups[0].columns[1].meta_data.num_values, 2)
+
+    def test_late_column_under_repeated_parent(self):
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=3).shred(LATE_NESTED_DATA):
+                writer.write(table)
+
+        # THE NULLS OF a.y IN THE FIRST ROW GROUP FOLLOW THE ITEMS OF a
+        table = read_table(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(table.reps["a.y"], table.reps["a.x"])
+        self.assertEqual(table.reps["a.y"], [0, 1, 0, 0, 0, 1])
+        self.assertEqual(table.defs["a.y"], [2, 2, 2, 0, 3, 3])
+        self.assertEqual(assemble(table), LATE_NESTED_DATA)
+
+    def test_append_row_group(self):
+        data = [{"a": i, "b": {"c": ["x", "y", "z"][:i % 4]}} for i in range(100)]
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=10).shred(data):
+                writer.append(table)
+
+        meta = read_footer(buffer.getvalue())
+        self.assertEqual([g.num_rows for g in meta.row_groups], [100])
+        a = meta.row_groups[0].columns[0].meta_data
+        self.assertEqual(a.statistics.min, encode_plain([0], Type.INT64))
+        self.assertEqual(a.statistics.max, encode_plain([99], Type.INT64))
+        self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), data)
+
+    def test_spill(self):
+        data = [{"a": i, "b": "value" + text_type(i % 7)} for i in range(1000)]
+        expected = io.BytesIO()
+        with ParquetWriter(expected) as writer:
+            for table in ColumnShredder(max_rows=100).shred(data):
+                writer.append(table)
+
+        result = io.BytesIO()
+        with ParquetWriter(result, max_memory=1000) as writer:
+            for table in ColumnShredder(max_rows=100).shred(data):
+                writer.append(table)
+            spilled = [name for name, chunk in writer._chunks.items() if any(isinstance(p, tuple) for p in chunk.pages)]
+            self.assertEqual(spilled, ["a"])  # THE LARGEST COLUMN
+            self.assertLessEqual(writer._memory, 1000)
+
+        self.assertEqual(result.getvalue(), expected.getvalue())
+
+    def test_append_dictionary(self):
+        data = [{"status": ["ok", "failed", None, "ok", "retry"][i % 5]} for i in range(100)]
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=3).shred(data):
+                writer.append(table)
+
+        column = read_footer(buffer.getvalue()).row_groups[0].columns[0].meta_data
+        self.assertEqual(column.encodings, [Encoding.PLAIN_DICTIONARY, Encoding.RLE])
+        self.assertEqual(column.statistics.distinct_count, 3)
+        self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), data)
+
+    def test_append_new_column(self):
+        data = [{"a": 1}, {"a": 2}, {"b": "x"}, {"a": 3, "b": "y"}]
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer) as writer:
+            for table in ColumnShredder(max_rows=2).shred(data):
+                writer.append(table)
+
+        meta = read_footer(buffer.getvalue())
+        self.assertEqual([g.num_rows for g in meta.row_groups], [4])
+        self.assertEqual(assemble(read_table(io.BytesIO(buffer.getvalue()))), data)
+
+    def test_append_new_column_under_repeated_parent(self):
+        buffer = io.BytesIO()
+        with ParquetWriter(buffer, max_page_rows=2) as writer:
+            for table in ColumnShredder(max_rows=3).shred(LATE_NESTED_DATA):
+                writer.append(table)
+
+        self.assertEqual([g.num_rows for g in read_footer(buffer.getvalue()).row_groups], [4])
+        table = read_table(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(table.reps["a.y"], table.reps["a.x"])
+        self.assertEqual(table.defs["a.y"], [2, 2, 2, 0, 3, 3])
+        self.assertEqual(assemble(table), LATE_NESTED_DATA)
+
+
+# a.y IS FOUND AFTER THE THIRD ROW
+LATE_NESTED_DATA = [
+    {"a": [{"x": 1}, {"x": 2}], "k": 1},
+    {"a": [{"x": 3}], "k": 2},
+    {"k": 5},
+    {"a": [{"y": 5}, {"x": 6, "y": 7}], "k": 3}
+]
+
+
+def dremel_schema():
+    schema = SchemaTree(locked=True)
+    schema.add("DocId", REQUIRED, int)
+    schema.add("Name", REPEATED, object)
+    schema.add("Name.Url", OPTIONAL, text_type)
+    schema.add("Links", OPTIONAL, object)
+    schema.add("Links.Forward", REPEATED, int)
+    schema.add("Links.Backward", REPEATED, int)
+    schema.add("Name.Language", REPEATED, object)
+    schema.add("Name.Language.Code", REQUIRED, text_type)
+    schema.add("Name.Language.Country", OPTIONAL, text_type)
+    return schema
+
+
+def read_footer(data):
+    footer_length, = UINT32.unpack(data[-8:-4])
+    return read_thrift(io.BytesIO(data[-8 - footer_length:-8]), FileMetaData)
+
+
+def read_page(data, offset, rep_width, def_width, max_def, num_values, ptype):
+    file = io.BytesIO(data)
+    file.seek(offset)
+    header = read_thrift(file, PageHeader)
+    body = file.read(header.compressed_page_size)
+    if header.compressed_page_size != header.uncompressed_page_size:
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+    length, = UINT32.unpack(body[0:4])
+    reps, _ = decode_levels(body, rep_width, num_values, 4)
+    start = 4 + length
+    length, = UINT32.unpack(body[start:start + 4])
+    defs, _ = decode_levels(body, def_width, num_values, start + 4)
+    start += 4 + length
+    values, _ = decode_plain(body, ptype, int((defs == max_def).sum()), start)
+    return reps.tolist(), defs.tolist(), values.tolist()